@@ -0,0 +1,72 @@
+# save as compare.py
+"""
+Compare two bench/run.py result files stage by stage.
+
+    python bench/compare.py bench/results/<old>.json bench/results/<new>.json
+    python bench/compare.py <old> <new> --threshold 0.15 --fail
+
+A commit hash (or prefix) stands for bench/results/<hash>*.json. Ratios are
+new/old of the best time and of peak memory. A stage counts as regressed when
+either ratio exceeds 1 + threshold. With --fail, any regression makes the exit
+status 1.
+"""
+import argparse, json, sys
+from pathlib import Path
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+def resolve(arg: str) -> Path:
+    p = Path(arg)
+    if p.exists():
+        return p
+    hits = sorted(RESULTS_DIR.glob(f"{arg}*.json"))
+    if len(hits) != 1:
+        raise SystemExit(f"❌ {arg}: {'no' if not hits else 'ambiguous'} result file in {RESULTS_DIR}")
+    return hits[0]
+
+def load(path: Path) -> dict:
+    report = json.loads(path.read_text(encoding="utf-8"))
+    report["by_key"] = {(r["stage"], r["scale"]): r for r in report["results"]}
+    return report
+
+def label(report: dict) -> str:
+    return (report.get("commit") or "?")[:10] + ("-dirty" if report.get("dirty") else "")
+
+def compare(old: dict, new: dict, threshold: float = 0.10) -> list:
+    rows = []
+    for key in sorted(old["by_key"].keys() & new["by_key"].keys(), key=lambda k: (k[1], k[0])):
+        a, b = old["by_key"][key], new["by_key"][key]
+        t = b["best_s"] / a["best_s"] if a["best_s"] else float("inf")
+        m = b["peak_bytes"] / a["peak_bytes"] if a["peak_bytes"] else float("inf")
+        rows.append({"stage": key[0], "scale": key[1], "old_s": a["best_s"], "new_s": b["best_s"], "time_ratio": t,
+                     "old_bytes": a["peak_bytes"], "new_bytes": b["peak_bytes"], "mem_ratio": m,
+                     "regressed": t > 1 + threshold or m > 1 + threshold, "same_size": a.get("size") == b.get("size")})
+    return rows
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    ap.add_argument("old"); ap.add_argument("new")
+    ap.add_argument("--threshold", type=float, default=0.10, help="Relative slowdown / growth that counts as a regression (default: 0.10)")
+    ap.add_argument("--fail", action="store_true", help="Exit 1 if anything regressed")
+    args = ap.parse_args()
+
+    old, new = load(resolve(args.old)), load(resolve(args.new))
+    print(f"📊 {label(old)} → {label(new)}")
+    if old.get("environment") != new.get("environment"):
+        print("⚠️  environments differ (library versions / machine); ratios may not be comparable")
+    rows = compare(old, new, args.threshold)
+    for r in rows:
+        flag = "🔺" if r["regressed"] else ("🔻" if r["time_ratio"] < 1 - args.threshold else "  ")
+        note = "" if r["same_size"] else "  (inputs differ)"
+        print(f"{flag} x{r['scale']:<4g} {r['stage']:<32} {r['old_s'] * 1e3:>9.1f} → {r['new_s'] * 1e3:>9.1f} ms "
+              f"×{r['time_ratio']:.2f} | {r['old_bytes'] / 2**20:>7.1f} → {r['new_bytes'] / 2**20:>7.1f} MiB ×{r['mem_ratio']:.2f}{note}")
+    only = (old["by_key"].keys() ^ new["by_key"].keys())
+    if only:
+        print(f"ℹ️  {len(only)} stage/scale pairs are in only one file")
+    regressed = [r for r in rows if r["regressed"]]
+    print(f"{'🔺' if regressed else '✅'} {len(regressed)} of {len(rows)} regressed beyond {args.threshold:.0%}")
+    if args.fail and regressed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+# save as run.py
+"""
+Time and memory-profile the pipeline stages on synthetic data (bench/synth.py).
+
+    python bench/run.py                         # scales 1 and 10, every stage
+    python bench/run.py --scales 1 10 100       # 100x needs a few GB of RAM
+    python bench/run.py --stages overpass.*     # fnmatch patterns
+    python bench/compare.py bench/results/<old>.json bench/results/<new>.json
+
+Each stage is timed --repeat times (wall clock, best and median). It then runs
+once more under tracemalloc to record peak Python + NumPy allocation; that run
+is kept out of the timings. Inputs are generated once per (scale, seed) under
+bench/data/ and reused. Results go to bench/results/<commit>[-dirty].json with
+the library versions, so runs from different commits can be compared. The
+fetch.* stages drive the Overpass client, cache, tiler and augmented-diff update
+against fetch/overpass_standin.py on 127.0.0.1 serving the synthetic dump, so
+nothing touches the network.
+"""
+import argparse, contextlib, fnmatch, io, json, os, platform, statistics, subprocess, sys, tempfile, time, tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+
+BENCH = Path(__file__).resolve().parent
+ROOT = BENCH.parent
+for sub in ("fetch", "filter", "filter/tokyo", "filter/nyc", "filter/paris"):
+    sys.path.insert(0, str(ROOT / sub))
+
+import synth
+from process_tokyo_overpass import (build_node_index, ingest_overpass_stream, ingest_store, load_overpass_json,
+                                    way_coords, ways_to_linestrings, write_geojson_safe)
+from osm_store import OsmStore
+from filter_nyc_subways import load_routes, load_stations
+from convert_paris import read_layer, reproject_2d
+from geojson_writer import write_geojson
+from overpass_cache import OverpassCache
+from overpass_client import OverpassClient
+from overpass_diff import update_dump
+from overpass_standin import respond_with_diffs, serve_standin
+from overpass_tiles import fetch_region
+
+DATA_DIR = BENCH / "data"
+RESULTS_DIR = BENCH / "results"
+
+@dataclass
+class Stage:
+    name: str
+    setup: Callable[["Inputs"], Callable[[], object]]   # builds the timed callable; setup itself is not timed
+    size: Callable[["Inputs"], dict]                     # what the stage works on, for the report
+
+class Inputs:
+    """Synthetic files for one (scale, seed), generated on first use, plus parsed forms shared between stages."""
+
+    def __init__(self, scale: float, seed: int, data_dir: Path = DATA_DIR):
+        self.scale, self.seed = scale, seed
+        self.dir = data_dir / f"x{scale:g}-s{seed}"
+        self._cache: Dict[str, object] = {}
+
+    def _once(self, key: str, make: Callable[[], object]):
+        if key not in self._cache:
+            self._cache[key] = make()
+        return self._cache[key]
+
+    @property
+    def overpass_path(self) -> Path:
+        def make():
+            p = self.dir / "overpass.json"
+            if not p.exists():
+                synth.overpass_dump(p.with_suffix(".tmp"), self.scale, self.seed).replace(p)
+            return p
+        return self._once("overpass_path", make)
+
+    @property
+    def adiff_path(self) -> Path:
+        def make():
+            p = self.dir / "overpass.adiff.xml"
+            if not p.exists():
+                synth.overpass_adiff(p.with_suffix(".tmp"), self.scale, self.seed).replace(p)
+            return p
+        return self._once("adiff_path", make)
+
+    @property
+    def standin(self):
+        """overpass_standin serving the dump, and the adiff to queries since its timestamp."""
+        return self._once("standin", lambda: serve_standin(respond=respond_with_diffs(
+            self.overpass_path.read_bytes(), {synth.ADIFF_SINCE: self.adiff_path.read_bytes()})))
+
+    def mirror(self, mode: str) -> str:
+        return f"http://127.0.0.1:{self.standin.server_address[1]}/{mode}/api/interpreter"
+
+    def close(self):
+        if "standin" in self._cache:
+            self.standin.shutdown()
+            self.standin.server_close()
+
+    @property
+    def store(self) -> OsmStore:
+        return self._once("store", lambda: quiet(OsmStore.ensure, self.overpass_path, self.dir / "overpass.sqlite"))
+
+    @property
+    def elements(self) -> List[dict]:
+        return self._once("elements", lambda: load_overpass_json(self.overpass_path)["elements"])
+
+    @property
+    def ways(self) -> List[dict]:
+        return self._once("ways", lambda: [e for e in self.elements if e.get("type") == "way"])
+
+    @property
+    def node_index(self):
+        return self._once("node_index", lambda: build_node_index(self.elements))
+
+    @property
+    def gtfs_dir(self) -> Path:
+        def make():
+            d = self.dir / "gtfs"
+            if not (d / "shapes.txt").exists():
+                synth.gtfs_feed(d, self.scale, self.seed)
+            return d
+        return self._once("gtfs_dir", make)
+
+    @property
+    def lambert93(self) -> Dict[str, Path]:
+        def make():
+            d = self.dir / "paris"
+            paths = {"stations": d / "schema_gares-gf.geojson", "routes": d / "schema_trace_fermetrotram-gf.geojson"}
+            if not all(p.exists() for p in paths.values()):
+                paths = synth.lambert93(d, self.scale, self.seed)
+            return paths
+        return self._once("lambert93", make)
+
+    @property
+    def paris_routes(self) -> gpd.GeoDataFrame:
+        return self._once("paris_routes", lambda: gpd.read_file(self.lambert93["routes"]))
+
+    @property
+    def nyc_routes(self) -> gpd.GeoDataFrame:
+        return self._once("nyc_routes", lambda: quiet(load_routes, self.gtfs_dir / "shapes.txt"))
+
+def quiet(fn, *args, **kwargs):
+    """Call fn with its progress prints swallowed."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+# A quarter of synth.TOKYO_BBOX in each direction: about 1/16 of the area.
+STORE_BBOX = (35.65, 139.70, 35.725, 139.80)
+
+def _write(gdf: gpd.GeoDataFrame, writer: Callable = write_geojson_safe, suffix: str = ".geojson") -> Callable[[], object]:
+    def run():
+        with tempfile.TemporaryDirectory() as d:
+            path = Path(d) / f"out{suffix}"
+            writer(gdf, path)
+            return path.stat().st_size
+    return run
+
+# The stand-in answers every tile with the whole dump, so merging drops 3/4 as duplicates.
+TILE_QUERY = '[out:json][timeout:180];\nrelation["route"="subway"]({bbox});\nout body;\n>;\nout skel qt;'
+TILE_BBOX = (35.55, 139.55, 35.85, 139.95)
+
+def _fetch(client: OverpassClient, query: str = "q") -> Callable[[], object]:
+    def run():
+        with tempfile.TemporaryDirectory() as d:
+            return quiet(client.post_stream, query, Path(d) / "out.json")
+    return run
+
+def _cached_client(i: "Inputs") -> OverpassClient:
+    client = OverpassClient([i.mirror("ok")], check_status=False, cache=OverpassCache(i.dir / "overpass_cache"))
+    _fetch(client)()   # warm the cache outside the timings
+    return client
+
+def _fetch_region(i: "Inputs") -> Callable[[], object]:
+    client = OverpassClient([i.mirror("ok")], check_status=False)
+    def run():
+        with tempfile.TemporaryDirectory() as d:
+            return quiet(fetch_region, client, TILE_QUERY, TILE_BBOX, Path(d) / "merged.json.gz", (2, 2), 4)
+    return run
+
+def _update_dump(i: "Inputs") -> Callable[[], object]:
+    client = OverpassClient([i.mirror("ok")], check_status=False)
+    def run():
+        with tempfile.TemporaryDirectory() as d:
+            return quiet(update_dump, client, TILE_QUERY.format(bbox="35.55,139.55,35.85,139.95"), i.overpass_path,
+                         Path(d) / "updated.json.gz")
+    return run
+
+def _ogr(gdf: gpd.GeoDataFrame, path: Path):
+    gdf.to_file(path, driver="GeoJSON")
+
+def _n_coords(gdf: gpd.GeoDataFrame) -> int:
+    return int(gdf.geometry.count_coordinates().sum())
+
+STAGES: List[Stage] = [
+    Stage("overpass.load", lambda i: lambda: load_overpass_json(i.overpass_path),
+          lambda i: {"bytes": i.overpass_path.stat().st_size}),
+    Stage("overpass.stream", lambda i: lambda: quiet(ingest_overpass_stream, i.overpass_path),
+          lambda i: {"bytes": i.overpass_path.stat().st_size}),
+    Stage("overpass.store.read", lambda i: lambda: quiet(ingest_store, i.store),
+          lambda i: {"bytes": i.store.path.stat().st_size}),
+    Stage("overpass.store.bbox", lambda i: lambda: quiet(ingest_store, i.store, STORE_BBOX),
+          lambda i: {"bytes": i.store.path.stat().st_size, "bbox": list(STORE_BBOX)}),
+    Stage("overpass.build_node_index", lambda i: lambda: build_node_index(i.elements),
+          lambda i: {"elements": len(i.elements)}),
+    Stage("overpass.way_coords", lambda i: lambda: [way_coords(w, i.node_index) for w in i.ways],
+          lambda i: {"ways": len(i.ways), "nodes": len(i.node_index)}),
+    Stage("overpass.ways_to_linestrings", lambda i: lambda: ways_to_linestrings(i.ways, i.node_index),
+          lambda i: {"ways": len(i.ways), "nodes": len(i.node_index)}),
+    Stage("fetch.client.post_stream", lambda i: _fetch(OverpassClient([i.mirror("ok")], check_status=False)),
+          lambda i: {"bytes": i.overpass_path.stat().st_size}),
+    Stage("fetch.client.fallback", lambda i: _fetch(OverpassClient([i.mirror("fail-500"), i.mirror("ok")], retries=0,
+                                                                   check_status=False)),
+          lambda i: {"bytes": i.overpass_path.stat().st_size, "mirrors": 2}),
+    Stage("fetch.cache.hit", lambda i: _fetch(_cached_client(i)),
+          lambda i: {"bytes": i.overpass_path.stat().st_size}),
+    Stage("fetch.tiles.fetch_region", _fetch_region,
+          lambda i: {"bytes": i.overpass_path.stat().st_size, "tiles": 4}),
+    Stage("fetch.diff.update_dump", _update_dump,
+          lambda i: {"bytes": i.overpass_path.stat().st_size, "adiff_bytes": i.adiff_path.stat().st_size}),
+    Stage("nyc.load_stations", lambda i: lambda: load_stations(i.gtfs_dir / "stops.txt"),
+          lambda i: {"bytes": (i.gtfs_dir / "stops.txt").stat().st_size}),
+    Stage("nyc.load_routes", lambda i: lambda: load_routes(i.gtfs_dir / "shapes.txt"),
+          lambda i: {"bytes": (i.gtfs_dir / "shapes.txt").stat().st_size}),
+    Stage("paris.read_layer", lambda i: lambda: quiet(read_layer, i.lambert93["routes"], "EPSG:2154"),
+          lambda i: {"bytes": i.lambert93["routes"].stat().st_size}),
+    Stage("paris.reproject_2d", lambda i: lambda: reproject_2d(i.paris_routes.geometry.values, "EPSG:2154"),
+          lambda i: {"features": len(i.paris_routes), "coords": _n_coords(i.paris_routes)}),
+    Stage("geojson.write.nyc_routes", lambda i: _write(i.nyc_routes),
+          lambda i: {"features": len(i.nyc_routes), "coords": _n_coords(i.nyc_routes)}),
+    Stage("geojson.write.paris_routes", lambda i: _write(i.paris_routes),
+          lambda i: {"features": len(i.paris_routes), "coords": _n_coords(i.paris_routes)}),
+    Stage("geojson.write.nyc_routes.gz6", lambda i: _write(i.nyc_routes, lambda g, p: write_geojson(g, p, precision=6), ".geojson.gz"),
+          lambda i: {"features": len(i.nyc_routes), "coords": _n_coords(i.nyc_routes)}),
+    Stage("geojson.ogr.nyc_routes", lambda i: _write(i.nyc_routes, _ogr),
+          lambda i: {"features": len(i.nyc_routes), "coords": _n_coords(i.nyc_routes)}),
+]
+
+def measure(fn: Callable[[], object], repeat: int) -> dict:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter(); fn(); times.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"best_s": min(times), "median_s": statistics.median(times), "times_s": times, "peak_bytes": peak}
+
+def git_commit() -> dict:
+    def git(*args) -> str:
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    return {"commit": git("rev-parse", "HEAD") or None, "subject": git("log", "-1", "--format=%s") or None,
+            "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+def environment() -> dict:
+    import shapely, pyproj, pyogrio
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "numpy": np.__version__, "pandas": pd.__version__, "shapely": shapely.__version__,
+            "geopandas": gpd.__version__, "pyproj": pyproj.__version__, "pyogrio": pyogrio.__version__}
+
+def run(scales: Sequence[float], patterns: Sequence[str], repeat: int = 3, seed: int = 0,
+        data_dir: Path = DATA_DIR) -> dict:
+    stages = [s for s in STAGES if any(fnmatch.fnmatch(s.name, p) for p in patterns)]
+    rows = []
+    for scale in scales:
+        inputs = Inputs(scale, seed, data_dir)
+        for stage in stages:
+            fn = stage.setup(inputs)
+            size = stage.size(inputs)
+            r = measure(fn, repeat)
+            rows.append({"stage": stage.name, "scale": scale, "size": size, **r})
+            print(f"   x{scale:<4g} {stage.name:<32} best {r['best_s'] * 1e3:>10.1f} ms | "
+                  f"median {r['median_s'] * 1e3:>10.1f} ms | peak {r['peak_bytes'] / 2**20:>8.1f} MiB")
+        inputs.close()
+        del inputs
+    return {**git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "seed": seed, "repeat": repeat,
+            "environment": environment(), "results": rows}
+
+def results_path(report: dict, out_dir: Path = RESULTS_DIR) -> Path:
+    name = (report["commit"] or "nocommit")[:12] + ("-dirty" if report["dirty"] else "")
+    return out_dir / f"{name}.json"
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark pipeline stages on synthetic 1x/10x/100x inputs.")
+    ap.add_argument("--scales", type=float, nargs="+", default=[1, 10], help="Input scales (default: 1 10)")
+    ap.add_argument("--stages", nargs="+", default=["*"], help="Stage name patterns (default: all)")
+    ap.add_argument("--repeat", type=int, default=3, help="Timed runs per stage (default: 3)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--data", type=Path, default=DATA_DIR, help="Where generated inputs are cached (default: bench/data)")
+    ap.add_argument("--out", type=Path, help="Result JSON (default: bench/results/<commit>[-dirty].json)")
+    ap.add_argument("--list", action="store_true", help="List the stages and exit")
+    args = ap.parse_args()
+
+    if args.list:
+        for s in STAGES:
+            print(s.name)
+        return
+    report = run(args.scales, args.stages, args.repeat, args.seed, args.data)
+    out = args.out or results_path(report)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=1), encoding="utf-8")
+    print(f"💾 {len(report['results'])} results → {out}")
+
+if __name__ == "__main__":
+    main()
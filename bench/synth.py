@@ -0,0 +1,206 @@
+# save as synth.py
+"""
+Synthetic inputs for the benchmarks, shaped like the real downloads.
+
+    overpass_dump   Overpass JSON for a Tokyo-sized subway network: track nodes,
+                    ways chained into lines (some reversed, some with inline
+                    `geometry`), route relations with platform/stop members,
+                    station nodes and untagged / non-subway noise
+    overpass_adiff  an augmented diff (OSM XML) of that dump since its
+                    timestamp: moved track nodes, new stations, deleted noise ways
+    gtfs_feed       stops.txt (stations + platforms) and shapes.txt, NYC-sized
+    lambert93       IDFM-style station points and route lines in Lambert-93
+                    with Z, written as GeoJSON
+
+`scale` multiplies the element counts; scale 1 is roughly the real city.
+Everything is seeded, so a given (scale, seed) always writes the same bytes.
+"""
+import csv, json
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+import numpy as np
+import shapely
+import geopandas as gpd
+
+# Scale 1 ≈ the real inputs.
+OVERPASS_LINES, WAYS_PER_LINE, NODES_PER_WAY = 40, 40, 20
+GTFS_SHAPES, POINTS_PER_SHAPE, GTFS_STATIONS = 300, 500, 500
+PARIS_STATIONS, PARIS_LINES, POINTS_PER_LINE = 1_000, 400, 250
+
+TOKYO_BBOX = (139.55, 35.55, 139.95, 35.85)
+NYC_BBOX = (-74.05, 40.55, -73.75, 40.90)
+LAMBERT93_BBOX = (630_000.0, 6_840_000.0, 680_000.0, 6_880_000.0)
+
+# osm3s timestamp of overpass_dump and the osm_base overpass_adiff brings it to.
+ADIFF_SINCE, ADIFF_UNTIL = "2024-01-01T00:00:00Z", "2024-02-01T00:00:00Z"
+
+def random_walk(rng: np.random.Generator, n: int, bbox, step: float) -> np.ndarray:
+    """n points wandering inside bbox with a slowly turning heading."""
+    x0, y0, x1, y1 = bbox
+    heading = np.cumsum(rng.normal(0, 0.25, n)) + rng.uniform(0, 2 * np.pi)
+    xy = np.cumsum(np.column_stack([np.cos(heading), np.sin(heading)]) * step, axis=0)
+    xy += [rng.uniform(x0, x1), rng.uniform(y0, y1)]
+    # Fold back into the box so large scales stay in the same area.
+    w, h = x1 - x0, y1 - y0
+    xy[:, 0] = x0 + np.abs(((xy[:, 0] - x0) + w) % (2 * w) - w)
+    xy[:, 1] = y0 + np.abs(((xy[:, 1] - y0) + h) % (2 * h) - h)
+    return xy
+
+# ---------- Overpass ----------
+
+def overpass_elements(scale: float = 1, seed: int = 0) -> Iterator[dict]:
+    """Nodes, then ways, then relations, as Overpass `out body` writes them."""
+    rng = np.random.default_rng(seed)
+    n_lines = max(1, int(round(OVERPASS_LINES * scale)))
+    nodes, ways, relations = [], [], []
+    next_node, next_way = 1_000_000, 50_000_000
+    for li in range(n_lines):
+        n_pts = WAYS_PER_LINE * (NODES_PER_WAY - 1) + 1
+        xy = random_walk(rng, n_pts, TOKYO_BBOX, 0.0004)
+        ids = np.arange(next_node, next_node + n_pts); next_node += n_pts
+        nodes += [{"type": "node", "id": int(i), "lat": round(float(y), 7), "lon": round(float(x), 7)} for i, (x, y) in zip(ids, xy)]
+        name, ref = f"Line {li}", f"L{li}"
+        members = []
+        for w in range(WAYS_PER_LINE):
+            seg = ids[w * (NODES_PER_WAY - 1):(w + 1) * (NODES_PER_WAY - 1) + 1]
+            if rng.random() < 0.3:
+                seg = seg[::-1]
+            way = {"type": "way", "id": next_way, "nodes": [int(i) for i in seg],
+                   "tags": {"railway": "subway", "tunnel": "yes" if rng.random() < 0.8 else "no", "name": name,
+                            "electrified": "rail", "gauge": "1067", "voltage": "750"}}
+            if rng.random() < 0.05:
+                way["geometry"] = [{"lat": round(float(y), 7), "lon": round(float(x), 7)} for x, y in xy[seg - ids[0]]]
+            ways.append(way)
+            members.append({"type": "way", "ref": next_way, "role": ""})
+            next_way += 1
+        # Stations every few ways, with a platform member each.
+        for w in range(0, WAYS_PER_LINE, 3):
+            x, y = xy[w * (NODES_PER_WAY - 1)]
+            station = {"type": "node", "id": next_node, "lat": round(float(y), 7), "lon": round(float(x), 7),
+                       "tags": {"railway": "station", "station": "subway", "subway": "yes", "name": f"Station {li}-{w}",
+                                "name:en": f"Station {li}-{w}", "operator": "Metro", "wheelchair": "yes"}}
+            platform = {"type": "node", "id": next_node + 1, "lat": station["lat"], "lon": station["lon"],
+                        "tags": {"public_transport": "platform", "railway": "platform"}}
+            nodes += [station, platform]
+            members.insert(0, {"type": "node", "ref": next_node + 1, "role": "platform"})
+            members.insert(0, {"type": "node", "ref": next_node, "role": "stop"})
+            next_node += 2
+        for direction in ("", " (return)"):
+            relations.append({"type": "relation", "id": 9_000_000 + len(relations), "members": members,
+                              "tags": {"type": "route", "route": "subway", "name": name + direction, "ref": ref,
+                                       "colour": f"#{int(rng.integers(0, 1 << 24)):06x}", "network": "Tokyo Metro"}})
+    # Noise: footways and ordinary rail that the filters must skip.
+    for _ in range(int(round(WAYS_PER_LINE * n_lines * 0.3))):
+        n = int(rng.integers(2, NODES_PER_WAY))
+        xy = random_walk(rng, n, TOKYO_BBOX, 0.0003)
+        ids = np.arange(next_node, next_node + n); next_node += n
+        nodes += [{"type": "node", "id": int(i), "lat": round(float(y), 7), "lon": round(float(x), 7)} for i, (x, y) in zip(ids, xy)]
+        tags = {"highway": "footway"} if rng.random() < 0.5 else {"railway": "rail", "usage": "main"}
+        ways.append({"type": "way", "id": next_way, "nodes": [int(i) for i in ids], "tags": tags})
+        next_way += 1
+    relations.append({"type": "relation", "id": 9_999_999, "tags": {"type": "route", "route": "train"},
+                      "members": [{"type": "way", "ref": w["id"], "role": ""} for w in ways[-10:]]})
+    yield from nodes
+    yield from ways
+    yield from relations
+
+def overpass_dump(path: Path, scale: float = 1, seed: int = 0) -> Path:
+    """Write overpass_elements() as an Overpass JSON document, one element per line."""
+    path = Path(path); path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{\n"version": 0.6,\n"generator": "bench/synth.py",\n'
+                f'"osm3s": {{"timestamp_osm_base": "{ADIFF_SINCE}"}},\n"elements": [\n')
+        for i, el in enumerate(overpass_elements(scale, seed)):
+            f.write((",\n" if i else "") + json.dumps(el, separators=(",", ":")))
+        f.write("\n]\n}\n")
+    return path
+
+def overpass_adiff(path: Path, scale: float = 1, seed: int = 0, every: int = 100) -> Path:
+    """
+    Augmented diff of overpass_dump(scale, seed) from its timestamp to
+    ADIFF_UNTIL: every `every`-th node moves a few metres, one new station per
+    `every` nodes, and every `every`-th noise way (footway / main-line rail) is deleted.
+    """
+    path = Path(path); path.parent.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed + 1)
+    node_xml = lambda el: f'<node id="{el["id"]}" lat="{el["lat"]}" lon="{el["lon"]}"/>'
+    n_nodes = n_ways = 0
+    next_id = 900_000_000
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f'<?xml version="1.0" encoding="UTF-8"?>\n<osm version="0.6" generator="bench/synth.py">\n'
+                f'<meta osm_base="{ADIFF_UNTIL}"/>\n')
+        for el in overpass_elements(scale, seed):
+            if el["type"] == "node" and "tags" not in el:
+                n_nodes += 1
+                if n_nodes % every:
+                    continue
+                moved = {**el, "lat": round(el["lat"] + float(rng.normal(0, 2e-5)), 7),
+                         "lon": round(el["lon"] + float(rng.normal(0, 2e-5)), 7)}
+                f.write(f'<action type="modify">\n<old>{node_xml(el)}</old>\n<new>{node_xml(moved)}</new>\n</action>\n')
+                f.write(f'<action type="create">\n<node id="{next_id}" lat="{moved["lat"]}" lon="{moved["lon"]}">'
+                        f'<tag k="railway" v="station"/><tag k="name" v="New {next_id}"/></node>\n</action>\n')
+                next_id += 1
+            elif el["type"] == "way" and el["tags"].get("railway") != "subway":
+                n_ways += 1
+                if n_ways % every:
+                    continue
+                nds = "".join(f'<nd ref="{n}"/>' for n in el["nodes"])
+                f.write(f'<action type="delete">\n<old><way id="{el["id"]}">{nds}</way></old>\n'
+                        f'<new><way id="{el["id"]}" visible="false"/></new>\n</action>\n')
+        f.write("</osm>\n")
+    return path
+
+# ---------- GTFS ----------
+
+def gtfs_feed(out_dir: Path, scale: float = 1, seed: int = 0) -> Path:
+    """stops.txt (parent stations + N/S platforms) and shapes.txt (rows shuffled within each shape)."""
+    rng = np.random.default_rng(seed)
+    out_dir = Path(out_dir); out_dir.mkdir(parents=True, exist_ok=True)
+    n_st = max(1, int(round(GTFS_STATIONS * scale)))
+    xy = np.column_stack([rng.uniform(NYC_BBOX[0], NYC_BBOX[2], n_st), rng.uniform(NYC_BBOX[1], NYC_BBOX[3], n_st)])
+    with open(out_dir / "stops.txt", "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["stop_id", "stop_name", "stop_lat", "stop_lon", "location_type", "parent_station"])
+        for i, (x, y) in enumerate(xy):
+            sid = f"S{i:05d}"
+            w.writerow([sid, f"Station {i}", f"{y:.6f}", f"{x:.6f}", 1, ""])
+            for d in "NS":
+                w.writerow([sid + d, f"Station {i}", f"{y:.6f}", f"{x:.6f}", "", sid])
+
+    n_shapes = max(1, int(round(GTFS_SHAPES * scale)))
+    with open(out_dir / "shapes.txt", "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["shape_id", "shape_pt_sequence", "shape_pt_lat", "shape_pt_lon", "shape_dist_traveled"])
+        for s in range(n_shapes):
+            pts = random_walk(rng, POINTS_PER_SHAPE, NYC_BBOX, 0.0008)
+            sid = f"{'ABCDEFGJLMNQRWZ1234567'[s % 22]}..{'NS'[s % 2]}{s:05d}R"
+            order = rng.permutation(POINTS_PER_SHAPE)
+            for k in order:
+                w.writerow([sid, int(k), f"{pts[k, 1]:.6f}", f"{pts[k, 0]:.6f}", ""])
+    return out_dir
+
+# ---------- Lambert-93 ----------
+
+def lambert93(out_dir: Path, scale: float = 1, seed: int = 0) -> Dict[str, Path]:
+    """IDFM-like stations (Point Z) and routes (LineString Z) in Lambert-93 metres."""
+    rng = np.random.default_rng(seed)
+    out_dir = Path(out_dir); out_dir.mkdir(parents=True, exist_ok=True)
+    n_st = max(1, int(round(PARIS_STATIONS * scale)))
+    x = rng.uniform(LAMBERT93_BBOX[0], LAMBERT93_BBOX[2], n_st)
+    y = rng.uniform(LAMBERT93_BBOX[1], LAMBERT93_BBOX[3], n_st)
+    stations = gpd.GeoDataFrame({"id_gares": np.arange(n_st), "nom_gares": [f"Gare {i}" for i in range(n_st)],
+                                 "res_com": rng.choice(["METRO 1", "RER A", "TRAM 3a", "TRAIN H"], n_st)},
+                                geometry=shapely.points(x, y, np.zeros(n_st)), crs="EPSG:2154")
+    n_lines = max(1, int(round(PARIS_LINES * scale)))
+    lines: List = []
+    for _ in range(n_lines):
+        xy = random_walk(rng, POINTS_PER_LINE, LAMBERT93_BBOX, 60.0)
+        lines.append(shapely.linestrings(np.column_stack([xy, np.zeros(len(xy))])))
+    routes = gpd.GeoDataFrame({"idrefligc": [f"C{i:05d}" for i in range(n_lines)],
+                               "res_com": rng.choice(["METRO 1", "RER A", "TRAM 3a"], n_lines)},
+                              geometry=lines, crs="EPSG:2154")
+    paths = {"stations": out_dir / "schema_gares-gf.geojson", "routes": out_dir / "schema_trace_fermetrotram-gf.geojson"}
+    stations.to_file(paths["stations"], driver="GeoJSON")
+    routes.to_file(paths["routes"], driver="GeoJSON")
+    return paths
@@ -0,0 +1,327 @@
+# save as build.py
+"""
+One entry point for the whole pipeline: fetch → filter → export for every city,
+modelled as a dependency graph of steps.
+
+Each step is one of the existing scripts run as a subprocess in the directory
+it has always been run from, so every script keeps its own path conventions.
+A step is skipped when the hash of its code, command line and input files is
+the same as on its last successful run and its outputs still exist; the hashes
+live in .build_state.json. Because a step's inputs are its parents' outputs,
+a parent that reruns but writes identical bytes does not wake its children.
+
+Steps run on a process pool as soon as their parents finish, so independent
+cities build concurrently. Logs go to data/build/logs/<step>.log.
+
+    python build.py                      # everything that is out of date
+    python build.py --city tokyo london  # just those cities (+ tiles over them)
+    python build.py --dry-run            # show what would run
+    python build.py --refetch            # also redo the Overpass fetches
+"""
+import argparse, hashlib, json, os, subprocess, sys, time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+ROOT = Path(__file__).resolve().parent
+STATE_PATH = ROOT / ".build_state.json"
+LOG_DIR = ROOT / "data" / "build" / "logs"
+EXPORT_DIR = ROOT / "data" / "build"
+
+LOD_TOLERANCES = ("200", "50", "10", "0")
+TOPO_TOLERANCES = ("0", "250", "1000", "4000")   # metres, filter/us/topology.py
+OVERPASS_CODE = ["fetch/overpass_client.py", "fetch/overpass_cache.py", "fetch/overpass_diff.py", "fetch/overpass_tiles.py", "filter/overpass_json.py"]
+
+@dataclass
+class Step:
+    name: str                        # unique, "<city>.<stage>[.<what>]"
+    city: str
+    cmd: List[str]                   # script + args; the script path is relative to cwd
+    cwd: str                         # relative to ROOT
+    code: List[str]                  # source files (relative to ROOT) that define the step
+    inputs: List[str] = field(default_factory=list)     # data files (relative to ROOT)
+    outputs: List[str] = field(default_factory=list)
+    deps: List[str] = field(default_factory=list)
+    fetch: bool = False              # network step: only rerun on code change or --refetch
+
+def _stem(path: str) -> str:
+    return Path(path).name.split(".")[0]
+
+def export_steps(city: str, layers: Sequence[str], deps: Sequence[str]) -> List[Step]:
+    """LOD variants and binary bundles for a city's GeoJSON layers (paths relative to ROOT)."""
+    out = EXPORT_DIR.relative_to(ROOT) / city
+    rel = [os.path.relpath(ROOT / p, ROOT / "filter") for p in layers]
+    out_rel = os.path.relpath(ROOT / out, ROOT / "filter")
+    lod_outputs = [str(out / "lod" / f"{_stem(p)}.lod{i}.{ext}")
+                   for p in layers for i in range(len(LOD_TOLERANCES)) for ext in ("geojson", "topojson")]
+    bundle_outputs = [str(out / "bundles" / f"{_stem(p)}{ext}") for p in layers for ext in (".bin", ".props.json")]
+    return [
+        Step(f"{city}.export.lod", city, ["lod.py", *rel, "--out", f"{out_rel}/lod", "--tolerances", *LOD_TOLERANCES],
+             "filter", ["filter/lod.py"], list(layers), lod_outputs, list(deps)),
+        Step(f"{city}.export.bundles", city, ["binary_export.py", *rel, "--out", f"{out_rel}/bundles"],
+             "filter", ["filter/binary_export.py", "filter/lod.py"], list(layers), bundle_outputs, list(deps)),
+    ]
+
+def station_step(city: str, stations: str, routes: str, deps: Sequence[str], extra: Sequence[str] = ()) -> Step:
+    """One feature per station complex, with the lines that serve it (filter/stations.py)."""
+    out = str(EXPORT_DIR.relative_to(ROOT) / city / f"{_stem(stations)}.complexes.geojson")
+    rel = lambda p: os.path.relpath(ROOT / p, ROOT / "filter")
+    return Step(f"{city}.stations", city, ["stations.py", rel(stations), "--routes", rel(routes), "--out", rel(out), *extra],
+                "filter", ["filter/stations.py"], [stations, routes], [out], list(deps))
+
+def network_step(stations: Step, routes: str, extra: Sequence[str] = ()) -> Step:
+    """A city's station complexes snapped onto its routes → CSR graph + node table (filter/network.py)."""
+    city, complexes = stations.city, stations.outputs[0]
+    out = EXPORT_DIR.relative_to(ROOT) / city
+    rel = lambda p: os.path.relpath(ROOT / p, ROOT / "filter")
+    return Step(f"{city}.network", city,
+                ["network.py", "--stations", rel(complexes), "--routes", rel(routes), "--city", city, "--out", rel(out), *extra],
+                "filter", ["filter/network.py", "filter/stations.py"], [complexes, routes],
+                [str(out / f"{city}_{s}") for s in ("network.npz", "nodes.csv", "edges.geojson")], [stations.name])
+
+def pipeline(cities: Optional[Sequence[str]] = None) -> List[Step]:
+    """Every step, or the chosen cities' steps plus the shared ones built over just those cities."""
+    steps: List[Step] = []
+
+    # NYC: static GTFS download in filter/data → the layers the viewer loads from data/.
+    nyc_layers = ["data/nyc_subway_stations.geojson", "data/nyc_subway_routes.geojson"]
+    steps.append(Step("nyc.filter", "nyc", ["filter_nyc_subways.py", "--data", "../data", "--out", "../../data"], "filter/nyc",
+                      ["filter/nyc/filter_nyc_subways.py", "filter/nyc/enrich_nyc_stations.py"],
+                      ["filter/data/stops.txt", "filter/data/shapes.txt"], nyc_layers))
+    steps += export_steps("nyc", nyc_layers, ["nyc.filter"])
+    nyc_label = ["--route-label", "shape_id", "--route-label-regex", r"^([^.]+)"]
+    steps.append(station_step("nyc", *nyc_layers, ["nyc.filter"], nyc_label))
+    steps.append(network_step(steps[-1], nyc_layers[1], nyc_label))
+    steps.append(Step("nyc.timetable", "nyc", ["raptor.py", "--data", "../data", "--save", "../../data/build/nyc/nyc_timetable.npz"],
+                      "filter/nyc", ["filter/nyc/raptor.py", "filter/nyc/enrich_nyc_stations.py"],
+                      [f"filter/data/{f}.txt" for f in ("stops", "trips", "stop_times", "calendar", "transfers")],
+                      ["data/build/nyc/nyc_timetable.npz"]))
+
+    # Paris: IDFM open-data downloads in filter/paris (Lambert-93) → output/.
+    steps.append(Step("paris.filter.transit", "paris", ["convert_paris.py", "transit"], "filter/paris",
+                      ["filter/paris/convert_paris.py"],
+                      ["filter/paris/data/schema_gares-gf.geojson", "filter/paris/data/schema_trace_fermetrotram-gf.geojson"],
+                      ["filter/paris/output/paris_stations.geojson", "filter/paris/output/paris_routes.geojson"]))
+    steps.append(Step("paris.filter.gares", "paris", ["convert_paris.py", "gares"], "filter/paris",
+                      ["filter/paris/convert_paris.py"], ["filter/paris/stations.csv"],
+                      ["filter/paris/output/stations_from_csv.geojson"]))
+    steps += export_steps("paris", ["filter/paris/output/paris_stations.geojson", "filter/paris/output/paris_routes.geojson"],
+                          ["paris.filter.transit"])
+    steps.append(station_step("paris", "filter/paris/output/paris_stations.geojson", "filter/paris/output/paris_routes.geojson",
+                              ["paris.filter.transit"]))
+    steps.append(network_step(steps[-1], "filter/paris/output/paris_routes.geojson"))
+
+    # Tokyo: Overpass dump → data_tokyo/ under filter/, as the scripts always did.
+    tokyo_raw = "filter/data_tokyo/overpass_raw_tokyo.json"
+    tokyo_layers = ["filter/data_tokyo/tokyo_subway_stations.geojson", "filter/data_tokyo/tokyo_subway_routes.geojson"]
+    steps.append(Step("tokyo.fetch", "tokyo",
+                      ["../fetch/tokyo/fetch_tokyo_subway.py", "--out", "data_tokyo/overpass_raw_tokyo.json", "--no-archive"],
+                      "filter", ["fetch/tokyo/fetch_tokyo_subway.py", *OVERPASS_CODE], [], [tokyo_raw], fetch=True))
+    steps.append(Step("tokyo.filter", "tokyo", ["tokyo/process_tokyo_overpass.py", "data_tokyo/overpass_raw_tokyo.json", "--stream", "--merge-relations"],
+                      "filter", ["filter/tokyo/process_tokyo_overpass.py", "filter/overpass_json.py", "filter/osm_store.py"], [tokyo_raw],
+                      tokyo_layers + ["filter/data_tokyo/tokyo_subway_all.geojson"], ["tokyo.fetch"]))
+    steps += export_steps("tokyo", tokyo_layers, ["tokyo.filter"])
+    steps.append(station_step("tokyo", *tokyo_layers, ["tokyo.filter"]))
+    steps.append(network_step(steps[-1], tokyo_layers[1]))
+
+    # London: staged Overpass fetch into data/london (the fetcher writes ../data/london, so it
+    # runs from fetch/); the generic Overpass processor turns the merged dump into the layers the viewer loads.
+    london_raw = "data/london/overpass_raw_london_build_with_stations.json.gz"
+    london_layers = ["data/london/london_tube_stations.geojson", "data/london/london_tube_routes.geojson"]
+    steps.append(Step("london.fetch", "london", ["london/fetch_london_tube_overpass.py", "--stamp", "build"], "fetch",
+                      ["fetch/london/fetch_london_tube_overpass.py", *OVERPASS_CODE], [], [london_raw], fetch=True))
+    steps.append(Step("london.filter", "london",
+                      ["filter/tokyo/process_tokyo_overpass.py", london_raw, "--stream", "--merge-relations", "--out", "data/london", "--prefix", "london_tube"],
+                      ".", ["filter/tokyo/process_tokyo_overpass.py", "filter/overpass_json.py", "filter/osm_store.py"], [london_raw],
+                      london_layers + ["data/london/london_tube_all.geojson"], ["london.fetch"]))
+    steps += export_steps("london", london_layers, ["london.filter"])
+    steps.append(station_step("london", *london_layers, ["london.filter"]))
+    steps.append(network_step(steps[-1], london_layers[1]))
+
+    # US: Census states + TIGER counties, and the CDC PLACES measure table.
+    us_layers = ["filter/us/states_layer.geojson", "filter/us/counties_layer.geojson"]
+    steps.append(Step("us.filter.geo", "us", ["filter_geo.py"], "filter/us", ["filter/us/filter_geo.py"],
+                      ["filter/data/gz_2010_us_040_00_20m.json"] + [f"filter/us/tl_2021_us_county.{e}" for e in ("shp", "shx", "dbf", "prj")],
+                      us_layers))
+    steps.append(Step("us.filter.places", "us", ["filter_places.py"], "filter/us", ["filter/us/filter_places.py"],
+                      ["filter/us/PLACES_County_Data_2024.csv"], ["filter/us/obesity_by_county.csv"]))
+    steps.append(Step("us.filter.places.wide", "us", ["filter_places.py", "--wide", "places_wide.parquet"], "filter/us",
+                      ["filter/us/filter_places.py"], ["filter/us/PLACES_County_Data_2024.csv"],
+                      ["filter/us/places_wide.parquet", "filter/us/places_wide.parquet.measures.json"]))
+    steps += export_steps("us", us_layers, ["us.filter.geo"])
+    topo_out = EXPORT_DIR.relative_to(ROOT) / "us" / "topology"
+    steps.append(Step("us.topology", "us",
+                      ["topology.py", "--out", os.path.relpath(ROOT / topo_out, ROOT / "filter/us"), "--tolerances", *TOPO_TOLERANCES],
+                      "filter/us", ["filter/us/topology.py", "filter/lod.py"], us_layers,
+                      [str(topo_out / f"us{s}.tol{i}.{ext}") for i in range(len(TOPO_TOLERANCES))
+                       for s, ext in (("", "topojson"), ("_states", "geojson"), ("_counties", "geojson"))],
+                      ["us.filter.geo"]))
+
+    if cities:
+        steps = [s for s in steps if s.city in cities]
+
+    # Shared: one tile pyramid over the viewer's subway layers.
+    tiled = {"nyc": nyc_layers, "tokyo": tokyo_layers, "london": london_layers}
+    tiled = {c: v for c, v in tiled.items() if not cities or c in cities}
+    if tiled:
+        tile_layers = [p for v in tiled.values() for p in v]
+        steps.append(Step("all.export.tiles", "all",
+                          ["tiles.py", "--out", "../data/tiles",
+                           *[a for p in tile_layers for a in ("--layer", f"{_tile_key(p)}=../{p}")]],
+                          "filter", ["filter/tiles.py", "filter/lod.py"], tile_layers, ["data/tiles/index.json"],
+                          [f"{c}.filter" for c in tiled]))
+        # gzip (+ brotli when installed) siblings of the viewer's layers, picked up by serve.py.
+        steps.append(Step("all.precompress", "all", ["serve.py", "--precompress", *tile_layers, "--min-size", "0"],
+                          ".", ["serve.py"], tile_layers, [f"{p}.gz" for p in tile_layers],
+                          [f"{c}.filter" for c in tiled]))
+    return steps
+
+def _tile_key(path: str) -> str:
+    """data/london/london_tube_routes.geojson → london/routes"""
+    stem = _stem(path)
+    return f"{stem.split('_')[0]}/{stem.rsplit('_', 1)[1]}"
+
+# ---------- hashing ----------
+
+def file_digest(path: Path, chunk: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            b = f.read(chunk)
+            if not b:
+                break
+            h.update(b)
+    return h.hexdigest()
+
+def step_hash(step: Step) -> str:
+    """Hash of everything that determines a step's outputs."""
+    h = hashlib.sha256()
+    h.update(json.dumps({"cmd": step.cmd, "cwd": step.cwd, "outputs": step.outputs}, sort_keys=True).encode())
+    for rel in sorted(set(step.code)) + sorted(set(step.inputs)):
+        h.update(rel.encode() + b"\0" + file_digest(ROOT / rel).encode() + b"\n")
+    return h.hexdigest()
+
+def load_state() -> dict:
+    try:
+        return json.loads(STATE_PATH.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_state(state: dict):
+    tmp = STATE_PATH.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state, indent=1, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, STATE_PATH)
+
+# ---------- running ----------
+
+def run_step(step: Step, previous: Optional[str], force: bool, dry_run: bool) -> dict:
+    """Runs in a pool worker. Returns {"status": ran|skipped|adopted|would-run|failed|missing, "hash", "seconds", "log"}."""
+    missing = [p for p in step.code + step.inputs if not (ROOT / p).exists()]
+    if missing:
+        return {"status": "missing", "missing": missing}
+    digest = step_hash(step)
+    outputs_ok = all((ROOT / p).exists() for p in step.outputs)
+    if not force and outputs_ok and (digest == previous or (step.fetch and previous is None)):
+        # A dump already on disk with no record is adopted rather than fetched again.
+        return {"status": "skipped" if digest == previous else "adopted", "hash": digest}
+    if dry_run:
+        return {"status": "would-run", "hash": digest}
+
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    log = LOG_DIR / f"{step.name}.log"
+    t0 = time.time()
+    with open(log, "w", encoding="utf-8") as f:
+        f.write(f"$ (cd {step.cwd} && python {' '.join(step.cmd)})\n")
+        f.flush()
+        proc = subprocess.run([sys.executable, *step.cmd], cwd=ROOT / step.cwd, stdout=f, stderr=subprocess.STDOUT,
+                              env={**os.environ, "PYTHONUNBUFFERED": "1"})
+    seconds = time.time() - t0
+    if proc.returncode != 0:
+        return {"status": "failed", "seconds": seconds, "log": str(log), "returncode": proc.returncode}
+    absent = [p for p in step.outputs if not (ROOT / p).exists()]
+    if absent:
+        return {"status": "failed", "seconds": seconds, "log": str(log), "missing_outputs": absent}
+    return {"status": "ran", "hash": digest, "seconds": seconds, "log": str(log)}
+
+def build(steps: List[Step], workers: int = os.cpu_count() or 1, force: bool = False,
+          refetch: bool = False, dry_run: bool = False) -> Dict[str, dict]:
+    by_name = {s.name: s for s in steps}
+    unknown = {d for s in steps for d in s.deps if d not in by_name}
+    if unknown:
+        raise ValueError(f"unknown dependencies: {sorted(unknown)}")
+
+    state = load_state()
+    results: Dict[str, dict] = {}
+    pending = dict(by_name)
+    running = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            for name, step in list(pending.items()):
+                deps = [results.get(d) for d in step.deps]
+                if any(r is None for r in deps):
+                    continue
+                del pending[name]
+                bad = [d for d, r in zip(step.deps, deps) if r["status"] in ("failed", "missing", "blocked")]
+                if bad:
+                    results[name] = {"status": "blocked", "by": bad}
+                    print(f"⛔ {name}: blocked by {', '.join(bad)}")
+                    continue
+                stale = [d for d, r in zip(step.deps, deps) if r["status"] == "would-run"] if dry_run else []
+                if stale:
+                    # A dependency would rerun, so this step would too; only check the inputs that dependency won't produce.
+                    produced = {p for d in stale for p in by_name[d].outputs}
+                    missing = [p for p in step.code + step.inputs if p not in produced and not (ROOT / p).exists()]
+                    results[name] = {"status": "missing", "missing": missing} if missing else {"status": "would-run", "after": stale}
+                    print(f"⚠️  {name}: missing {', '.join(missing)}" if missing else f"🔜 {name}: would run (after {', '.join(stale)})")
+                    continue
+                previous = state.get(name, {}).get("hash")
+                force_step = force or (refetch and step.fetch)
+                running[pool.submit(run_step, step, previous, force_step, dry_run)] = name
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                name = running.pop(fut)
+                r = results[name] = fut.result()
+                if r["status"] in ("ran", "adopted"):
+                    state[name] = {"hash": r["hash"], "finished": time.strftime("%Y-%m-%dT%H:%M:%S"), "seconds": round(r.get("seconds", 0), 2)}
+                    save_state(state)
+                    print(f"✅ {name} ({r['seconds']:.1f}s)" if "seconds" in r else f"📎 {name}: adopted existing output")
+                elif r["status"] == "skipped":
+                    print(f"⏭️  {name}: up to date")
+                elif r["status"] == "would-run":
+                    print(f"🔜 {name}: would run")
+                elif r["status"] == "missing":
+                    print(f"⚠️  {name}: missing {', '.join(r['missing'])}")
+                else:
+                    print(f"❌ {name}: failed (see {r['log']})")
+    return results
+
+def main():
+    ap = argparse.ArgumentParser(description="Incremental fetch → filter → export build for every city.")
+    ap.add_argument("--city", nargs="+", help="Only these cities (nyc, paris, tokyo, london, us); tiles cover just those")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Concurrent steps (default: CPU count)")
+    ap.add_argument("--force", action="store_true", help="Rerun every selected step regardless of hashes")
+    ap.add_argument("--refetch", action="store_true", help="Rerun the Overpass fetch steps")
+    ap.add_argument("--dry-run", action="store_true", help="Report what would run without running anything")
+    ap.add_argument("--list", action="store_true", help="Print the step graph and exit")
+    args = ap.parse_args()
+
+    steps = pipeline(args.city)
+    if args.list:
+        for s in steps:
+            print(f"{s.name:<24} cwd={s.cwd:<14} deps={','.join(s.deps) or '-'}")
+        return
+
+    t0 = time.time()
+    results = build(steps, args.workers, args.force, args.refetch, args.dry_run)
+    counts: Dict[str, int] = {}
+    for r in results.values():
+        counts[r["status"]] = counts.get(r["status"], 0) + 1
+    print(f"🏁 {len(results)} steps in {time.time()-t0:.1f}s — " + ", ".join(f"{v} {k}" for k, v in sorted(counts.items())))
+    if any(r["status"] in ("failed", "blocked") for r in results.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
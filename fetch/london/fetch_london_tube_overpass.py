@@ -1,14 +1,17 @@
 # save as fetch_london_tube_overpass.py
-import time, requests, json
+import argparse, gzip, sys, json
 from pathlib import Path
 from datetime import datetime
 
-OUT = Path("../data/london"); OUT.mkdir(parents=True, exist_ok=True)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "filter"))
+from overpass_json import iter_overpass_elements
+from overpass_cache import DEFAULT_CACHE_DIR, OverpassCache
+from overpass_client import MIRRORS, OverpassClient
+from overpass_diff import affected_path, update_dump
+from overpass_tiles import fetch_region, parse_grid
 
-MIRRORS = [
-    "https://overpass.kumi.systems/api/interpreter",   # often fastest
-    "https://overpass-api.de/api/interpreter",          # main
-]
+OUT = Path("../data/london")
 
 # Greater London bbox: south, west, north, east
 BBOX = (51.2868, -0.5103, 51.6919, 0.3340)
@@ -29,6 +32,22 @@ STATIONS_Q = f"""
 out body;
 """
 
+# Stages A-C as one query over a {bbox}: the same relations (with members) and
+# stations as the merged dump. --tiles runs it per tile; --update runs it over
+# BBOX as an augmented diff of that dump.
+REGION_Q = """
+[out:json][timeout:240];
+(
+  relation["route"="subway"]["network"="London Underground"]({bbox});
+  node["station"="subway"]({bbox});
+  node["railway"="station"]["subway"="yes"]({bbox});
+);
+out body;
+>;
+out skel qt;
+"""
+UPDATE_Q = REGION_Q.format(bbox=f"{BBOX[0]},{BBOX[1]},{BBOX[2]},{BBOX[3]}")
+
 def q_members(ids, batch_size=200):
     chunks = []
     for i in range(0, len(ids), batch_size):
@@ -45,75 +64,91 @@ out body;
 out skel qt;
 """
 
-def human(n):
-    for u in ("B","KB","MB","GB","TB"):
-        if n < 1024 or u == "TB": return f"{n:.2f} {u}"
-        n /= 1024
-
-def post_stream(url, data, out_path, chunk=4<<20, progress_every=0.5):
-    t0 = time.time(); n = 0; last_t = t0; last_n = 0
-    with requests.post(url, data={"data": data}, stream=True) as r:
-        try:
-            r.raise_for_status()
-        except requests.HTTPError as e:
-            body = ""
-            try: body = r.text[:2000]
-            except: pass
-            raise RuntimeError(f"Overpass error at {url}: {e}\n--- server said ---\n{body}") from None
-        r.raw.decode_content = True
-        with open(out_path, "wb") as f:
-            for b in r.iter_content(chunk_size=chunk):
-                if not b: continue
-                f.write(b); n += len(b)
-                now = time.time()
-                if now - last_t >= progress_every:
-                    dt = now - t0
-                    inst = (n - last_n) / (now - last_t) if now > last_t else 0
-                    avg = n / dt if dt > 0 else 0
-                    print(f"⬇️  {human(n)} in {dt:.1f}s | inst {human(inst)}/s, avg {human(avg)}/s")
-                    last_t = now; last_n = n
-    print(f"✅ Downloaded {n:,} bytes in {time.time()-t0:.2f}s → {out_path}")
-    # If it's suspiciously tiny, print it to help debugging
-    if n < 2048:
-        try:
-            print("--- tiny response body ---")
-            print(Path(out_path).read_text(errors="replace"))
-        except Exception:
-            pass
-
-def fetch_with_fallback(query, out_path):
-    last_err = None
-    for url in MIRRORS:
-        print(f"🌐 Trying {url} …")
-        try:
-            post_stream(url, query, out_path)
-            return
-        except Exception as e:
-            last_err = e
-            print(f"✗ Failed on {url}: {e}\n")
-    raise last_err
-
-def fetch_json_with_fallback(query: str) -> dict:
-    last_err = None
-    for url in MIRRORS:
-        try:
-            r = requests.post(url, data={"data": query}, timeout=240)
-            r.raise_for_status()
-            return r.json()
-        except Exception as e:
-            last_err = e
-            continue
-    if last_err:
-        raise last_err
-    raise RuntimeError("All mirrors failed")
+def merge_elements_stream(raw_path: Path, extra: list, out_path: Path):
+    """
+    Copy raw_path's elements element-by-element into gzip out_path, then append
+    `extra`, deduplicated on (type, id). Only the keys of `extra` are tracked, so
+    memory stays flat in the size of the dump. When an extra element is already
+    in the dump, the copy with tags wins in place (a Stage B skeleton node is
+    upgraded to the tagged station). Returns (n_copied, n_appended).
+    """
+    pending = {}
+    for el in extra:
+        pending.setdefault((el.get("type"), el.get("id")), el)
+    meta, header = {}, None
+    n_copied = 0
+    with gzip.open(out_path, "wt", encoding="utf-8") as out:
+        def write_header():
+            out.write("{")
+            for k, v in meta.items():
+                out.write(f"{json.dumps(k)}:{json.dumps(v, ensure_ascii=False)},")
+            out.write('"elements":[\n')
+            return list(meta)
+
+        for el in iter_overpass_elements(raw_path, meta):
+            if header is None:
+                header = write_header()
+            rep = pending.pop((el.get("type"), el.get("id")), None)
+            if rep is not None and rep.get("tags") and not el.get("tags"):
+                el = rep
+            out.write((",\n" if n_copied else "") + json.dumps(el, ensure_ascii=False))
+            n_copied += 1
+        if header is None:
+            header = write_header()
+        for i, el in enumerate(pending.values()):
+            out.write((",\n" if n_copied or i else "") + json.dumps(el, ensure_ascii=False))
+        out.write("\n]")
+        for k in meta:
+            if k not in header:
+                out.write(f",{json.dumps(k)}:{json.dumps(meta[k], ensure_ascii=False)}")
+        out.write("}\n")
+    return n_copied, len(pending)
 
 def main():
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    ap = argparse.ArgumentParser(description="Fetch London Underground relations, members and stations from Overpass.")
+    ap.add_argument("--hedge", action="store_true", help="Race all mirrors concurrently and keep the first answer")
+    ap.add_argument("--hedge-delay", type=float, default=0.0, help="Seconds to stagger each extra mirror in --hedge mode")
+    ap.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR, help="Overpass response cache directory")
+    ap.add_argument("--cache-ttl", type=float, default=24 * 3600, help="Seconds a cached response stays fresh (default: 1 day)")
+    ap.add_argument("--no-cache", action="store_true", help="Always hit the mirrors")
+    ap.add_argument("--stamp", default=None, help="Suffix for output names instead of the current timestamp (stable paths for build.py)")
+    ap.add_argument("--update", action="store_true",
+                    help="Bring the merged dump for --stamp (default: the newest one) up to date from an augmented diff "
+                         "instead of running stages A-C; changed ids go to <dump>.affected.json")
+    ap.add_argument("--tiles", metavar="RxC",
+                    help="Instead of stages A-C, fetch BBOX as a grid of RxC tiles (e.g. 2x2) concurrently, splitting tiles that fail")
+    ap.add_argument("--concurrency", type=int, default=2, help="Tiles in flight at once with --tiles (default: 2)")
+    ap.add_argument("--max-depth", type=int, default=3, help="Times a failing tile may be split in four (default: 3)")
+    args = ap.parse_args()
+    OUT.mkdir(parents=True, exist_ok=True)
+    # One pooled client for all stages.
+    cache = None if args.no_cache else OverpassCache(args.cache_dir, ttl=args.cache_ttl)
+    client = OverpassClient(MIRRORS, hedge=args.hedge, hedge_delay=args.hedge_delay, cache=cache)
+
+    if args.update:
+        if args.stamp:
+            merged_path = OUT / f"overpass_raw_london_{args.stamp}_with_stations.json.gz"
+        else:
+            found = sorted(OUT.glob("overpass_raw_london_*_with_stations.json.gz"), key=lambda p: p.stat().st_mtime)
+            merged_path = found[-1] if found else None
+        if merged_path is None or not merged_path.exists():
+            raise RuntimeError(f"No merged London dump to update in {OUT}; run a full fetch first.")
+        update_dump(client, UPDATE_Q, merged_path)
+        print(f"👉 Rebuild only what changed: process_tokyo_overpass.py {merged_path} --affected {affected_path(merged_path)}")
+        return
+
+    ts = args.stamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+    if args.tiles:
+        merged_path = OUT / f"overpass_raw_london_{ts}_with_stations.json.gz"
+        print(f"⏳ Fetching relations, members and stations in {args.tiles} tiles …")
+        fetch_region(client, REGION_Q, BBOX, merged_path, parse_grid(args.tiles), args.concurrency, args.max_depth)
+        print("👉 Use the *merged* file with your processor so stations appear.")
+        return
     ids_path = OUT / f"overpass_ids_london_{ts}.json"
     raw_path = OUT / f"overpass_raw_london_{ts}.json"
 
     print("⏳ Stage A: fetch Tube relation IDs (bbox + exact network)…")
-    fetch_with_fallback(Q_IDS, ids_path)
+    client.post_stream(Q_IDS, ids_path)
 
     # Parse relation ids
     data = json.loads(ids_path.read_text(errors="replace"))
@@ -126,22 +161,17 @@ def main():
     print("⏳ Stage B: fetch relation bodies and members…")
     query = q_members(rels)
     print(query)
-    fetch_with_fallback(query, raw_path)
-    #fetch_with_fallback(q_members(rels), raw_path)
+    client.post_stream(query, raw_path)
 
     # --- Stage C: fetch Tube stations and merge into raw ---
     print("⏳ Stage C: fetch Tube stations (bbox) and merge …")
-    st = fetch_json_with_fallback(STATIONS_Q)
-    
-    # Load the Stage‑B raw file, merge station nodes, write a merged file
-    raw_doc = json.loads(raw_path.read_text(errors="replace"))
-    n_before = len(raw_doc.get("elements", []))
-    s_added = len(st.get("elements", []))
-    raw_doc.setdefault("elements", []).extend(st.get("elements", []))
+    st = client.post_json(STATIONS_Q)
     
-    merged_path = OUT / f"{raw_path.stem}_with_stations.json"
-    merged_path.write_text(json.dumps(raw_doc, ensure_ascii=False), encoding="utf-8")
-    print(f"✅ Merged {s_added} stations into raw (elements {n_before} → {len(raw_doc['elements'])}) → {merged_path}")
+    # Stream the Stage‑B raw file through, merging station nodes on the way
+    merged_path = OUT / f"{raw_path.stem}_with_stations.json.gz"
+    n_before, s_added = merge_elements_stream(raw_path, st.get("elements", []), merged_path)
+    print(f"✅ Merged {len(st.get('elements', []))} stations into raw "
+          f"({s_added} new, elements {n_before} → {n_before + s_added}) → {merged_path}")
     print("👉 Use the *merged* file with your processor so stations appear.")
 
 if __name__ == "__main__":
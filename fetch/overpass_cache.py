@@ -0,0 +1,117 @@
+# save as overpass_cache.py
+"""
+Content-addressed on-disk cache for Overpass responses.
+
+Entries are keyed by sha256(normalized query + endpoint), stored gzip-compressed
+as <key>.json.gz, and described in manifest.json (endpoint, fetched_at,
+last_access, compressed size). Entries older than `ttl` seconds are stale;
+once the directory exceeds `max_bytes` the least recently used entries go.
+"""
+import gzip, hashlib, json, re, shutil, threading, time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent / ".overpass_cache"
+
+# A quoted literal (kept verbatim), or a run of whitespace and comments (one space).
+_QL_TOKEN = re.compile(r'"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\'|(?:\s+|//[^\n]*|/\*.*?\*/)+', re.S)
+
+def normalize_query(query: str) -> str:
+    """Drop comments and collapse whitespace outside string literals so cosmetic edits keep the same key."""
+    return _QL_TOKEN.sub(lambda m: m.group(0) if m.group(0)[0] in "\"'" else " ", query).strip()
+
+def cache_key(query: str, endpoint: str) -> str:
+    return hashlib.sha256(f"{normalize_query(query)}\n{endpoint}".encode("utf-8")).hexdigest()
+
+class OverpassCache:
+    def __init__(self, root: Path = DEFAULT_CACHE_DIR, ttl: float = 24 * 3600, max_bytes: int = 1 << 30,
+                 clock: Callable[[], float] = time.time):
+        self.root, self.ttl, self.max_bytes, self.clock = Path(root), ttl, max_bytes, clock
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.root / "manifest.json"
+        self.lock = threading.Lock()
+        try:
+            self.manifest: Dict[str, dict] = json.loads(self.manifest_path.read_text())
+        except (OSError, ValueError):
+            self.manifest = {}
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}.json.gz"
+
+    def _save_manifest(self):
+        tmp = self.manifest_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.manifest, indent=1))
+        tmp.replace(self.manifest_path)
+
+    def lookup(self, query: str, endpoints: Iterable[str]) -> Optional[Tuple[Path, dict]]:
+        """Freshest non-stale entry for this query from any of the endpoints."""
+        now = self.clock()
+        best = None
+        with self.lock:
+            for ep in endpoints:
+                key = cache_key(query, ep)
+                entry = self.manifest.get(key)
+                if not entry or now - entry["fetched_at"] > self.ttl or not self._path(key).exists():
+                    continue
+                if best is None or entry["fetched_at"] > best[1]["fetched_at"]:
+                    best = (key, entry)
+            if best is None:
+                return None
+            key, entry = best
+            entry["last_access"] = now
+            self._save_manifest()
+        return self._path(key), entry
+
+    def copy_to(self, query: str, endpoints: Iterable[str], out_path: Path) -> Optional[dict]:
+        """Decompress a fresh hit into out_path; returns its manifest entry or None on a miss."""
+        hit = self.lookup(query, endpoints)
+        if hit is None:
+            return None
+        with gzip.open(hit[0], "rb") as src, open(out_path, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+        return hit[1]
+
+    def read_bytes(self, query: str, endpoints: Iterable[str]) -> Optional[bytes]:
+        hit = self.lookup(query, endpoints)
+        return gzip.decompress(hit[0].read_bytes()) if hit else None
+
+    def put_file(self, query: str, endpoint: str, src_path: Path):
+        key = cache_key(query, endpoint)
+        tmp = self._path(key).with_suffix(".part")
+        with open(src_path, "rb") as src, gzip.open(tmp, "wb", compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+        self._commit(key, tmp, query, endpoint)
+
+    def put_bytes(self, query: str, endpoint: str, body: bytes):
+        key = cache_key(query, endpoint)
+        tmp = self._path(key).with_suffix(".part")
+        tmp.write_bytes(gzip.compress(body, compresslevel=6))
+        self._commit(key, tmp, query, endpoint)
+
+    def _commit(self, key: str, tmp: Path, query: str, endpoint: str):
+        tmp.replace(self._path(key))
+        now = self.clock()
+        with self.lock:
+            self.manifest[key] = {
+                "endpoint": endpoint,
+                "fetched_at": now,
+                "last_access": now,
+                "size": self._path(key).stat().st_size,
+                "query": normalize_query(query)[:200],
+            }
+            self._evict(now)
+            self._save_manifest()
+
+    def _evict(self, now: float):
+        for key in [k for k, e in self.manifest.items() if now - e["fetched_at"] > self.ttl]:
+            self._drop(key)
+        total = sum(e["size"] for e in self.manifest.values())
+        for key, entry in sorted(self.manifest.items(), key=lambda kv: kv[1]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            total -= entry["size"]
+            self._drop(key)
+
+    def _drop(self, key: str):
+        self.manifest.pop(key, None)
+        self._path(key).unlink(missing_ok=True)
@@ -0,0 +1,315 @@
+# save as overpass_client.py
+"""
+Shared Overpass client for the city fetchers.
+
+- one pooled requests.Session (keep-alive across stages and mirrors)
+- per-mirror retries with exponential backoff on 429/502/503/504 and dropped
+  connections, honoring Retry-After and the mirror's /api/status slot info
+- sequential fallback over mirrors, or "hedged": race the mirrors
+  concurrently (optionally staggered) and cancel the losers
+- an optional OverpassCache answering repeated queries from disk
+- HTTP 200 bodies ending in a runtime-error remark (timeout, out of memory)
+  raise OverpassError like a failed request and are never cached
+
+Point `mirrors` at overpass_standin.py to exercise slow, failing and
+rate-limited servers locally.
+"""
+import html, json, random, re, socket, threading, time
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence, Set, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from overpass_cache import OverpassCache
+
+MIRRORS = [
+    "https://overpass.kumi.systems/api/interpreter",   # often fastest
+    "https://overpass-api.de/api/interpreter",          # main
+]
+
+RETRY_STATUS = (429, 502, 503, 504)
+RETRY_EXC = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+REMARK_TAIL = 4096
+_REMARK_JSON = re.compile(rb'"remark"\s*:\s*"((?:[^"\\]|\\.)*)"')
+_REMARK_XML = re.compile(rb"<remark>(.*?)</remark>", re.S)
+
+class OverpassError(RuntimeError):
+    pass
+
+class _Cancelled(Exception):
+    pass
+
+def human(n):
+    for u in ("B","KB","MB","GB","TB"):
+        if n < 1024 or u == "TB": return f"{n:.2f} {u}"
+        n /= 1024
+
+def status_url(url: str) -> str:
+    return re.sub(r"/interpreter/?$", "/status", url)
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def parse_slot_wait(status_text: str) -> Optional[float]:
+    """Seconds until a query slot frees up according to /api/status (0 if one is free now)."""
+    m = re.search(r"(\d+)\s+slots? available now", status_text)
+    if m and int(m.group(1)) > 0:
+        return 0.0
+    waits = [float(s) for s in re.findall(r"in\s+(\d+)\s+seconds?", status_text)]
+    return min(waits) if waits else None
+
+def runtime_remark(tail: bytes) -> Optional[str]:
+    """
+    The runtime-error remark (timeout, out of memory) at the end of an Overpass
+    response, if any. Overpass sends it with HTTP 200 after whatever elements
+    it had produced, so such a body is incomplete.
+    """
+    m = _REMARK_JSON.search(tail)
+    if m:
+        text = json.loads(b'"' + m.group(1) + b'"')
+    else:
+        m = _REMARK_XML.search(tail)
+        if not m:
+            return None
+        text = html.unescape(m.group(1).decode("utf-8", errors="replace")).strip()
+    return text if "error" in text.lower() else None
+
+def abort_response(resp: requests.Response):
+    """Close a streaming response from another thread, unblocking a reader stuck in recv()."""
+    sock = getattr(getattr(resp.raw, "connection", None), "sock", None)
+    if sock is not None:
+        try: sock.shutdown(socket.SHUT_RDWR)
+        except OSError: pass
+    resp.close()
+
+class OverpassClient:
+    def __init__(self,
+                 mirrors: Sequence[str] = MIRRORS,
+                 timeout: Tuple[float, float] = (15, 300),
+                 retries: int = 4,
+                 backoff: float = 2.0,
+                 max_backoff: float = 120.0,
+                 hedge: bool = False,
+                 hedge_delay: float = 0.0,
+                 check_status: bool = True,
+                 session: Optional[requests.Session] = None,
+                 cache: Optional[OverpassCache] = None):
+        self.mirrors = list(mirrors)
+        self.timeout, self.retries = timeout, retries
+        self.backoff, self.max_backoff = backoff, max_backoff
+        self.hedge, self.hedge_delay = hedge, hedge_delay
+        self.check_status = check_status
+        self.cache = cache
+        if session is None:
+            # A shared session keeps its own adapters (and the connections pooled in them).
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=max(len(self.mirrors), 1), pool_maxsize=max(len(self.mirrors), 4))
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+        self.session.headers.setdefault("User-Agent", "subways-overpass-client/1.0")
+
+    # ---------- retry policy ----------
+
+    def slot_wait(self, url: str) -> Optional[float]:
+        if not self.check_status:
+            return None
+        try:
+            r = self.session.get(status_url(url), timeout=self.timeout[0])
+            return parse_slot_wait(r.text) if r.ok else None
+        except requests.RequestException:
+            return None
+
+    def retry_delay(self, url: str, attempt: int, resp: Optional[requests.Response]) -> float:
+        delay = parse_retry_after(resp.headers.get("Retry-After")) if resp is not None else None
+        if delay is None and resp is not None and resp.status_code == 429:
+            delay = self.slot_wait(url)
+        if delay is None:
+            delay = self.backoff * (2 ** attempt) * random.uniform(0.75, 1.25)
+        return min(delay, self.max_backoff)
+
+    def _request(self, url: str, query: str, consume: Callable, cancel: threading.Event,
+                 live: Optional[Set[requests.Response]] = None):
+        """POST to one mirror with retries; `consume(resp, cancel)` reads the body."""
+        live = set() if live is None else live
+        for attempt in range(self.retries + 1):
+            if cancel.is_set():
+                raise _Cancelled()
+            try:
+                resp = self.session.post(url, data={"data": query}, stream=True, timeout=self.timeout)
+                live.add(resp)
+                with resp:
+                    if resp.status_code in RETRY_STATUS and attempt < self.retries:
+                        delay = self.retry_delay(url, attempt, resp)
+                        print(f"↻ {url}: HTTP {resp.status_code}, retry {attempt+1}/{self.retries} in {delay:.1f}s")
+                    else:
+                        try:
+                            resp.raise_for_status()
+                        except requests.HTTPError as e:
+                            body = ""
+                            try: body = resp.text[:2000]
+                            except Exception: pass
+                            raise OverpassError(f"Overpass error at {url}: {e}\n--- server said ---\n{body}") from None
+                        resp.raw.decode_content = True
+                        return consume(resp, cancel)
+            except RETRY_EXC as e:
+                if cancel.is_set():
+                    raise _Cancelled()
+                if attempt >= self.retries:
+                    raise
+                delay = self.retry_delay(url, attempt, None)
+                print(f"↻ {url}: {type(e).__name__}, retry {attempt+1}/{self.retries} in {delay:.1f}s")
+            if cancel.wait(delay):
+                raise _Cancelled()
+        raise OverpassError(f"Retries exhausted at {url}")
+
+    # ---------- mirror strategies ----------
+
+    def _sequential(self, query: str, consume: Callable):
+        last_err: Optional[Exception] = None
+        for url in self.mirrors:
+            print(f"🌐 Trying {url} …")
+            try:
+                return self._request(url, query, lambda r, c: consume(url, r, c), threading.Event())
+            except Exception as e:
+                last_err = e
+                print(f"✗ Failed on {url}: {e}\n")
+        raise last_err or OverpassError("No mirrors configured")
+
+    def _hedged(self, query: str, consume: Callable, discard: Optional[Callable]):
+        """
+        Race all mirrors (mirror i starts after i * hedge_delay). The first success
+        wins and cancels the rest: their sockets are shut down and their results, if
+        they still finish, are discarded. Attempts run on daemon threads so a loser
+        stuck waiting for headers never delays the caller.
+        """
+        cancel, done, lock = threading.Event(), threading.Event(), threading.Lock()
+        live: Set[requests.Response] = set()
+        errors: List[Exception] = []
+        state = {"winner": None, "left": len(self.mirrors)}
+
+        def attempt(i: int, url: str):
+            try:
+                if i and cancel.wait(self.hedge_delay * i):
+                    return
+                print(f"🏁 Racing {url} …")
+                result = self._request(url, query, lambda r, c: consume(url, r, c), cancel, live)
+                with lock:
+                    if state["winner"] is None:
+                        state["winner"] = (url, result)
+                        cancel.set(); done.set()
+                        return
+                if discard:
+                    discard(result)
+            except _Cancelled:
+                pass
+            except Exception as e:
+                if not cancel.is_set():
+                    errors.append(e)
+                    print(f"✗ Failed on {url}: {e}\n")
+            finally:
+                with lock:
+                    state["left"] -= 1
+                    if not state["left"]:
+                        done.set()
+
+        for i, url in enumerate(self.mirrors):
+            threading.Thread(target=attempt, args=(i, url), name=f"overpass-{i}", daemon=True).start()
+        done.wait()
+        cancel.set()
+        for r in list(live):
+            abort_response(r)
+        if state["winner"] is None:
+            raise errors[-1] if errors else OverpassError("No mirrors configured")
+        url, result = state["winner"]
+        print(f"🥇 {url} won the race")
+        return result
+
+    def _run(self, query: str, consume: Callable, discard: Optional[Callable] = None):
+        if self.hedge and len(self.mirrors) > 1:
+            return self._hedged(query, consume, discard)
+        return self._sequential(query, consume)
+
+    # ---------- public API ----------
+
+    def post_stream(self, query: str, out_path: Path, chunk: int = 4 << 20, progress_every: float = 0.5) -> int:
+        """Stream the response body to out_path (via a .part file per mirror). Returns bytes written."""
+        out_path = Path(out_path)
+        t0 = time.time()
+        if self.cache is not None:
+            hit = self.cache.copy_to(query, self.mirrors, out_path)
+            if hit is not None:
+                n = out_path.stat().st_size
+                print(f"⚡ Cache hit ({hit['endpoint']}, fetched {time.time()-hit['fetched_at']:.0f}s ago): {n:,} bytes → {out_path}")
+                return n
+
+        def consume(url: str, r: requests.Response, cancel: threading.Event):
+            part = out_path.with_name(f"{out_path.name}.{self.mirrors.index(url)}.part")
+            n = 0; last_t = time.time(); last_n = 0; start = last_t
+            tail = b""
+            try:
+                with open(part, "wb") as f:
+                    for b in r.iter_content(chunk_size=chunk):
+                        if cancel.is_set():
+                            raise _Cancelled()
+                        if not b: continue
+                        f.write(b); n += len(b)
+                        tail = (tail + b[-REMARK_TAIL:])[-REMARK_TAIL:]
+                        now = time.time()
+                        if now - last_t >= progress_every:
+                            dt = now - start
+                            inst = (n - last_n) / (now - last_t) if now > last_t else 0
+                            avg = n / dt if dt > 0 else 0
+                            print(f"⬇️  {human(n)} in {dt:.1f}s | inst {human(inst)}/s, avg {human(avg)}/s")
+                            last_t = now; last_n = n
+                remark = runtime_remark(tail)
+                if remark:
+                    raise OverpassError(f"Overpass error at {url}: {remark}")
+            except BaseException:
+                part.unlink(missing_ok=True)
+                raise
+            return url, part, n
+
+        url, part, n = self._run(query, consume, discard=lambda res: res[1].unlink(missing_ok=True))
+        part.replace(out_path)
+        if self.cache is not None:
+            self.cache.put_file(query, url, out_path)
+        print(f"✅ Downloaded {n:,} bytes in {time.time()-t0:.2f}s → {out_path}")
+        # If it's suspiciously tiny, print it to help debugging
+        if n < 2048:
+            try:
+                print("--- tiny response body ---")
+                print(out_path.read_text(errors="replace"))
+            except Exception:
+                pass
+        return n
+
+    def post_json(self, query: str) -> dict:
+        if self.cache is not None:
+            body = self.cache.read_bytes(query, self.mirrors)
+            if body is not None:
+                print(f"⚡ Cache hit: {len(body):,} bytes")
+                return json.loads(body)
+        def consume(url: str, r: requests.Response, cancel: threading.Event):
+            body = r.content
+            remark = runtime_remark(body[-REMARK_TAIL:])
+            if remark:
+                raise OverpassError(f"Overpass error at {url}: {remark}")
+            return url, body
+
+        url, body = self._run(query, consume)
+        doc = json.loads(body)
+        if self.cache is not None:
+            self.cache.put_bytes(query, url, body)
+        return doc
@@ -0,0 +1,239 @@
+# save as overpass_diff.py
+"""
+Incremental Overpass updates from augmented diffs.
+
+A saved dump records when its data was current in osm3s.timestamp_osm_base.
+Instead of downloading the whole network again, update_dump() sends the same
+query with [adiff:"<that timestamp>"]. Overpass evaluates it at both points
+in time and answers (in XML, the only adiff format) with one <action> per
+element that was created, modified or deleted in between, or that entered or
+left the result set. The actions are applied to an ElementStore loaded from
+the dump, the dump is rewritten with the new timestamp, and the ids of the
+ways, relations and nodes whose output features may have changed go to a
+<dump>.affected.json sidecar (merged with one that is still there from an
+earlier update). process_tokyo_overpass.py --affected rebuilds only those
+features and then removes the sidecar.
+
+Point the client at overpass_standin.py (respond_with_diffs) to replay
+canned diffs offline.
+"""
+import gzip, json, re, sys, time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "filter"))
+from overpass_json import iter_overpass_elements
+from overpass_client import OverpassClient
+
+TYPES = ("node", "way", "relation")
+
+Key = Tuple[str, int]
+
+def dump_timestamp(path: Path) -> Optional[str]:
+    """osm3s.timestamp_osm_base of a saved dump (read from the header only)."""
+    meta: dict = {}
+    for _ in iter_overpass_elements(path, meta):
+        break
+    return (meta.get("osm3s") or {}).get("timestamp_osm_base")
+
+def adiff_query(query: str, since: str, until: Optional[str] = None) -> str:
+    """The same query as an augmented diff since `since` (until `until`, default now), with XML output."""
+    span = f'"{since}"' + (f',"{until}"' if until else "")
+    query = re.sub(r"\[\s*(adiff|diff)\s*:[^\]]*\]", "", query)
+    settings = f"[out:xml][adiff:{span}]"
+    if re.search(r"\[\s*out\s*:\s*\w+\s*\]", query):
+        return re.sub(r"\[\s*out\s*:\s*\w+\s*\]", settings, query, count=1)
+    return settings + ";\n" + query.lstrip()
+
+# ---------- augmented diff parsing ----------
+
+def element_from_xml(el: ET.Element) -> dict:
+    """An OSM XML element as the dict Overpass JSON would give for it."""
+    out = {"type": el.tag, "id": int(el.get("id"))}
+    if el.tag == "node" and el.get("lat") is not None:
+        out["lat"], out["lon"] = float(el.get("lat")), float(el.get("lon"))
+    elif el.tag == "way":
+        nds = el.findall("nd")
+        out["nodes"] = [int(nd.get("ref")) for nd in nds]
+        if nds and all(nd.get("lat") is not None for nd in nds):
+            out["geometry"] = [{"lat": float(nd.get("lat")), "lon": float(nd.get("lon"))} for nd in nds]
+    elif el.tag == "relation":
+        out["members"] = [{"type": m.get("type"), "ref": int(m.get("ref")), "role": m.get("role", "")}
+                          for m in el.findall("member")]
+    tags = {t.get("k"): t.get("v") for t in el.findall("tag")}
+    if tags:
+        out["tags"] = tags
+    return out
+
+def _action_element(action: ET.Element, side: str) -> Optional[dict]:
+    holder = action.find(side)
+    if holder is None:
+        holder = action if side == "new" and action.get("type") == "create" else None
+    if holder is None:
+        return None
+    for child in holder:
+        if child.tag in TYPES:
+            return element_from_xml(child)
+    return None
+
+def iter_adiff(path: Path, meta: Optional[dict] = None) -> Iterator[Tuple[str, Optional[dict], Optional[dict]]]:
+    """
+    Yield (action, old, new) per <action> of an augmented diff: "create" has
+    only `new`, "delete" has `old` (its `new` is the element when it merely
+    left the result set). meta receives osm_base from the <meta> element.
+    Raises RuntimeError on an Overpass <remark>, so a partial diff is never applied.
+    """
+    meta = {} if meta is None else meta
+    with open(path, "rb") as f:
+        head = f.read(2)
+    opener = gzip.open if head == b"\x1f\x8b" else open
+    with opener(path, "rb") as fh:
+        for _, el in ET.iterparse(fh, events=("end",)):
+            if el.tag == "meta":
+                meta.update(el.attrib)
+            elif el.tag == "remark":
+                raise RuntimeError(f"Overpass remark in augmented diff: {(el.text or '').strip()}")
+            elif el.tag == "action":
+                kind = el.get("type")
+                yield kind, _action_element(el, "old"), _action_element(el, "new")
+                el.clear()
+
+# ---------- local element store ----------
+
+class ElementStore:
+    """
+    The elements of a dump keyed by (type, id), plus its top-level members
+    (version, generator, osm3s, ...). Small enough to hold for one city.
+    """
+
+    def __init__(self, elements: Dict[Key, dict], meta: dict):
+        self.elements, self.meta = elements, meta
+
+    @classmethod
+    def load(cls, path: Path) -> "ElementStore":
+        meta: dict = {}
+        elements: Dict[Key, dict] = {}
+        for el in iter_overpass_elements(path, meta):
+            elements[(el.get("type"), el.get("id"))] = el
+        return cls(elements, meta)
+
+    @property
+    def timestamp(self) -> Optional[str]:
+        return (self.meta.get("osm3s") or {}).get("timestamp_osm_base")
+
+    def apply(self, actions) -> Tuple[Dict[str, Set[int]], Dict[Key, dict], Dict[str, int]]:
+        """
+        Apply (action, old, new) tuples. Returns (changed ids per type, the
+        store's previous version of each changed element, action counts).
+        Within one diff an untagged copy never replaces a tagged one: a station
+        that is also a relation member comes back from `>` as a skeleton too.
+        """
+        changed: Dict[str, Set[int]] = {t: set() for t in TYPES}
+        before: Dict[Key, dict] = {}
+        counts = {"create": 0, "modify": 0, "delete": 0}
+        for kind, old, new in actions:
+            el = (old or new) if kind == "delete" else new
+            if el is None:
+                continue
+            key = (el["type"], el["id"])
+            counts[kind] = counts.get(kind, 0) + 1
+            changed[key[0]].add(key[1])
+            if key in before:
+                cur = self.elements.get(key)
+                if kind != "delete" and cur is not None and cur.get("tags") and not new.get("tags"):
+                    continue
+            else:
+                before[key] = self.elements.get(key)
+            if kind == "delete":
+                self.elements.pop(key, None)
+            else:
+                self.elements[key] = new
+        return changed, {k: v for k, v in before.items() if v is not None}, counts
+
+    def affected(self, changed: Dict[str, Set[int]], before: Dict[Key, dict]) -> Dict[str, List[int]]:
+        """
+        Ids whose output features may differ: changed elements, ways using a
+        changed node, old and new member ways of changed relations, and
+        relations with a changed member. Deleted ids are included.
+        """
+        nodes, ways, rels = set(changed["node"]), set(changed["way"]), set(changed["relation"])
+        for rid in changed["relation"]:
+            for rel in (self.elements.get(("relation", rid)), before.get(("relation", rid))):
+                for m in (rel or {}).get("members", []):
+                    if m.get("type") == "way":
+                        ways.add(m["ref"])
+        if nodes:
+            for (kind, wid), w in self.elements.items():
+                if kind == "way" and wid not in ways and not nodes.isdisjoint(w.get("nodes") or ()):
+                    ways.add(wid)
+        for (kind, rid), r in self.elements.items():
+            if kind == "relation" and rid not in rels:
+                for m in r.get("members", []):
+                    if (m.get("type") == "way" and m["ref"] in ways) or (m.get("type") == "node" and m["ref"] in nodes):
+                        rels.add(rid)
+                        break
+        return {"node": sorted(nodes), "way": sorted(ways), "relation": sorted(rels)}
+
+    def save(self, path: Path):
+        """Write an Overpass JSON dump (gzip for .gz): header members, then nodes, ways, relations."""
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        opener = gzip.open if path.suffix == ".gz" else open
+        with opener(tmp, "wt", encoding="utf-8") as out:
+            out.write("{")
+            for k, v in self.meta.items():
+                out.write(f"{json.dumps(k)}:{json.dumps(v, ensure_ascii=False)},")
+            out.write('"elements":[\n')
+            n = 0
+            for t in TYPES:
+                for (kind, _), el in self.elements.items():
+                    if kind == t:
+                        out.write((",\n" if n else "") + json.dumps(el, ensure_ascii=False))
+                        n += 1
+            out.write("\n]}\n")
+        tmp.replace(path)
+
+def affected_path(dump: Path) -> Path:
+    return dump.with_name(dump.name + ".affected.json")
+
+def update_dump(client: OverpassClient, query: str, dump: Path, out: Optional[Path] = None) -> dict:
+    """
+    Bring `dump` (written by `query`) up to date through an augmented diff and
+    write it to `out` (default: in place) plus the affected-ids sidecar.
+    Returns the sidecar contents.
+    """
+    dump, out = Path(dump), Path(out or dump)
+    since = dump_timestamp(dump)
+    if not since:
+        raise RuntimeError(f"{dump} has no osm3s.timestamp_osm_base; fetch it in full first")
+    # Diffs are never cached: the same `since` means a different answer later on.
+    diff_client = OverpassClient(client.mirrors, timeout=client.timeout, retries=client.retries,
+                                 hedge=client.hedge, hedge_delay=client.hedge_delay, session=client.session)
+    diff_path = out.with_name(out.name + ".adiff.xml")
+    print(f"⏳ Augmented diff since {since} …")
+    diff_client.post_stream(adiff_query(query, since), diff_path)
+
+    t0 = time.time()
+    store = ElementStore.load(dump)
+    diff_meta: dict = {}
+    changed, before, counts = store.apply(iter_adiff(diff_path, diff_meta))
+    until = diff_meta.get("osm_base") or since
+    store.meta.setdefault("osm3s", {})["timestamp_osm_base"] = until
+    hit = store.affected(changed, before)
+    store.save(out)
+    report = {"since": since, "until": until, "dump": out.name, "actions": counts, **hit}
+    side = affected_path(out)
+    if side.exists():
+        # Not yet consumed by the processor: the layers still predate that update too.
+        prev = json.loads(side.read_text(encoding="utf-8"))
+        report["since"] = prev.get("since", since)
+        report["actions"] = {k: v + prev.get("actions", {}).get(k, 0) for k, v in counts.items()}
+        for t in TYPES:
+            report[t] = sorted(set(report[t]) | set(prev.get(t, ())))
+    side.write_text(json.dumps(report, indent=1), encoding="utf-8")
+    diff_path.unlink(missing_ok=True)
+    print(f"✅ {since} → {until}: {counts['create']} created, {counts['modify']} modified, {counts['delete']} deleted "
+          f"| affected ways {len(hit['way']):,}, relations {len(hit['relation']):,}, nodes {len(hit['node']):,} "
+          f"({time.time()-t0:.2f}s) → {out}")
+    return report
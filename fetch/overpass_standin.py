@@ -0,0 +1,154 @@
+# save as overpass_standin.py
+"""
+Local stand-in for Overpass mirrors, for exercising overpass_client.py offline.
+
+Each mirror is a path prefix on one server; the first path segment picks its
+behaviour and the rest must be /api/interpreter (POST) or /api/status (GET):
+
+    /ok/api/interpreter            canned response immediately
+    /slow-3/api/interpreter        wait 3 s before sending headers
+    /trickle-0.2/api/interpreter   send the body in small pieces, 0.2 s apart
+    /fail-504/api/interpreter      always answer HTTP 504
+    /limited-2/api/interpreter     429 + Retry-After: 1 for the first 2 requests
+    /busy-2/api/interpreter        429 without Retry-After; /busy-2/api/status
+                                   reports a free slot "in 2 seconds"
+
+Augmented-diff queries ([adiff:"<since>"], see overpass_diff.py) are answered
+from canned diffs keyed by <since> when given (respond_with_diffs); a <since>
+without one gets an empty diff, as when nothing changed.
+
+Run it:  python overpass_standin.py response.json --port 8765
+         python overpass_standin.py dump.json --adiff 2024-01-01T00:00:00Z=changes.adiff.xml
+"""
+import argparse, re, threading, time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, Optional
+from urllib.parse import parse_qs
+
+_MIRROR = re.compile(r"^/(?P<mode>[a-z]+)(?:-(?P<arg>[\d.]+))?/api/(?P<ep>interpreter|status)/?$")
+_ADIFF = re.compile(r'\[\s*adiff\s*:\s*"(?P<since>[^"]+)"')
+
+def empty_adiff(osm_base: str) -> bytes:
+    return (f'<?xml version="1.0" encoding="UTF-8"?>\n<osm version="0.6" generator="overpass_standin">\n'
+            f'<meta osm_base="{osm_base}"/>\n</osm>\n').encode()
+
+def respond_with_diffs(body: bytes, diffs: Dict[str, bytes]) -> Callable[[str], bytes]:
+    """A `respond` callable: `body` for ordinary queries, diffs[since] for adiff queries."""
+    def respond(query: str) -> bytes:
+        m = _ADIFF.search(query)
+        if not m:
+            return body
+        return diffs.get(m["since"]) or empty_adiff(m["since"])
+    return respond
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    body: bytes = b'{"version":0.6,"elements":[]}'
+    respond: Optional[Callable[[str], bytes]] = None   # query text -> body (or (status, body)), overrides `body`
+    hits: Counter = Counter()
+    lock = threading.Lock()
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, ctype="application/json", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _mirror(self):
+        m = _MIRROR.match(self.path)
+        if not m:
+            self._send(404, b"unknown stand-in mirror", "text/plain")
+            return None
+        with self.lock:
+            self.hits[self.path] += 1
+            n = self.hits[self.path]
+        return m["mode"], float(m["arg"] or 0), m["ep"], n
+
+    def do_GET(self):
+        mirror = self._mirror()
+        if not mirror:
+            return
+        mode, arg, ep, _ = mirror
+        if ep != "status":
+            return self._send(405, b"POST queries to /api/interpreter", "text/plain")
+        if mode == "busy":
+            text = f"Rate limit: 2\n0 slots available now.\nSlot available after: soon, in {int(arg)} seconds.\n"
+        else:
+            text = "Rate limit: 2\n2 slots available now.\n"
+        self._send(200, text.encode(), "text/plain")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length).decode("utf-8", errors="replace")
+        mirror = self._mirror()
+        if not mirror:
+            return
+        mode, arg, ep, n = mirror
+        query = (parse_qs(raw).get("data") or [""])[0]
+        body = self.respond(query) if self.respond else self.body
+        if isinstance(body, tuple):   # respond() chose an HTTP error for this query
+            return self._send(body[0], body[1], "text/plain")
+
+        if mode == "fail":
+            return self._send(int(arg or 504), b"stand-in failure", "text/plain")
+        if mode == "limited" and n <= arg:
+            return self._send(429, b"rate limited", "text/plain", {"Retry-After": "1"})
+        if mode == "busy" and n == 1:
+            return self._send(429, b"rate limited", "text/plain")
+        ctype = "application/osm3s+xml" if body.lstrip()[:1] == b"<" else "application/json"
+        if mode == "slow":
+            time.sleep(arg)
+        if mode == "trickle":
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            try:
+                for i in range(0, len(body), 64):
+                    self.wfile.write(body[i:i+64]); self.wfile.flush()
+                    time.sleep(arg)
+            except (BrokenPipeError, ConnectionResetError):
+                pass   # the client cancelled this mirror
+            return
+        self._send(200, body, ctype)
+
+def serve_standin(body: bytes = StandinHandler.body, port: int = 0,
+                  respond: Optional[Callable[[str], bytes]] = None) -> ThreadingHTTPServer:
+    """Start the stand-in on a background thread; mirror URLs are f"http://127.0.0.1:{port}/<mode>/api/interpreter"."""
+    handler = type("Handler", (StandinHandler,), {"body": body, "respond": staticmethod(respond) if respond else None,
+                                                  "hits": Counter(), "lock": threading.Lock()})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    ap = argparse.ArgumentParser(description="Serve simulated Overpass mirrors (slow / failing / rate-limited).")
+    ap.add_argument("response", type=Path, nargs="?", help="Canned JSON body returned to every query")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--adiff", nargs="+", default=[], metavar="SINCE=FILE",
+                    help="Canned augmented diff (OSM XML) returned to [adiff:\"SINCE\"] queries")
+    args = ap.parse_args()
+    body = args.response.read_bytes() if args.response else StandinHandler.body
+    diffs = {}
+    for spec in args.adiff:
+        since, _, path = spec.partition("=")
+        diffs[since] = Path(path).read_bytes()
+    server = serve_standin(body, args.port, respond_with_diffs(body, diffs))
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"🧪 Stand-in Overpass at {base} — e.g. {base}/ok/api/interpreter, {base}/limited-2/api/interpreter")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
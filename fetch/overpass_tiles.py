@@ -0,0 +1,151 @@
+# save as overpass_tiles.py
+"""
+Tiled, concurrent Overpass fetches for regions too large for one query.
+
+A query template with a {bbox} placeholder (south,west,north,east, as in
+Overpass bbox filters) is run once per tile of a rows x cols grid over the
+region, up to `concurrency` tiles at a time. A tile that fails (HTTP error
+after the client's retries, dropped connection) or comes back with an
+Overpass runtime-error remark (timeout, out of memory) is split into 2 x 2
+and its quarters queued, down to `max_depth` splits. Tile responses are then
+merged into one Overpass JSON dump, deduplicated on (type, id): elements near
+tile edges and members pulled in by `>` appear in several tiles. Wall time
+follows the slowest tile rather than the whole region.
+
+Public mirrors give each client about two query slots; more concurrency than
+that just waits in the client's 429 / slot handling.
+"""
+import gzip, json, shutil, sys, tempfile, time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "filter"))
+from overpass_json import iter_overpass_elements
+from overpass_client import OverpassClient, OverpassError
+
+BBox = Tuple[float, float, float, float]   # south, west, north, east
+
+# The client raises OverpassError for runtime-error remarks too (and never caches those).
+TILE_ERRORS = (OverpassError, requests.RequestException)
+
+def parse_grid(spec: str) -> Tuple[int, int]:
+    """"3x2" → (3 rows, 2 cols); "4" → (4, 4)."""
+    rows, _, cols = spec.lower().partition("x")
+    return int(rows), int(cols or rows)
+
+def split_bbox(bbox: BBox, rows: int, cols: int) -> List[BBox]:
+    s, w, n, e = bbox
+    dy, dx = (n - s) / rows, (e - w) / cols
+    return [(s + i * dy, w + j * dx, s + (i + 1) * dy, w + (j + 1) * dx) for i in range(rows) for j in range(cols)]
+
+def bbox_filter(bbox: BBox) -> str:
+    return ",".join(f"{v:.7f}" for v in bbox)
+
+def fetch_tiles(client: OverpassClient, template: str, bbox: BBox, work_dir: Path, grid: Tuple[int, int] = (2, 2),
+                concurrency: int = 2, max_depth: int = 3, tile_retries: int = 1) -> List[Path]:
+    """
+    Run template.format(bbox=...) per tile under `concurrency` workers,
+    subdividing failed tiles. Returns the tile response files, in region order.
+    Raises OverpassError if a tile still fails at max_depth.
+    """
+    # Few retries per tile: a timing-out tile is better split than re-sent.
+    tile_client = OverpassClient(client.mirrors, timeout=client.timeout, retries=tile_retries, backoff=client.backoff,
+                                 max_backoff=client.max_backoff, hedge=client.hedge, hedge_delay=client.hedge_delay,
+                                 check_status=client.check_status, cache=client.cache)
+    adapter = HTTPAdapter(pool_connections=max(len(client.mirrors), 1), pool_maxsize=max(concurrency, 4))
+    tile_client.session.mount("http://", adapter)
+    tile_client.session.mount("https://", adapter)
+
+    def run(tile_id: str, tile: BBox) -> Path:
+        out = work_dir / f"tile_{tile_id}.json"
+        query = template.format(bbox=bbox_filter(tile))
+        tile_client.post_stream(query, out, progress_every=5.0)
+        return out
+
+    t0 = time.time()
+    done: Dict[str, Path] = {}
+    queue = [(f"{i:02d}", t, 0) for i, t in enumerate(split_bbox(bbox, *grid))]
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="overpass-tile") as pool:
+        running = {}
+        while queue or running:
+            while queue and len(running) < concurrency:
+                tile_id, tile, depth = queue.pop(0)
+                running[pool.submit(run, tile_id, tile)] = (tile_id, tile, depth)
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                tile_id, tile, depth = running.pop(fut)
+                try:
+                    done[tile_id] = fut.result()
+                    print(f"🧩 tile {tile_id} ({bbox_filter(tile)}) ✓ {done[tile_id].stat().st_size:,} bytes")
+                except TILE_ERRORS as e:
+                    if depth >= max_depth:
+                        raise OverpassError(f"tile {tile_id} ({bbox_filter(tile)}) failed after {depth} splits: {e}") from e
+                    print(f"✂️  tile {tile_id} failed ({str(e).splitlines()[0][:120]}); splitting into 4")
+                    queue += [(f"{tile_id}.{k}", t, depth + 1) for k, t in enumerate(split_bbox(tile, 2, 2))]
+    print(f"✅ {len(done)} tiles in {time.time()-t0:.2f}s")
+    return [done[k] for k in sorted(done)]
+
+def merge_tiles(paths: List[Path], out_path: Path) -> Tuple[int, int]:
+    """
+    Merge tile dumps into one Overpass JSON dump (gzip for .gz), unique on
+    (type, id). A tagged copy wins over a skeleton one (`out skel` of a member
+    in one tile, `out body` of the same node in another). The header is the
+    first tile's, with the oldest timestamp_osm_base of all tiles, so an
+    augmented diff from it misses nothing. Returns (written, duplicates dropped).
+    """
+    # Pass 1: which keys have a tagged copy anywhere, and the tiles' timestamps.
+    tagged: Dict[str, Set[int]] = {"node": set(), "way": set(), "relation": set()}
+    metas: List[dict] = []
+    for p in paths:
+        meta: dict = {}
+        for el in iter_overpass_elements(p, meta):
+            if el.get("tags"):
+                tagged.setdefault(el.get("type"), set()).add(el.get("id"))
+        metas.append(meta)
+    header = {k: v for k, v in (metas[0] if metas else {}).items() if k != "remark"}
+    stamps = [m.get("osm3s", {}).get("timestamp_osm_base") for m in metas]
+    stamps = [s for s in stamps if s]
+    if stamps:
+        header["osm3s"] = {**header.get("osm3s", {}), "timestamp_osm_base": min(stamps)}
+
+    # Pass 2: first tagged copy of a tagged key, first copy of the rest.
+    seen: Dict[str, Set[int]] = {t: set() for t in tagged}
+    n = dup = 0
+    tmp = out_path.with_name(out_path.name + ".tmp")
+    opener = gzip.open if out_path.suffix == ".gz" else open
+    with opener(tmp, "wt", encoding="utf-8") as out:
+        out.write("{")
+        for k, v in header.items():
+            out.write(f"{json.dumps(k)}:{json.dumps(v, ensure_ascii=False)},")
+        out.write('"elements":[\n')
+        for p in paths:
+            for el in iter_overpass_elements(p):
+                kind, eid = el.get("type"), el.get("id")
+                ids = seen.setdefault(kind, set())
+                if eid in ids or (not el.get("tags") and eid in tagged.get(kind, ())):
+                    dup += 1
+                    continue
+                ids.add(eid)
+                out.write((",\n" if n else "") + json.dumps(el, ensure_ascii=False))
+                n += 1
+        out.write("\n]}\n")
+    tmp.replace(out_path)
+    return n, dup
+
+def fetch_region(client: OverpassClient, template: str, bbox: BBox, out_path: Path, grid: Tuple[int, int] = (2, 2),
+                 concurrency: int = 2, max_depth: int = 3, keep_tiles: bool = False) -> int:
+    """fetch_tiles + merge_tiles into out_path; returns the number of elements written."""
+    out_path = Path(out_path)
+    work_dir = Path(tempfile.mkdtemp(prefix=out_path.name + ".tiles-", dir=out_path.parent))
+    try:
+        paths = fetch_tiles(client, template, bbox, work_dir, grid, concurrency, max_depth)
+        n, dup = merge_tiles(paths, out_path)
+        print(f"🧷 merged {len(paths)} tiles: {n:,} elements ({dup:,} duplicates dropped) → {out_path}")
+        return n
+    finally:
+        if not keep_tiles:
+            shutil.rmtree(work_dir, ignore_errors=True)
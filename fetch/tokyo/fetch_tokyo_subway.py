@@ -1,18 +1,24 @@
 # save as fetch_tokyo_subway_stream.py
+import argparse
 import json
 import gzip
+import sys
 import time
 import shutil
 from datetime import datetime
 from pathlib import Path
+from typing import Optional
 
-import requests
 import geopandas as gpd
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from overpass_cache import DEFAULT_CACHE_DIR, OverpassCache
+from overpass_client import MIRRORS, OverpassClient
+from overpass_diff import affected_path, update_dump
+from overpass_tiles import fetch_region, parse_grid
+
 OUT_DIR = Path("data_tokyo")
 ARCHIVE_DIR = OUT_DIR / "archive"
-OUT_DIR.mkdir(parents=True, exist_ok=True)
-ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
 
 OVERPASS_URL = "https://overpass-api.de/api/interpreter"
 
@@ -40,6 +46,26 @@ out body;
 out skel qt;
 """
 
+# --tiles: the same selection by bbox instead of the prefecture area, so the
+# region can be cut into tiles ({bbox} is filled in per tile).
+TOKYO_BBOX = (35.50, 138.94, 35.90, 139.93)   # south, west, north, east (mainland Tokyo)
+TILE_QUERY = r"""
+[out:json][timeout:120];
+(
+  relation["route"="subway"]({bbox});
+  relation["route"="light_rail"]({bbox});
+  way["railway"="subway"]({bbox});
+
+  node["station"="subway"]({bbox});
+  node["railway"="station"]["station"="subway"]({bbox});
+  node["railway"="station"]["subway"="yes"]({bbox});
+);
+
+out body;
+>;
+out skel qt;
+"""
+
 def archive_existing_outputs():
     """
     Move any existing outputs in OUT_DIR that match known patterns to ARCHIVE_DIR,
@@ -51,6 +77,7 @@ def archive_existing_outputs():
         "tokyo_subway_routes*.geojson",
         "tokyo_subway_stations*.geojson",
     ]
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
     moved = 0
     for pat in patterns:
         for p in OUT_DIR.glob(pat):
@@ -63,46 +90,20 @@ def archive_existing_outputs():
     if moved == 0:
         print("🗂️  No existing outputs to archive.")
 
-def overpass_stream_to_file(query: str,
-                            url: str = OVERPASS_URL,
+def overpass_stream_to_file(client: OverpassClient,
+                            query: str,
+                            url: Optional[str] = None,
                             out_path: Path = OUT_DIR / "overpass_raw_tokyo.json",
                             chunk_bytes: int = 1 << 20):
     """
-    POST Overpass QL and stream (auto-decompressed) JSON bytes to disk with progress.
-    Returns (elapsed_seconds, bytes_written).
+    POST Overpass QL and stream (auto-decompressed) JSON bytes to disk with progress,
+    through `client` (pooled session, retries, mirror fallback).
+    Pass `url` to pin a single mirror. Returns (elapsed_seconds, bytes_written).
     """
     start = time.time()
-    bytes_written = 0
-
-    with requests.post(url, data={"data": query}, stream=True) as r:
-        r.raise_for_status()
-        # Ensure transparent gzip decompression by requests
-        r.raw.decode_content = True
-        total = int(r.headers.get("Content-Length", 0))
-        enc = r.headers.get("Content-Encoding", "identity")
-        print(f"ℹ️  Content-Encoding: {enc}")
-
-        last_t = start
-        last_b = 0
-
-        with open(out_path, "wb") as f:
-            for chunk in r.iter_content(chunk_size=chunk_bytes):
-                if not chunk:
-                    continue
-                f.write(chunk)
-                bytes_written += len(chunk)
-
-                now = time.time()
-                if now - last_t >= 0.5:  # update ~2x/sec
-                    speed = (bytes_written - last_b) / max(now - last_t, 1e-9)
-                    if total:
-                        pct = 100 * bytes_written / total
-                        print(f"\r↓ {bytes_written:,}/{total:,} bytes ({pct:5.1f}%) @ {speed/1e6:.2f} MB/s", end="")
-                    else:
-                        print(f"\r↓ {bytes_written:,} bytes @ {speed/1e6:.2f} MB/s", end="")
-                    last_t, last_b = now, bytes_written
-
-    print()  # newline
+    if url is not None:
+        client = OverpassClient([url], session=client.session, cache=client.cache)
+    bytes_written = client.post_stream(query, out_path, chunk=chunk_bytes)
     return time.time() - start, bytes_written
 
 def load_overpass_json_auto(path: Path):
@@ -146,16 +147,52 @@ def timed_json_dump(obj, out_path: Path, ensure_ascii: bool = False):
     print(f"💾 Wrote {size:,} bytes to {out_path} in {elapsed:.2f}s")
     return elapsed, size
 
-# --- Pre-run: archive existing outputs, then set timestamped targets ---
-archive_existing_outputs()
-TS = datetime.now().strftime("%Y%m%d_%H%M%S")
-
-raw_overpass_path = OUT_DIR / f"overpass_raw_tokyo_{TS}.json"
-final_all_path    = OUT_DIR / f"tokyo_subway_all_{TS}.geojson"
-routes_path       = OUT_DIR / f"tokyo_subway_routes_{TS}.geojson"
-stations_path     = OUT_DIR / f"tokyo_subway_stations_{TS}.geojson"
-
-# --- Download ---
-print("⏳ Querying Overpass (streaming, auto-decompress)…")
-dl_s, dl_bytes = overpass_stream_to_file(query, out_path=raw_overpass_path)
-print(f"✅ Downloaded {dl_bytes:,} bytes in {dl_s:.2f}s")
+def main():
+    ap = argparse.ArgumentParser(description="Fetch Tokyo subway/light_rail relations, ways and stations from Overpass.")
+    ap.add_argument("--out", type=Path, help="Raw dump path (default: data_tokyo/overpass_raw_tokyo_<timestamp>.json)")
+    ap.add_argument("--no-archive", action="store_true", help="Leave existing outputs in place instead of moving them to archive/")
+    ap.add_argument("--update", action="store_true",
+                    help="Bring the existing --out dump up to date from an augmented diff since its timestamp_osm_base "
+                         "instead of downloading everything; changed ids go to <out>.affected.json")
+    ap.add_argument("--tiles", metavar="RxC",
+                    help="Fetch --bbox as a grid of RxC tiles (e.g. 2x2), concurrently, splitting tiles that fail")
+    ap.add_argument("--bbox", type=float, nargs=4, default=TOKYO_BBOX, metavar=("S", "W", "N", "E"),
+                    help="Region for --tiles (default: mainland Tokyo)")
+    ap.add_argument("--concurrency", type=int, default=2, help="Tiles in flight at once with --tiles (default: 2)")
+    ap.add_argument("--max-depth", type=int, default=3, help="Times a failing tile may be split in four (default: 3)")
+    ap.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR, help="Overpass response cache directory")
+    ap.add_argument("--cache-ttl", type=float, default=24 * 3600, help="Seconds a cached response stays fresh (default: 1 day)")
+    ap.add_argument("--no-cache", action="store_true", help="Always hit the mirrors")
+    args = ap.parse_args()
+    cache = None if args.no_cache else OverpassCache(args.cache_dir, ttl=args.cache_ttl)
+    client = OverpassClient([OVERPASS_URL] + [m for m in MIRRORS if m != OVERPASS_URL], cache=cache)
+
+    if args.update:
+        if not (args.out and args.out.exists()):
+            ap.error("--update needs --out pointing at an existing dump")
+        update_dump(client, query, args.out)
+        print(f"👉 Rebuild only what changed: process_tokyo_overpass.py {args.out} --affected {affected_path(args.out)}")
+        return
+
+    # --- Pre-run: archive existing outputs, then set timestamped targets ---
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    if not args.no_archive:
+        archive_existing_outputs()
+    TS = datetime.now().strftime("%Y%m%d_%H%M%S")
+    raw_overpass_path = args.out or OUT_DIR / f"overpass_raw_tokyo_{TS}.json"
+    raw_overpass_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # --- Download ---
+    if args.tiles:
+        print(f"⏳ Querying Overpass in {args.tiles} tiles over {args.bbox} …")
+        t0 = time.time()
+        fetch_region(client, TILE_QUERY, tuple(args.bbox), raw_overpass_path, parse_grid(args.tiles),
+                     args.concurrency, args.max_depth)
+        print(f"✅ Fetched {raw_overpass_path.stat().st_size:,} bytes in {time.time()-t0:.2f}s → {raw_overpass_path}")
+        return
+    print("⏳ Querying Overpass (streaming, auto-decompress)…")
+    dl_s, dl_bytes = overpass_stream_to_file(client, query, out_path=raw_overpass_path)
+    print(f"✅ Downloaded {dl_bytes:,} bytes in {dl_s:.2f}s → {raw_overpass_path}")
+
+if __name__ == "__main__":
+    main()
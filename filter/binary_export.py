@@ -0,0 +1,151 @@
+# save as binary_export.py
+"""
+Binary, pre-projected layer bundles the viewer can map straight into typed arrays.
+
+<stem>.bin (little-endian, every section 4-byte aligned):
+
+    0   char[4]  magic "SUBW"
+    4   uint16   version (1)
+    6   uint8    shapely.GeometryType of the ragged arrays (Multi* when singles and multis mix)
+    7   uint8    number of offset arrays (0-3, outermost last)
+    8   uint32   n_features
+    12  uint32   n_coords
+    16  float64  origin x   (Web Mercator metres)
+    24  float64  origin y
+    32  uint32   length of offset array 0, 1, 2
+    44  uint32   reserved
+    48  uint8    per-feature shapely.GeometryType, padded to 4
+        uint32   offset arrays as written by shapely.to_ragged_array
+        float32  interleaved x, y in metres relative to the origin
+
+<stem>.props.json holds {"columns": [...], "rows": [[...], ...]} plus the header
+fields, so attributes stay tiny and only get parsed when a tooltip needs them.
+read_bundle() is the Python reader used for round trips; compare() puts sizes and
+load times next to the GeoJSON source.
+"""
+import argparse, gzip, json, struct, time
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+import shapely
+import geopandas as gpd
+
+from lod import human, json_properties
+
+MAGIC = b"SUBW"
+VERSION = 1
+HEADER = struct.Struct("<4sHBBIIdd3II")
+FAMILY = {0: 0, 4: 0, 1: 1, 5: 1, 3: 2, 6: 2}   # GeometryType → point / line / polygon
+
+def _pad4(b: bytes) -> bytes:
+    return b + b"\0" * (-len(b) % 4)
+
+def export_bundle(gdf: gpd.GeoDataFrame, out_stem: Path) -> Tuple[Path, Path]:
+    """Write <out_stem>.bin and <out_stem>.props.json for one single-family layer."""
+    gdf = gdf.set_crs(4326) if gdf.crs is None else gdf
+    keep = ~(gdf.geometry.isna() | gdf.geometry.is_empty)
+    if (~keep).any():
+        print(f"⚠️  {out_stem.name}: dropping {int((~keep).sum())} empty geometries")
+    gdf = gdf[keep].reset_index(drop=True)
+    merc = shapely.force_2d(gdf.geometry.to_crs(3857).values)
+
+    types = shapely.get_type_id(merc).astype(np.uint8)
+    families = {FAMILY.get(int(t), -1) for t in np.unique(types)}
+    if len(families) > 1 or -1 in families:
+        raise ValueError(f"{out_stem.name}: mixed geometry families {sorted(set(types.tolist()))}; export one family per bundle")
+    ragged_type, coords, offsets = shapely.to_ragged_array(merc, include_z=False)
+    family = families.pop() if families else 0
+
+    origin = coords.min(axis=0) if len(coords) else np.zeros(2)
+    rel = (coords - origin).astype(np.float32)
+    lens = [len(o) for o in offsets] + [0] * (3 - len(offsets))
+
+    bin_path = out_stem.with_suffix(".bin")
+    with open(bin_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, int(ragged_type), len(offsets), len(gdf), len(rel),
+                            float(origin[0]), float(origin[1]), *lens, 0))
+        f.write(_pad4(types.tobytes()))
+        for o in offsets:
+            f.write(np.asarray(o, dtype="<u4").tobytes())
+        f.write(np.ascontiguousarray(rel, dtype="<f4").tobytes())
+
+    props = gdf.drop(columns=gdf.geometry.name)
+    table = {
+        "bundle": bin_path.name, "crs": "EPSG:3857", "origin": [float(origin[0]), float(origin[1])],
+        "family": ["point", "line", "polygon"][family], "n_features": len(gdf),
+        "columns": list(props.columns),
+        "rows": [list(json_properties(r).values()) for r in props.to_dict("records")],
+    }
+    props_path = out_stem.with_suffix(".props.json")
+    props_path.write_text(json.dumps(table, separators=(",", ":"), ensure_ascii=False, default=str), encoding="utf-8")
+    return bin_path, props_path
+
+def read_arrays(bin_path: Path) -> dict:
+    """Zero-copy views over a bundle, the same way the browser reads it."""
+    buf = Path(bin_path).read_bytes()
+    magic, version, ragged_type, n_off, n_feat, n_coords, ox, oy, l0, l1, l2, _ = HEADER.unpack_from(buf, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{bin_path}: not a v{VERSION} SUBW bundle")
+    pos = HEADER.size
+    types = np.frombuffer(buf, dtype=np.uint8, count=n_feat, offset=pos)
+    pos += n_feat + (-n_feat % 4)
+    offsets = []
+    for n in (l0, l1, l2)[:n_off]:
+        offsets.append(np.frombuffer(buf, dtype="<u4", count=n, offset=pos)); pos += 4 * n
+    coords = np.frombuffer(buf, dtype="<f4", count=2 * n_coords, offset=pos).reshape(-1, 2)
+    return {"ragged_type": ragged_type, "types": types, "offsets": offsets, "coords": coords, "origin": (ox, oy)}
+
+def read_bundle(stem: Path) -> gpd.GeoDataFrame:
+    """Rebuild a WGS84 GeoDataFrame from <stem>.bin + <stem>.props.json."""
+    stem = Path(stem)
+    arr = read_arrays(stem.with_suffix(".bin"))
+    coords = arr["coords"].astype(np.float64) + np.asarray(arr["origin"])
+    ragged_type = shapely.GeometryType(arr["ragged_type"])
+    geoms = np.asarray(shapely.from_ragged_array(ragged_type, coords, tuple(o.astype(np.int64) for o in arr["offsets"]) or None),
+                       dtype=object)
+    # to_ragged_array promotes singles to Multi* when a layer mixes both; undo that.
+    single = np.isin(arr["types"], (0, 1, 3)) & (shapely.get_type_id(geoms) >= 4)
+    if single.any():
+        geoms[single] = shapely.get_geometry(geoms[single], 0)
+    table = json.loads(stem.with_suffix(".props.json").read_text(encoding="utf-8"))
+    gdf = gpd.GeoDataFrame(table["rows"], columns=table["columns"], geometry=gpd.GeoSeries(geoms, crs=3857))
+    return gdf.to_crs(4326)
+
+def compare(geojson_path: Path, stem: Path, repeat: int = 5) -> dict:
+    """Sizes (raw and gzip) and best-of-N load time: json.loads vs typed-array views."""
+    text = Path(geojson_path).read_bytes()
+    bin_bytes = stem.with_suffix(".bin").read_bytes()
+    props_bytes = stem.with_suffix(".props.json").read_bytes()
+
+    def best(fn):
+        t = []
+        for _ in range(repeat):
+            t0 = time.perf_counter(); fn(); t.append(time.perf_counter() - t0)
+        return min(t)
+
+    return {
+        "geojson_bytes": len(text), "geojson_gz": len(gzip.compress(text)),
+        "bundle_bytes": len(bin_bytes) + len(props_bytes),
+        "bundle_gz": len(gzip.compress(bin_bytes)) + len(gzip.compress(props_bytes)),
+        "geojson_parse_s": best(lambda: json.loads(text)),
+        "bundle_map_s": best(lambda: read_arrays(stem.with_suffix(".bin"))),
+    }
+
+def main():
+    ap = argparse.ArgumentParser(description="Export GeoJSON layers as pre-projected Float32 bundles + property tables.")
+    ap.add_argument("inputs", type=Path, nargs="+", help="GeoJSON layers (one geometry family each)")
+    ap.add_argument("--out", type=Path, default=Path("bundles"), help="Output directory (default: bundles)")
+    args = ap.parse_args()
+
+    args.out.mkdir(parents=True, exist_ok=True)
+    for src in args.inputs:
+        stem = args.out / src.name.split(".")[0]
+        export_bundle(gpd.read_file(src), stem)
+        r = compare(src, stem)
+        print(f"📦 {src.name}: {human(r['geojson_bytes'])} → {human(r['bundle_bytes'])} "
+              f"(gzip {human(r['geojson_gz'])} → {human(r['bundle_gz'])}) | "
+              f"parse {r['geojson_parse_s']*1e3:.1f} ms → map {r['bundle_map_s']*1e3:.2f} ms")
+
+if __name__ == "__main__":
+    main()
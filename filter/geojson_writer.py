@@ -0,0 +1,148 @@
+# save as geojson_writer.py
+"""
+Streaming GeoJSON writer shared by the filter scripts.
+
+Geometries are serialized in bulk by GEOS (shapely.to_geojson over a chunk of
+the geometry array, after rounding coordinates to `precision` decimals), and
+properties by orjson when it is installed (the stdlib json module otherwise).
+Property values are pulled per column with .tolist(), so no per-row pandas
+access happens. Features are written chunk by chunk, so the whole file text
+never sits in memory. A path ending in .gz is gzipped.
+
+Several frames can go into one FeatureCollection (write_geojson([routes,
+stations], path)). That replaces pd.concat of the frames: the columns are the
+union in first-seen order, filled with null, as concat would give, but nothing
+is copied.
+"""
+import datetime, decimal, gzip, json, math
+from pathlib import Path
+from typing import IO, Iterable, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+import shapely
+import geopandas as gpd
+
+try:
+    import orjson
+except ImportError:  # optional: only speed is lost
+    orjson = None
+
+CHUNK = 20_000
+
+def _default(v):
+    """Values neither encoder knows natively: NumPy scalars/arrays, pandas timestamps and missing values."""
+    if isinstance(v, np.generic):
+        v = v.item()
+        return None if isinstance(v, float) and math.isnan(v) else v
+    if isinstance(v, np.ndarray):
+        return v.tolist()
+    if v is pd.NaT or v is pd.NA:
+        return None
+    if isinstance(v, (pd.Timestamp, datetime.date, datetime.time)):
+        return v.isoformat()
+    if isinstance(v, decimal.Decimal):
+        return float(v)
+    return str(v)
+
+def _clean(v):
+    """stdlib json path: NaN → null (json.dumps would write bare NaN), the rest through _default."""
+    if isinstance(v, float):
+        return None if math.isnan(v) or math.isinf(v) else v
+    if v is None or isinstance(v, (str, bool, int)):
+        return v
+    if isinstance(v, dict):
+        return {k: _clean(x) for k, x in v.items()}
+    if isinstance(v, (list, tuple)):
+        return [_clean(x) for x in v]
+    return _clean(_default(v))
+
+def dumps(obj) -> bytes:
+    """Compact UTF-8 JSON; NaN/NaT/NA become null."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(_clean(obj), separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def round_coordinates(geoms: np.ndarray, precision: int) -> np.ndarray:
+    """Coordinates rounded to `precision` decimals; 2D and 3D geometries keep their dimension."""
+    out = geoms.copy()
+    has_z = shapely.has_z(geoms)
+    for z in (False, True):
+        sel = has_z == z
+        if sel.any():
+            out[sel] = shapely.transform(geoms[sel], lambda xy: np.round(xy, precision), include_z=z)
+    return out
+
+def geometry_json(geoms: np.ndarray, precision: Optional[int] = None) -> List[bytes]:
+    """GeoJSON geometry members for an array of shapely geometries (None → null)."""
+    geoms = np.asarray(geoms, dtype=object)
+    if precision is not None:
+        geoms = round_coordinates(geoms, precision)
+    return [b"null" if s is None else s.encode("ascii") for s in shapely.to_geojson(geoms)]
+
+def _crs_member(crs) -> Optional[dict]:
+    """The legacy `crs` member OGR writes; CRS84 for WGS84 so files read back with the same CRS."""
+    if crs is None:
+        return None
+    epsg = crs.to_epsg()
+    if epsg == 4326:
+        name = "urn:ogc:def:crs:OGC:1.3:CRS84"
+    elif epsg is not None:
+        name = f"urn:ogc:def:crs:EPSG::{epsg}"
+    else:
+        return None
+    return {"type": "name", "properties": {"name": name}}
+
+def _union_columns(frames: Sequence[gpd.GeoDataFrame]) -> List[str]:
+    cols: List[str] = []
+    for f in frames:
+        cols += [c for c in f.columns if c != f.geometry.name and c not in cols]
+    return cols
+
+def iter_features(gdf: gpd.GeoDataFrame, columns: Optional[Sequence[str]] = None, precision: Optional[int] = None,
+                  chunk: int = CHUNK) -> Iterator[bytes]:
+    """Serialized Feature objects, `columns` (default: the frame's own) as properties, missing ones null."""
+    columns = list(columns) if columns is not None else [c for c in gdf.columns if c != gdf.geometry.name]
+    geoms = gdf.geometry.values
+    for start in range(0, len(gdf), chunk):
+        part = gdf.iloc[start:start + chunk]
+        values = [part[c].tolist() if c in part.columns else [None] * len(part) for c in columns]
+        for props, geom in zip(zip(*values) if columns else ((),) * len(part),
+                               geometry_json(geoms[start:start + chunk], precision)):
+            yield b'{"type":"Feature","properties":' + dumps(dict(zip(columns, props))) + b',"geometry":' + geom + b"}"
+
+def _open(path: Path, compress: Optional[bool]) -> IO[bytes]:
+    if compress if compress is not None else path.suffix == ".gz":
+        return gzip.open(path, "wb", compresslevel=6)
+    return open(path, "wb")
+
+def write_geojson(layers: Union[gpd.GeoDataFrame, Iterable[gpd.GeoDataFrame]], path: Path,
+                  precision: Optional[int] = None, name: Optional[str] = None, compress: Optional[bool] = None,
+                  chunk: int = CHUNK) -> int:
+    """
+    Write one frame, or several frames as one FeatureCollection, to `path`.
+    precision: decimals kept per coordinate (None = full). compress: gzip
+    (default: when path ends in .gz). Returns the number of features written.
+    Frames are written in their own CRS; the first frame's CRS is declared.
+    """
+    frames = [layers] if isinstance(layers, gpd.GeoDataFrame) else list(layers)
+    path = Path(path)
+    name = name if name is not None else path.name.split(".")[0]
+    columns = _union_columns(frames)
+    header = {"type": "FeatureCollection", "name": name}
+    crs = _crs_member(frames[0].crs) if frames else None
+    if crs:
+        header["crs"] = crs
+    n = 0
+    with _open(path, compress) as f:
+        f.write(dumps(header)[:-1] + b',\n"features":[\n')
+        buf: List[bytes] = []
+        for gdf in frames:
+            for feature in iter_features(gdf, columns, precision, chunk):
+                buf.append(feature)
+                if len(buf) == chunk:
+                    f.write((b",\n" if n else b"") + b",\n".join(buf)); n += len(buf); buf = []
+        if buf:
+            f.write((b",\n" if n else b"") + b",\n".join(buf)); n += len(buf)
+        f.write(b"\n]\n}\n")
+    return n
@@ -0,0 +1,173 @@
+# save as lod.py
+"""
+Level-of-detail variants for the routes/stations layers.
+
+For every input layer and every tolerance (metres) this writes
+
+    <stem>.lod<i>.geojson    topology-preserving simplification, coordinates
+                             rounded to --precision decimals
+    <stem>.lod<i>.topojson   same geometry as TopoJSON: integer-quantized,
+                             delta-encoded arcs plus a {scale, translate} transform
+
+and prints the size of each variant against the original file.
+Simplification happens in Web Mercator so tolerances are metres everywhere.
+"""
+import argparse, json
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import shapely
+import geopandas as gpd
+
+from geojson_writer import write_geojson
+
+DEFAULT_TOLERANCES = (200.0, 50.0, 10.0, 0.0)   # lod0 = coarsest
+
+def simplify_layer(gdf: gpd.GeoDataFrame, tolerance_m: float) -> gpd.GeoDataFrame:
+    """Douglas-Peucker with preserve_topology, tolerance in metres (0 = unchanged)."""
+    if tolerance_m <= 0 or gdf.empty:
+        return gdf
+    merc = gdf.to_crs(3857)
+    merc["geometry"] = shapely.simplify(merc.geometry.values, tolerance_m, preserve_topology=True)
+    return merc.to_crs(gdf.crs)
+
+def round_coords(gdf: gpd.GeoDataFrame, precision: int) -> gpd.GeoDataFrame:
+    out = gdf.copy()
+    out["geometry"] = shapely.transform(gdf.geometry.values, lambda xy: np.round(xy, precision))
+    return out
+
+# ---------- TopoJSON ----------
+
+class ArcEncoder:
+    """Collects quantized, delta-encoded arcs; encode() returns the new arc's index."""
+
+    def __init__(self, bounds: Tuple[float, float, float, float], quantization: int):
+        x0, y0, x1, y1 = bounds
+        self.kx = (x1 - x0) / (quantization - 1) or 1.0
+        self.ky = (y1 - y0) / (quantization - 1) or 1.0
+        self.x0, self.y0 = x0, y0
+        self.arcs: List[list] = []
+
+    @property
+    def transform(self) -> dict:
+        return {"scale": [self.kx, self.ky], "translate": [self.x0, self.y0]}
+
+    def quantize(self, xy: np.ndarray) -> np.ndarray:
+        q = np.empty((len(xy), 2), dtype=np.int64)
+        q[:, 0] = np.round((xy[:, 0] - self.x0) / self.kx)
+        q[:, 1] = np.round((xy[:, 1] - self.y0) / self.ky)
+        return q
+
+    def encode(self, xy: np.ndarray) -> int:
+        q = self.quantize(np.asarray(xy)[:, :2])
+        # Points that collapse onto the same grid cell carry no information.
+        keep = np.ones(len(q), dtype=bool)
+        keep[1:] = np.any(q[1:] != q[:-1], axis=1)
+        q = q[keep]
+        if len(q) < 2:
+            q = np.vstack([q, q[-1:]])
+        delta = np.vstack([q[:1], np.diff(q, axis=0)])
+        self.arcs.append(delta.tolist())
+        return len(self.arcs) - 1
+
+def topo_geometry(geom, enc: ArcEncoder) -> dict:
+    if geom is None or geom.is_empty:
+        return {"type": None}
+    kind = geom.geom_type
+    if kind == "Point":
+        return {"type": "Point", "coordinates": enc.quantize(np.array([[geom.x, geom.y]]))[0].tolist()}
+    if kind == "MultiPoint":
+        return {"type": "MultiPoint", "coordinates": enc.quantize(shapely.get_coordinates(geom)).tolist()}
+    if kind == "LineString":
+        return {"type": "LineString", "arcs": [enc.encode(np.asarray(geom.coords))]}
+    if kind == "MultiLineString":
+        return {"type": "MultiLineString", "arcs": [[enc.encode(np.asarray(g.coords))] for g in geom.geoms]}
+    if kind == "Polygon":
+        return {"type": "Polygon", "arcs": [[enc.encode(np.asarray(r.coords))] for r in (geom.exterior, *geom.interiors)]}
+    if kind == "MultiPolygon":
+        return {"type": "MultiPolygon",
+                "arcs": [[[enc.encode(np.asarray(r.coords))] for r in (p.exterior, *p.interiors)] for p in geom.geoms]}
+    return {"type": "GeometryCollection", "geometries": [topo_geometry(g, enc) for g in geom.geoms]}
+
+def json_properties(row: dict) -> dict:
+    out = {}
+    for k, v in row.items():
+        if isinstance(v, float) and np.isnan(v):
+            v = None
+        elif isinstance(v, np.generic):
+            v = v.item()
+        out[k] = v
+    return out
+
+def to_topojson(layers: Dict[str, gpd.GeoDataFrame], quantization: int = 100_000) -> dict:
+    """Quantized TopoJSON with one GeometryCollection object per layer (one arc per line/ring)."""
+    frames = [g for g in layers.values() if not g.empty]
+    if frames:
+        b = np.array([g.total_bounds for g in frames])
+        bounds = (b[:, 0].min(), b[:, 1].min(), b[:, 2].max(), b[:, 3].max())
+    else:
+        bounds = (0.0, 0.0, 1.0, 1.0)
+    enc = ArcEncoder(bounds, quantization)
+    objects = {}
+    for name, gdf in layers.items():
+        props = gdf.drop(columns=gdf.geometry.name).to_dict("records")
+        geoms = []
+        for geom, p in zip(gdf.geometry.values, props):
+            g = topo_geometry(geom, enc)
+            g["properties"] = json_properties(p)
+            geoms.append(g)
+        objects[name] = {"type": "GeometryCollection", "geometries": geoms}
+    return {"type": "Topology", "transform": enc.transform, "objects": objects, "arcs": enc.arcs}
+
+def write_topojson(topo: dict, path: Path):
+    path.write_text(json.dumps(topo, separators=(",", ":"), ensure_ascii=False), encoding="utf-8")
+
+# ---------- driver ----------
+
+def human(n):
+    for u in ("B","KB","MB","GB","TB"):
+        if n < 1024 or u == "TB": return f"{n:.2f} {u}"
+        n /= 1024
+
+def write_lods(src: Path, out_dir: Path, tolerances: Sequence[float] = DEFAULT_TOLERANCES,
+               precision: int = 5, quantization: int = 100_000) -> List[dict]:
+    gdf = gpd.read_file(src)
+    if gdf.crs is None:
+        gdf = gdf.set_crs(4326)
+    stem = src.name.split(".")[0]
+    base = src.stat().st_size
+    report = []
+    for i, tol in enumerate(tolerances):
+        simp = round_coords(simplify_layer(gdf, tol), precision)
+        gj = out_dir / f"{stem}.lod{i}.geojson"
+        tj = out_dir / f"{stem}.lod{i}.topojson"
+        write_geojson(simp, gj, precision=precision)
+        write_topojson(to_topojson({stem: simp}, quantization), tj)
+        n_vertices = int(shapely.get_num_coordinates(simp.geometry.values).sum())
+        for path, fmt in ((gj, "geojson"), (tj, "topojson")):
+            size = path.stat().st_size
+            report.append({"layer": stem, "lod": i, "tolerance_m": tol, "format": fmt, "vertices": n_vertices,
+                           "bytes": size, "reduction": round(base / size, 1) if size else None, "path": str(path)})
+    return report
+
+def main():
+    ap = argparse.ArgumentParser(description="Write simplified + quantized level-of-detail variants of GeoJSON layers.")
+    ap.add_argument("inputs", type=Path, nargs="+", help="GeoJSON layers (e.g. nyc_subway_routes.geojson)")
+    ap.add_argument("--out", type=Path, default=Path("lod"), help="Output directory (default: lod)")
+    ap.add_argument("--tolerances", type=float, nargs="+", default=list(DEFAULT_TOLERANCES),
+                    help="Simplification tolerances in metres, coarsest first (0 = no simplification)")
+    ap.add_argument("--precision", type=int, default=5, help="Decimal places kept in GeoJSON output (default: 5 ≈ 1 m)")
+    ap.add_argument("--quantization", type=int, default=100_000, help="TopoJSON grid size per axis (default: 1e5)")
+    args = ap.parse_args()
+
+    args.out.mkdir(parents=True, exist_ok=True)
+    for src in args.inputs:
+        rows = write_lods(src, args.out, args.tolerances, args.precision, args.quantization)
+        print(f"📐 {src.name} ({human(src.stat().st_size)})")
+        for r in rows:
+            print(f"   lod{r['lod']} tol={r['tolerance_m']:>6g} m {r['format']:<8} {r['vertices']:>9,} vtx "
+                  f"{human(r['bytes']):>11}  ×{r['reduction']} smaller")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+# save as network.py
+"""
+Snap stations onto the route geometries and export each city's network graph.
+
+Every station within --snap-radius metres of a route part is located along it
+(shapely.line_locate_point, all pairs in one vectorized call after an STRtree
+query). Consecutive stations along a part become an edge whose length is the
+along-line distance, and whose geometry is the route cut between the two
+stations. Parallel tracks and both directions of a line collapse into one
+undirected edge per station pair and line, keeping the shortest length; a pair
+served by several lines keeps one edge per line, so the graph is a multigraph
+whose edge_line tells the parallel edges apart.
+
+Outputs, for --city <c> in --out:
+    <c>_network.npz       CSR adjacency (both directions stored):
+                              indptr  int64[n_nodes+1]
+                              indices int32[n_edges*2]   neighbour node
+                              weights float32[n_edges*2] metres along the line
+                              edge_line int32[n_edges*2] index into `lines`
+                              lines   str[]              line labels
+                              lon, lat float64[n_nodes]
+    <c>_nodes.csv         node, station id, name, lines serving it, lon, lat
+    <c>_edges.geojson     the split route segments (from, to, line, length_m)
+
+Network.load() reads the .npz back; shortest_paths() / reachable() answer queries
+from the arrays alone, with no geometry work.
+"""
+import argparse, heapq
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import shapely
+import geopandas as gpd
+from shapely.ops import substring
+
+from geojson_writer import write_geojson
+from stations import ID_COLUMNS, NAME_COLUMNS, pick_column, route_labels
+
+def route_parts(routes: gpd.GeoDataFrame, labels: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Single LineStrings of every route (Multi* exploded) and the label of each."""
+    parts, owner = shapely.get_parts(routes.geometry.values, return_index=True)
+    lines = shapely.get_type_id(parts) == 1
+    return parts[lines], labels[owner[lines]]
+
+def snap_stations(stations_m: np.ndarray, parts: np.ndarray, radius_m: float) -> pd.DataFrame:
+    """(part, node, position along the part, offset from it) for every station within radius_m of a part."""
+    node, part = shapely.STRtree(parts).query(stations_m, predicate="dwithin", distance=radius_m)
+    pos = shapely.line_locate_point(parts[part], stations_m[node])
+    off = shapely.distance(parts[part], stations_m[node])
+    snaps = pd.DataFrame({"part": part, "node": node, "pos": pos, "offset": off})
+    # A station passed twice by one part (loops) keeps its closest approach.
+    return snaps.sort_values("offset").drop_duplicates(["part", "node"]).sort_values(["part", "pos"], kind="stable")
+
+def build_edges(snaps: pd.DataFrame, parts: np.ndarray, part_labels: np.ndarray) -> gpd.GeoDataFrame:
+    """Edges between consecutive snapped stations of each part, deduplicated per (station pair, line)."""
+    p = snaps["part"].to_numpy(); n = snaps["node"].to_numpy(); pos = snaps["pos"].to_numpy()
+    nxt = np.flatnonzero((p[1:] == p[:-1]) & (n[1:] != n[:-1]))
+    a, b = n[nxt], n[nxt + 1]
+    edges = pd.DataFrame({
+        "u": np.minimum(a, b), "v": np.maximum(a, b),
+        "line": part_labels[p[nxt]],
+        "length_m": pos[nxt + 1] - pos[nxt],
+        "part": p[nxt], "start": pos[nxt], "end": pos[nxt + 1],
+    })
+    edges = edges.sort_values("length_m").drop_duplicates(["u", "v", "line"]).sort_values(["u", "v", "line"])
+    geoms = [substring(parts[r.part], r.start, r.end) for r in edges.itertuples()]
+    return gpd.GeoDataFrame(edges.drop(columns=["part", "start", "end"]).reset_index(drop=True), geometry=geoms)
+
+def to_csr(n_nodes: int, edges: pd.DataFrame, lines: np.ndarray) -> dict:
+    """Undirected edges → CSR arrays (each edge stored in both directions, rows sorted by neighbour)."""
+    line_code = np.searchsorted(lines, edges["line"].to_numpy(dtype=object).astype(str))
+    src = np.concatenate([edges["u"], edges["v"]]).astype(np.int64)
+    dst = np.concatenate([edges["v"], edges["u"]]).astype(np.int32)
+    w = np.tile(edges["length_m"].to_numpy(dtype=np.float32), 2)
+    ln = np.tile(line_code.astype(np.int32), 2)
+    order = np.lexsort((dst, src))
+    indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n_nodes), out=indptr[1:])
+    return {"indptr": indptr, "indices": dst[order], "weights": w[order], "edge_line": ln[order]}
+
+def build_network(stations: gpd.GeoDataFrame, routes: gpd.GeoDataFrame, snap_radius_m: float = 80.0,
+                  id_col: Optional[str] = None, name_col: Optional[str] = None,
+                  route_label: Optional[str] = None, route_label_regex: Optional[str] = None):
+    """Returns (csr arrays incl. lines/lon/lat, node table, edges GeoDataFrame in EPSG:4326)."""
+    stations = stations.set_crs(4326) if stations.crs is None else stations.to_crs(4326)
+    stations = stations[~(stations.geometry.isna() | stations.geometry.is_empty)].reset_index(drop=True)
+    routes = routes.set_crs(4326) if routes.crs is None else routes.to_crs(4326)
+    routes = routes[~(routes.geometry.isna() | routes.geometry.is_empty)].reset_index(drop=True)
+    metric = stations.estimate_utm_crs()
+
+    labels = route_labels(routes, route_label, route_label_regex)
+    if labels is None:
+        labels = np.array([str(i) for i in range(len(routes))], dtype=object)
+    parts, part_labels = route_parts(routes.to_crs(metric), labels)
+    pts = shapely.centroid(stations.geometry.to_crs(metric).values)
+
+    snaps = snap_stations(pts, parts, snap_radius_m)
+    edges = build_edges(snaps, parts, part_labels)
+    edges = edges.set_crs(metric).to_crs(4326)
+
+    lines = np.unique(edges["line"].to_numpy(dtype=object).astype(str)) if len(edges) else np.array([], dtype=str)
+    csr = to_csr(len(stations), edges, lines)
+    lonlat = shapely.get_coordinates(shapely.centroid(stations.geometry.values))
+    csr.update(lines=lines, lon=lonlat[:, 0], lat=lonlat[:, 1])
+
+    id_col = pick_column(stations, id_col, ID_COLUMNS)
+    name_col = pick_column(stations, name_col, NAME_COLUMNS)
+    served = [set() for _ in range(len(stations))]
+    for e in edges[["u", "v", "line"]].itertuples(index=False):
+        served[e.u].add(e.line); served[e.v].add(e.line)
+    nodes = pd.DataFrame({
+        "node": np.arange(len(stations)),
+        "station_id": stations[id_col].astype(str) if id_col else np.arange(len(stations)).astype(str),
+        "name": stations[name_col] if name_col else None,
+        "lines": [",".join(sorted(s)) or None for s in served],
+        "lon": lonlat[:, 0], "lat": lonlat[:, 1],
+    })
+    snapped = snaps["node"].nunique()
+    print(f"🕸️  {len(stations):,} stations ({snapped:,} snapped within {snap_radius_m:g} m) | "
+          f"{len(parts):,} route parts → {len(edges):,} edges on {len(lines):,} lines")
+    return csr, nodes, edges
+
+class Network:
+    """CSR station graph as written by build_network(); queries touch only the arrays."""
+
+    def __init__(self, indptr, indices, weights, edge_line, lines, lon, lat):
+        self.indptr, self.indices, self.weights = indptr, indices, weights
+        self.edge_line, self.lines, self.lon, self.lat = edge_line, lines, lon, lat
+
+    @classmethod
+    def load(cls, path: Path) -> "Network":
+        with np.load(path, allow_pickle=False) as z:
+            return cls(**{k: z[k] for k in ("indptr", "indices", "weights", "edge_line", "lines", "lon", "lat")})
+
+    def __len__(self) -> int:
+        return len(self.indptr) - 1
+
+    def neighbors(self, node: int) -> List[Tuple[int, float, str]]:
+        a, b = self.indptr[node], self.indptr[node + 1]
+        return [(int(v), float(w), str(self.lines[l])) for v, w, l in
+                zip(self.indices[a:b], self.weights[a:b], self.edge_line[a:b])]
+
+    def shortest_paths(self, source: int, limit_m: float = np.inf) -> Tuple[np.ndarray, np.ndarray]:
+        """Dijkstra from `source`: (metres to every node, inf if unreached; predecessor, -1 if none)."""
+        dist = np.full(len(self), np.inf)
+        pred = np.full(len(self), -1, dtype=np.int64)
+        dist[source] = 0.0
+        heap = [(0.0, source)]
+        indptr, indices, weights = self.indptr, self.indices, self.weights
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            for k in range(indptr[u], indptr[u + 1]):
+                v, nd = indices[k], d + weights[k]
+                if nd < dist[v] and nd <= limit_m:
+                    dist[v] = nd; pred[v] = u
+                    heapq.heappush(heap, (nd, int(v)))
+        return dist, pred
+
+    def reachable(self, source: int, limit_m: float) -> np.ndarray:
+        """Nodes within limit_m metres of track from `source`."""
+        dist, _ = self.shortest_paths(source, limit_m)
+        return np.flatnonzero(np.isfinite(dist))
+
+    @staticmethod
+    def path(pred: np.ndarray, target: int) -> List[int]:
+        out = []
+        while target != -1:
+            out.append(int(target)); target = pred[target]
+        return out[::-1]
+
+def write_network(city: str, out_dir: Path, csr: dict, nodes: pd.DataFrame, edges: gpd.GeoDataFrame):
+    out_dir.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(out_dir / f"{city}_network.npz", **{k: (v.astype(str) if k == "lines" else v) for k, v in csr.items()})
+    nodes.to_csv(out_dir / f"{city}_nodes.csv", index=False)
+    write_geojson(edges, out_dir / f"{city}_edges.geojson")
+
+def main():
+    ap = argparse.ArgumentParser(description="Snap stations to routes, split the lines and export a CSR network graph.")
+    ap.add_argument("--stations", type=Path, required=True, help="Stations (or station complexes) GeoJSON")
+    ap.add_argument("--routes", type=Path, required=True, help="Routes GeoJSON")
+    ap.add_argument("--city", required=True, help="Prefix for output files")
+    ap.add_argument("--out", type=Path, default=Path("."), help="Output directory (default: .)")
+    ap.add_argument("--snap-radius", type=float, default=80.0, help="Max station-to-route distance in metres (default: 80)")
+    ap.add_argument("--id-col"); ap.add_argument("--name-col")
+    ap.add_argument("--route-label", help="Route column naming the line (default: first of ref, route_short_name, …)")
+    ap.add_argument("--route-label-regex", help="Regex applied to the route label; group 1 (or the match) is kept")
+    args = ap.parse_args()
+
+    csr, nodes, edges = build_network(gpd.read_file(args.stations), gpd.read_file(args.routes), args.snap_radius,
+                                      args.id_col, args.name_col, args.route_label, args.route_label_regex)
+    write_network(args.city, args.out, csr, nodes, edges)
+    print(f"💾 {args.city}_network.npz + {args.city}_nodes.csv + {args.city}_edges.geojson → {args.out}")
+
+if __name__ == "__main__":
+    main()
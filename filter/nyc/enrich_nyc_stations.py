@@ -0,0 +1,146 @@
+"""
+Attach service information to NYC parent stations from GTFS stop_times/trips.
+
+Data path (see README):
+
+    stops.txt       ← stop_id (+ parent_station)
+       ↕
+    stop_times.txt  ← trip_id + stop_id
+       ↕
+    trips.txt       ← trip_id + route_id (e.g. A, 6, Q) + service_id
+
+stop_times.txt is read in chunks of three columns; each chunk is reduced to
+int32 codes (station, route, departure second) before the next one is read, so
+the join never materializes object-dtype string columns for the whole file.
+"""
+import argparse, sys
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from geojson_writer import write_geojson
+
+# (name, start hour, end hour) — service-day hours, departures after midnight wrap.
+TIME_BANDS = (
+    ("early",   0,  6),
+    ("am_peak", 6, 10),
+    ("midday", 10, 16),
+    ("pm_peak", 16, 20),
+    ("evening", 20, 24),
+)
+
+def platform_parents(stops_path: Path) -> pd.Series:
+    """stop_id → parent station stop_id; stops without a parent map to themselves."""
+    stops = pd.read_csv(stops_path, usecols=lambda c: c in ("stop_id", "parent_station"), dtype="string")
+    parent = stops["parent_station"].fillna("") if "parent_station" in stops else pd.Series("", index=stops.index, dtype="string")
+    parent = parent.where(parent != "", stops["stop_id"])
+    return pd.Series(parent.to_numpy(), index=stops["stop_id"].to_numpy(), name="parent_station")
+
+def active_services(gtfs_dir: Path, day: Optional[str]) -> Optional[set]:
+    """service_ids running on a weekday column of calendar.txt (None = keep every service)."""
+    cal_path = Path(gtfs_dir) / "calendar.txt"
+    if day is None or not cal_path.exists():
+        return None
+    cal = pd.read_csv(cal_path, usecols=["service_id", day], dtype={"service_id": "string", day: "int8"})
+    return set(cal.loc[cal[day] == 1, "service_id"])
+
+def gtfs_seconds(times: pd.Series) -> np.ndarray:
+    """Vectorized HH:MM:SS → seconds; hours may exceed 24 as GTFS allows."""
+    hms = times.str.strip().str.split(":", expand=True).astype("int32")
+    return (hms[0] * 3600 + hms[1] * 60 + hms[2]).to_numpy(dtype=np.int32)
+
+def format_gtfs_time(sec: int) -> str:
+    return f"{sec // 3600:02d}:{sec % 3600 // 60:02d}:{sec % 60:02d}"
+
+def station_service(gtfs_dir: Path, day: Optional[str] = "monday", chunksize: int = 1_000_000) -> pd.DataFrame:
+    """
+    Per parent station: served route_ids, platform ids, trips per hour in each
+    TIME_BANDS band and first/last departure. Indexed by parent stop_id.
+    tph_* counts departures from all the station's child platforms, so both
+    directions (N and S platforms) are counted.
+    """
+    gtfs_dir = Path(gtfs_dir)
+    parents = platform_parents(gtfs_dir / "stops.txt")
+    station_ids, stop_codes = np.unique(parents.to_numpy(dtype=object).astype(str), return_inverse=True)
+    stop_code_of = pd.Series(stop_codes.astype(np.int32), index=parents.index)
+
+    trips = pd.read_csv(gtfs_dir / "trips.txt", usecols=["route_id", "trip_id", "service_id"], dtype="string")
+    services = active_services(gtfs_dir, day)
+    if services is not None:
+        trips = trips[trips["service_id"].isin(services)]
+    route_codes, route_ids = pd.factorize(trips["route_id"], sort=True)
+    route_code_of = pd.Series(route_codes.astype(np.int32), index=trips["trip_id"].to_numpy())
+
+    st_parts, rt_parts, dep_parts = [], [], []
+    reader = pd.read_csv(gtfs_dir / "stop_times.txt", usecols=["trip_id", "stop_id", "departure_time"],
+                         dtype={"trip_id": "category", "stop_id": "category", "departure_time": "string"},
+                         chunksize=chunksize)
+    for chunk in reader:
+        chunk = chunk.dropna(subset=["departure_time"])
+        # Categorical → code lookups happen once per distinct id, not per row.
+        rt = chunk["trip_id"].map(route_code_of).to_numpy(dtype=np.float64)
+        st = chunk["stop_id"].map(stop_code_of).to_numpy(dtype=np.float64)
+        ok = ~(np.isnan(rt) | np.isnan(st))
+        st_parts.append(st[ok].astype(np.int32))
+        rt_parts.append(rt[ok].astype(np.int32))
+        dep_parts.append(gtfs_seconds(chunk["departure_time"][ok]))
+
+    st = np.concatenate(st_parts) if st_parts else np.empty(0, np.int32)
+    rt = np.concatenate(rt_parts) if rt_parts else np.empty(0, np.int32)
+    dep = np.concatenate(dep_parts) if dep_parts else np.empty(0, np.int32)
+    n = len(station_ids)
+
+    out = pd.DataFrame(index=pd.Index(station_ids, name="stop_id"))
+    pairs = np.unique(st.astype(np.int64) * len(route_ids) + rt)
+    served: Dict[int, list] = {}
+    for s, r in zip(pairs // max(len(route_ids), 1), pairs % max(len(route_ids), 1)):
+        served.setdefault(int(s), []).append(route_ids[r])
+    out["route_ids"] = [",".join(served.get(i, [])) or None for i in range(n)]
+
+    children: Dict[str, list] = {}
+    for stop_id, parent in parents.items():
+        if stop_id != parent:
+            children.setdefault(parent, []).append(stop_id)
+    out["platform_ids"] = [",".join(sorted(children.get(sid, []))) or None for sid in station_ids]
+
+    hour = (dep % 86400) // 3600
+    for name, h0, h1 in TIME_BANDS:
+        in_band = (hour >= h0) & (hour < h1)
+        out[f"tph_{name}"] = np.round(np.bincount(st[in_band], minlength=n) / (h1 - h0), 2)
+
+    first = np.full(n, np.iinfo(np.int32).max, dtype=np.int32); np.minimum.at(first, st, dep)
+    last = np.full(n, -1, dtype=np.int32); np.maximum.at(last, st, dep)
+    has = last >= 0
+    out["first_departure"] = [format_gtfs_time(int(t)) if h else None for t, h in zip(first, has)]
+    out["last_departure"] = [format_gtfs_time(int(t)) if h else None for t, h in zip(last, has)]
+    print(f"🕒 {len(dep):,} departures on {len(route_ids):,} routes across {int(has.sum()):,} stations")
+    return out
+
+def enrich_stations(stations_gdf: gpd.GeoDataFrame, gtfs_dir: Path, day: Optional[str] = "monday") -> gpd.GeoDataFrame:
+    """Left-join station_service() onto a stations layer by stop_id."""
+    service = station_service(gtfs_dir, day=day)
+    stations_gdf = stations_gdf.copy()
+    key = stations_gdf["stop_id"].astype(str)
+    for col in service.columns:
+        stations_gdf[col] = key.map(service[col]).to_numpy()
+    return stations_gdf
+
+def main():
+    ap = argparse.ArgumentParser(description="Add served routes and service frequency to NYC station GeoJSON.")
+    ap.add_argument("stations", type=Path, help="nyc_subway_stations.geojson to enrich")
+    ap.add_argument("--data", type=Path, default=Path("../data"), help="Unpacked GTFS directory (default: ../data)")
+    ap.add_argument("--day", default="monday", help="calendar.txt weekday column selecting services (default: monday)")
+    ap.add_argument("--out", type=Path, default=None, help="Output path (default: overwrite input)")
+    args = ap.parse_args()
+
+    enriched = enrich_stations(gpd.read_file(args.stations), args.data, day=args.day)
+    out = args.out or args.stations
+    write_geojson(enriched, out)
+    print(f"✅ Enriched {len(enriched):,} stations → {out}")
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,80 @@
+import argparse, sys
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
 import pandas as pd
 import geopandas as gpd
-from shapely.geometry import Point, LineString
-
-# 1. Load GTFS stops (station locations)
-stops_df = pd.read_csv("../data/stops.txt")
-
-# Filter: only actual stations (not entrances/platforms)
-# GTFS location_type = 1 for parent station
-if 'location_type' in stops_df.columns:
-    stops_df = stops_df[stops_df['location_type'] == 1]
-
-# Create GeoDataFrame of station points
-stops_gdf = gpd.GeoDataFrame(
-    stops_df,
-    geometry=gpd.points_from_xy(stops_df.stop_lon, stops_df.stop_lat),
-    crs="EPSG:4326"  # GTFS uses WGS84
-)
-
-# 2. Load GTFS shapes (route paths)
-shapes_df = pd.read_csv("../data/shapes.txt")
-
-# Group by shape_id and order by shape_pt_sequence to create LineStrings
-lines = []
-for shape_id, group in shapes_df.groupby("shape_id"):
-    group = group.sort_values("shape_pt_sequence")
-    coords = list(zip(group.shape_pt_lon, group.shape_pt_lat))
-    line = LineString(coords)
-    lines.append({"shape_id": shape_id, "geometry": line})
-
-# Create GeoDataFrame of route paths
-shapes_gdf = gpd.GeoDataFrame(lines, crs="EPSG:4326")
-
-# 3. Export both to GeoJSON
-stops_gdf.to_file("nyc_subway_stations.geojson", driver="GeoJSON")
-shapes_gdf.to_file("nyc_subway_routes.geojson", driver="GeoJSON")
+import shapely
+
+from enrich_nyc_stations import enrich_stations
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from geojson_writer import write_geojson
+
+SHAPES_DTYPES = {
+    "shape_id": "string",
+    "shape_pt_sequence": "int32",
+    "shape_pt_lat": "float64",
+    "shape_pt_lon": "float64",
+}
+
+def load_stations(stops_path: Path) -> gpd.GeoDataFrame:
+    """GTFS stops reduced to parent stations (location_type = 1)."""
+    stops_df = pd.read_csv(stops_path)
+
+    # Filter: only actual stations (not entrances/platforms)
+    if 'location_type' in stops_df.columns:
+        stops_df = stops_df[stops_df['location_type'] == 1]
+
+    return gpd.GeoDataFrame(
+        stops_df,
+        geometry=gpd.points_from_xy(stops_df.stop_lon, stops_df.stop_lat),
+        crs="EPSG:4326"  # GTFS uses WGS84
+    )
+
+def shapes_to_routes(shapes_df: pd.DataFrame) -> gpd.GeoDataFrame:
+    """
+    One LineString per shape_id, points ordered by shape_pt_sequence.
+    A single sort replaces the per-group sort, and all lines are built in one
+    shapely.linestrings call from the shape offsets.
+    """
+    # factorize codes a missing shape_id as -1, which shapely.linestrings rejects.
+    shapes_df = shapes_df.dropna(subset=["shape_id"]).sort_values(["shape_id", "shape_pt_sequence"], kind="stable")
+    codes, shape_ids = pd.factorize(shapes_df["shape_id"], sort=True)
+    coords = shapes_df[["shape_pt_lon", "shape_pt_lat"]].to_numpy(dtype=np.float64)
+    lines = shapely.linestrings(coords, indices=codes)
+    return gpd.GeoDataFrame({"shape_id": np.asarray(shape_ids, dtype=object)}, geometry=lines, crs="EPSG:4326")
+
+def load_routes(shapes_path: Path) -> gpd.GeoDataFrame:
+    shapes_df = pd.read_csv(shapes_path, usecols=list(SHAPES_DTYPES), dtype=SHAPES_DTYPES)
+    return shapes_to_routes(shapes_df)
+
+def filter_nyc_subways(data_dir: Path, out_dir: Path, enrich: bool = False, day: str = "monday",
+                       precision: Optional[int] = None):
+    """
+    Write nyc_subway_stations.geojson and nyc_subway_routes.geojson from an unpacked
+    GTFS feed. With enrich, stations also carry served routes and service frequency.
+    """
+    out_dir = Path(out_dir); out_dir.mkdir(parents=True, exist_ok=True)
+    stops_gdf = load_stations(Path(data_dir) / "stops.txt")
+    if enrich:
+        stops_gdf = enrich_stations(stops_gdf, data_dir, day=day)
+    shapes_gdf = load_routes(Path(data_dir) / "shapes.txt")
+    write_geojson(stops_gdf, out_dir / "nyc_subway_stations.geojson", precision=precision)
+    write_geojson(shapes_gdf, out_dir / "nyc_subway_routes.geojson", precision=precision)
+    print(f"✅ {len(stops_gdf):,} stations, {len(shapes_gdf):,} routes → {out_dir}")
+    return stops_gdf, shapes_gdf
+
+def main():
+    ap = argparse.ArgumentParser(description="Convert MTA GTFS stops/shapes into station and route GeoJSON.")
+    ap.add_argument("--data", type=Path, default=Path("../data"), help="Unpacked GTFS directory (default: ../data)")
+    ap.add_argument("--out", type=Path, default=Path("."), help="Output directory (default: .)")
+    ap.add_argument("--enrich", action="store_true", help="Join stop_times/trips to add route_ids, trips per hour and first/last departure")
+    ap.add_argument("--day", default="monday", help="calendar.txt weekday column used with --enrich (default: monday)")
+    ap.add_argument("--precision", type=int, help="Decimal places kept in GeoJSON coordinates (default: all)")
+    args = ap.parse_args()
+    filter_nyc_subways(args.data, args.out, enrich=args.enrich, day=args.day, precision=args.precision)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,466 @@
+"""
+RAPTOR journey planner over the MTA static GTFS feed.
+
+Timetable.build() flattens one service day into arrays (see README for the files):
+
+    stop_times.txt + trips.txt + calendar.txt   → trips running that day, each a
+                                                  sequence of parent stations
+    trips with the same station sequence        → one pattern; trips sorted by
+                                                  departure (a pattern is split where
+                                                  a later trip would overtake)
+    transfers.txt                               → walking edges with min_transfer_time,
+                                                  closed transitively (shortest chain);
+                                                  from == to gives the time needed to
+                                                  change trains inside a station
+
+All times are seconds after midnight of the service day (GTFS allows > 24h).
+Per pattern, times are stored stop-major (`dep[off + i*n_trips + t]`), so the
+departures at one stop form a sorted run that bisect searches in place.
+
+Raptor runs the round-based algorithm (one round per extra trip): earliest_arrival()
+for one origin, with the journey legs when a target is given, and isochrones() for
+many origins on a process pool. The CLI builds/saves the timetable, answers a query,
+writes isochrones or benchmarks random origin/destination pairs.
+"""
+import argparse, time
+from bisect import bisect_left
+from heapq import heappop, heappush
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from enrich_nyc_stations import active_services, format_gtfs_time, gtfs_seconds, platform_parents
+
+INF = np.iinfo(np.int32).max
+ARRAYS = ("stations", "names", "pat_stops_ptr", "pat_stops", "pat_trips_ptr", "pat_time_off", "arr", "dep",
+          "trip_ids", "pat_route", "stop_pat_ptr", "stop_pat", "stop_pat_pos", "tr_ptr", "tr_to", "tr_time", "change")
+
+def services_on(gtfs_dir: Path, day: Optional[str] = None, date: Optional[str] = None) -> Optional[set]:
+    """
+    service_ids running on `date` (YYYYMMDD: weekday column within start/end_date,
+    then calendar_dates.txt additions/removals) or on a weekday column `day`.
+    """
+    if date is None:
+        return active_services(gtfs_dir, day)
+    gtfs_dir = Path(gtfs_dir)
+    weekday = pd.Timestamp(date).day_name().lower()
+    out = set()
+    if (gtfs_dir / "calendar.txt").exists():
+        cal = pd.read_csv(gtfs_dir / "calendar.txt", dtype={"service_id": "string", "start_date": "string", "end_date": "string"})
+        on = (cal[weekday] == 1) & (cal["start_date"] <= date) & (cal["end_date"] >= date)
+        out = set(cal.loc[on, "service_id"])
+    if (gtfs_dir / "calendar_dates.txt").exists():
+        cd = pd.read_csv(gtfs_dir / "calendar_dates.txt", dtype={"service_id": "string", "date": "string", "exception_type": "int8"})
+        cd = cd[cd["date"] == date]
+        out |= set(cd.loc[cd["exception_type"] == 1, "service_id"])
+        out -= set(cd.loc[cd["exception_type"] == 2, "service_id"])
+    return out
+
+class Timetable:
+    """Flat RAPTOR arrays for one service day (field list in ARRAYS)."""
+
+    def __init__(self, **arrays):
+        missing = set(ARRAYS) - set(arrays)
+        if missing:
+            raise ValueError(f"timetable is missing {sorted(missing)}")
+        self.__dict__.update(arrays)
+
+    @property
+    def n_stations(self) -> int:
+        return len(self.stations)
+
+    @property
+    def n_patterns(self) -> int:
+        return len(self.pat_stops_ptr) - 1
+
+    def save(self, path: Path):
+        np.savez_compressed(path, **{k: getattr(self, k) for k in ARRAYS})
+
+    @classmethod
+    def load(cls, path: Path) -> "Timetable":
+        with np.load(path, allow_pickle=False) as z:
+            return cls(**{k: z[k] for k in ARRAYS})
+
+    def station_code(self, stop_id: str) -> int:
+        """Parent station code for a station or platform stop_id (101 or 101N)."""
+        for sid in (stop_id, stop_id[:-1]):
+            i = int(np.searchsorted(self.stations, sid))
+            if i < len(self.stations) and self.stations[i] == sid:
+                return i
+        raise KeyError(f"unknown stop_id {stop_id!r}")
+
+    @classmethod
+    def build(cls, gtfs_dir: Path, day: Optional[str] = "monday", date: Optional[str] = None,
+              chunksize: int = 1_000_000) -> "Timetable":
+        gtfs_dir = Path(gtfs_dir)
+        parents = platform_parents(gtfs_dir / "stops.txt")
+        stations, codes = np.unique(parents.to_numpy(dtype=object).astype(str), return_inverse=True)
+        station_of = pd.Series(codes.astype(np.int32), index=parents.index)
+        stops = pd.read_csv(gtfs_dir / "stops.txt", usecols=["stop_id", "stop_name"], dtype="string")
+        names = stops.set_index("stop_id")["stop_name"].reindex(stations).fillna("").to_numpy(dtype=str)
+
+        trips = pd.read_csv(gtfs_dir / "trips.txt", usecols=["route_id", "trip_id", "service_id"], dtype="string")
+        services = services_on(gtfs_dir, day, date)
+        if services is not None:
+            trips = trips[trips["service_id"].isin(services)]
+        trip_ids = trips["trip_id"].to_numpy(dtype=object).astype(str)
+        trip_code_of = pd.Series(np.arange(len(trips), dtype=np.int32), index=trip_ids)
+        trip_route = trips["route_id"].to_numpy(dtype=object).astype(str)
+
+        parts = {k: [] for k in ("trip", "stop", "seq", "arr", "dep")}
+        reader = pd.read_csv(gtfs_dir / "stop_times.txt",
+                             usecols=["trip_id", "stop_id", "arrival_time", "departure_time", "stop_sequence"],
+                             dtype={"trip_id": "category", "stop_id": "category", "arrival_time": "string",
+                                    "departure_time": "string", "stop_sequence": "int32"},
+                             chunksize=chunksize)
+        for chunk in reader:
+            arr_s = chunk["arrival_time"].fillna(chunk["departure_time"])
+            dep_s = chunk["departure_time"].fillna(chunk["arrival_time"])
+            tr = chunk["trip_id"].map(trip_code_of).to_numpy(dtype=np.float64)
+            st = chunk["stop_id"].map(station_of).to_numpy(dtype=np.float64)
+            ok = ~(np.isnan(tr) | np.isnan(st)) & dep_s.notna().to_numpy()
+            parts["trip"].append(tr[ok].astype(np.int32)); parts["stop"].append(st[ok].astype(np.int32))
+            parts["seq"].append(chunk["stop_sequence"].to_numpy()[ok])
+            parts["arr"].append(gtfs_seconds(arr_s[ok])); parts["dep"].append(gtfs_seconds(dep_s[ok]))
+        cat = {k: (np.concatenate(v) if v else np.empty(0, np.int32)) for k, v in parts.items()}
+        order = np.lexsort((cat["seq"], cat["trip"]))
+        trip, stop, arr, dep = (cat[k][order] for k in ("trip", "stop", "arr", "dep"))
+
+        # Group trips by station sequence; within a pattern, order by first departure.
+        starts = np.flatnonzero(np.r_[True, trip[1:] != trip[:-1]])
+        ends = np.r_[starts[1:], len(trip)]
+        by_seq: Dict[bytes, List[int]] = {}
+        for k, (a, b) in enumerate(zip(starts, ends)):
+            if b - a >= 2:
+                by_seq.setdefault(stop[a:b].tobytes(), []).append(k)
+
+        pat_stops, pat_trips, blocks_arr, blocks_dep = [], [], [], []
+        for key, members in by_seq.items():
+            seq = np.frombuffer(key, dtype=np.int32)
+            members.sort(key=lambda k: (dep[starts[k]], trip[starts[k]]))
+            # Split where a later trip would overtake an earlier one, so every stop's departures stay sorted.
+            groups: List[List[int]] = []
+            for k in members:
+                a, b = starts[k], ends[k]
+                for g in groups:
+                    pa, pb = starts[g[-1]], ends[g[-1]]
+                    if np.all(dep[pa:pb] <= dep[a:b]) and np.all(arr[pa:pb] <= arr[a:b]):
+                        g.append(k); break
+                else:
+                    groups.append([k])
+            for g in groups:
+                pat_stops.append(seq)
+                pat_trips.append(trip[starts[g]])
+                blocks_arr.append(np.stack([arr[starts[k]:ends[k]] for k in g], axis=1).ravel())   # stop-major
+                blocks_dep.append(np.stack([dep[starts[k]:ends[k]] for k in g], axis=1).ravel())
+
+        n_pat = len(pat_stops)
+        lens = np.array([len(s) for s in pat_stops], dtype=np.int64)
+        n_tr = np.array([len(t) for t in pat_trips], dtype=np.int64)
+        pat_stops_ptr = np.r_[0, np.cumsum(lens)].astype(np.int64)
+        pat_trips_ptr = np.r_[0, np.cumsum(n_tr)].astype(np.int64)
+        pat_time_off = np.r_[0, np.cumsum(lens * n_tr)].astype(np.int64)
+        flat_stops = np.concatenate(pat_stops) if n_pat else np.empty(0, np.int32)
+        flat_trips = np.concatenate(pat_trips) if n_pat else np.empty(0, np.int32)
+
+        # Station → (pattern, position) pairs.
+        pat_of = np.repeat(np.arange(n_pat, dtype=np.int32), lens)
+        pos_of = (np.arange(len(flat_stops)) - np.repeat(pat_stops_ptr[:-1], lens)).astype(np.int32)
+        o = np.lexsort((pos_of, pat_of, flat_stops))
+        stop_pat_ptr = np.zeros(len(stations) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(flat_stops, minlength=len(stations)), out=stop_pat_ptr[1:])
+
+        tr_ptr, tr_to, tr_time, change = read_transfers(gtfs_dir, parents, station_of, len(stations))
+        tt = cls(stations=stations.astype(str), names=names,
+                 pat_stops_ptr=pat_stops_ptr, pat_stops=flat_stops.astype(np.int32),
+                 pat_trips_ptr=pat_trips_ptr, pat_time_off=pat_time_off,
+                 arr=np.concatenate(blocks_arr).astype(np.int32) if n_pat else np.empty(0, np.int32),
+                 dep=np.concatenate(blocks_dep).astype(np.int32) if n_pat else np.empty(0, np.int32),
+                 trip_ids=trip_ids[flat_trips] if n_pat else np.empty(0, str),
+                 pat_route=np.array([trip_route[t[0]] for t in pat_trips], dtype=str),
+                 stop_pat_ptr=stop_pat_ptr, stop_pat=pat_of[o], stop_pat_pos=pos_of[o],
+                 tr_ptr=tr_ptr, tr_to=tr_to, tr_time=tr_time, change=change)
+        print(f"🗓️  {len(trip_ids):,} trips → {n_pat:,} patterns over {len(stations):,} stations, "
+              f"{len(tr_to):,} transfers")
+        return tt
+
+def read_transfers(gtfs_dir: Path, parents: pd.Series, station_of: pd.Series, n: int):
+    """transfers.txt → CSR walking edges between stations + per-station change time (from == to)."""
+    change = np.zeros(n, dtype=np.int32)
+    path = Path(gtfs_dir) / "transfers.txt"
+    if not path.exists():
+        return np.zeros(n + 1, np.int64), np.empty(0, np.int32), np.empty(0, np.int32), change
+    tr = pd.read_csv(path, dtype={"from_stop_id": "string", "to_stop_id": "string"})
+    if "transfer_type" in tr:
+        tr = tr[tr["transfer_type"].fillna(0) != 3]
+    t = tr["min_transfer_time"].fillna(0).to_numpy(dtype=np.int64) if "min_transfer_time" in tr else np.zeros(len(tr), np.int64)
+    a = tr["from_stop_id"].map(parents).map(station_of).to_numpy(dtype=np.float64)
+    b = tr["to_stop_id"].map(parents).map(station_of).to_numpy(dtype=np.float64)
+    ok = ~(np.isnan(a) | np.isnan(b))
+    a, b, t = a[ok].astype(np.int64), b[ok].astype(np.int64), t[ok]
+    same = a == b
+    np.maximum.at(change, a[same], t[same].astype(np.int32))
+    edges = pd.DataFrame({"a": a[~same], "b": b[~same], "t": t[~same]}).groupby(["a", "b"], as_index=False)["t"].min()
+    edges = close_transfers(edges["a"].to_numpy(), edges["b"].to_numpy(), edges["t"].to_numpy())
+    ptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(edges["a"].to_numpy(), minlength=n), out=ptr[1:])
+    return ptr, edges["b"].to_numpy(dtype=np.int32), edges["t"].to_numpy(dtype=np.int32), change
+
+def close_transfers(a: np.ndarray, b: np.ndarray, t: np.ndarray) -> pd.DataFrame:
+    """
+    Transitive closure of the walking edges: a → c whenever a chain of transfers
+    leads there, at the shortest total time (Dijkstra from every station with
+    an edge). RAPTOR then needs only one footpath after each trip.
+    """
+    adj: Dict[int, List[Tuple[int, int]]] = {}
+    for u, v, w in zip(a.tolist(), b.tolist(), t.tolist()):
+        adj.setdefault(u, []).append((v, w))
+    rows = []
+    for s in adj:
+        dist = {s: 0}
+        heap = [(0, s)]
+        while heap:
+            d, u = heappop(heap)
+            if d > dist[u]:
+                continue
+            for v, w in adj.get(u, ()):
+                if d + w < dist.get(v, INF):
+                    dist[v] = d + w
+                    heappush(heap, (d + w, v))
+        rows += [(s, v, d) for v, d in dist.items() if v != s]
+    return pd.DataFrame(rows, columns=["a", "b", "t"], dtype=np.int64).sort_values(["a", "b"], ignore_index=True)
+
+class Raptor:
+    """Round-based earliest-arrival search over a Timetable (arrays held as Python lists for fast indexing)."""
+
+    def __init__(self, tt: Timetable):
+        self.tt = tt
+        self.n = tt.n_stations
+        L = lambda a: a.tolist()
+        self.ps_ptr, self.ps = L(tt.pat_stops_ptr), L(tt.pat_stops)
+        self.pt_ptr, self.off = L(tt.pat_trips_ptr), L(tt.pat_time_off)
+        self.arr, self.dep = L(tt.arr), L(tt.dep)
+        self.sp_ptr, self.sp, self.sp_pos = L(tt.stop_pat_ptr), L(tt.stop_pat), L(tt.stop_pat_pos)
+        self.tr_ptr, self.tr_to, self.tr_time = L(tt.tr_ptr), L(tt.tr_to), L(tt.tr_time)
+        self.change = L(tt.change)
+
+    def run(self, origin: int, dep_time: int, max_rounds: int = 8, target: Optional[int] = None):
+        """
+        Returns (best arrival per station, labels). labels[k] is a pair of dicts for
+        round k: how p was reached at best[p], and how the earliest boarding time at p
+        was set (a walk in can beat a trip arrival plus the change time). Entries are
+        ("trip", pattern, trip, board_pos, alight_pos) or ("walk", from, seconds).
+        Footpaths are transitively closed, so one walk follows the origin or a trip.
+        """
+        n, INF_ = self.n, int(INF)
+        best = [INF_] * n               # earliest arrival so far
+        board = [INF_] * n              # earliest time a trip can be boarded there
+        best[origin] = board[origin] = dep_time
+        labels: List[Tuple[Dict[int, tuple], Dict[int, tuple]]] = [({origin: ("origin",)}, {origin: ("origin",)})]
+        marked = self._walk({origin}, best, board, *labels[0], target)
+        marked.add(origin)
+
+        ps_ptr, ps, pt_ptr, off = self.ps_ptr, self.ps, self.pt_ptr, self.off
+        arr, dep, sp_ptr, sp, sp_pos, change = self.arr, self.dep, self.sp_ptr, self.sp, self.sp_pos, self.change
+        for _ in range(max_rounds):
+            queue: Dict[int, int] = {}
+            for p in marked:
+                for k in range(sp_ptr[p], sp_ptr[p + 1]):
+                    r, i = sp[k], sp_pos[k]
+                    if queue.get(r, 1 << 30) > i:
+                        queue[r] = i
+            if not queue:
+                break
+            prev_board = board[:]
+            round_labels: Dict[int, tuple] = {}
+            round_boards: Dict[int, tuple] = {}
+            reached = set()
+            for r, start in queue.items():
+                s0, s1 = ps_ptr[r], ps_ptr[r + 1]
+                n_tr = pt_ptr[r + 1] - pt_ptr[r]
+                base = off[r]
+                trip, b_pos = -1, -1
+                for i in range(start, s1 - s0):
+                    p = ps[s0 + i]
+                    col = base + i * n_tr
+                    if trip >= 0:
+                        a = arr[col + trip]
+                        bound = best[target] if target is not None else INF_
+                        if a < best[p] and a < bound:
+                            best[p] = a
+                            round_labels[p] = ("trip", r, trip, b_pos, i)
+                            reached.add(p)
+                    bt = prev_board[p]
+                    if bt < INF_ and (trip < 0 or bt <= dep[col + trip]):
+                        t = bisect_left(dep, bt, col, col + n_tr) - col
+                        if t < n_tr and (trip < 0 or t < trip):
+                            trip, b_pos = t, i
+            for p in reached:
+                if best[p] + change[p] < board[p]:
+                    board[p] = best[p] + change[p]
+                    round_boards[p] = round_labels[p]
+            marked = reached | self._walk(reached, best, board, round_labels, round_boards, target)
+            labels.append((round_labels, round_boards))
+            if not marked:
+                break
+        return best, labels
+
+    def _walk(self, sources, best, board, labels, boards, target) -> set:
+        """
+        Relax the (closed) transfer edges out of `sources`, leaving at their arrival
+        before any walking in this call; returns the stations whose arrival or
+        boarding time improved.
+        """
+        out = set()
+        bound = best[target] if target is not None else int(INF)
+        for p, t0 in [(p, best[p]) for p in sources]:
+            for k in range(self.tr_ptr[p], self.tr_ptr[p + 1]):
+                q, a = self.tr_to[k], t0 + self.tr_time[k]
+                if a >= bound:
+                    continue
+                if a < best[q]:
+                    best[q] = a
+                    labels[q] = ("walk", p, self.tr_time[k])
+                    out.add(q)
+                if a < board[q]:
+                    board[q] = a
+                    boards[q] = ("walk", p, self.tr_time[k])
+                    out.add(q)
+        return out
+
+    def earliest_arrival(self, origin: int, target: int, dep_time: int, max_rounds: int = 8) -> Tuple[int, List[dict]]:
+        """(arrival seconds or INF, journey legs)."""
+        best, labels = self.run(origin, dep_time, max_rounds, target)
+        return best[target], self.journey(labels, target) if best[target] < INF else []
+
+    def journey(self, labels: List[Tuple[Dict[int, tuple], Dict[int, tuple]]], target: int) -> List[dict]:
+        tt, legs, p = self.tt, [], target
+        k = max(k for k, (arrived, _) in enumerate(labels) if p in arrived)
+        lab = labels[k][0][p]
+        while lab[0] != "origin":
+            if lab[0] == "walk":
+                legs.append({"walk": True, "from": tt.stations[lab[1]], "to": tt.stations[p], "seconds": lab[2]})
+                # Walks leave from a station reached by trip (or the origin) in the same round.
+                p = lab[1]
+                lab = labels[k][0][p]
+                continue
+            _, r, trip, bi, ai = lab
+            s0, n_tr, base = self.ps_ptr[r], self.pt_ptr[r + 1] - self.pt_ptr[r], self.off[r]
+            frm = self.ps[s0 + bi]
+            legs.append({"route": str(tt.pat_route[r]), "trip_id": str(tt.trip_ids[self.pt_ptr[r] + trip]),
+                         "from": tt.stations[frm], "to": tt.stations[p],
+                         "depart": format_gtfs_time(self.dep[base + bi * n_tr + trip]),
+                         "arrive": format_gtfs_time(self.arr[base + ai * n_tr + trip])})
+            # The trip was boarded at the boarding time set in the latest earlier round.
+            p, k = frm, k - 1
+            while p not in labels[k][1]:
+                k -= 1
+            lab = labels[k][1][p]
+        return legs[::-1]
+
+# ---------- batch ----------
+
+_ENGINE: Optional[Raptor] = None
+
+def _init_worker(tt_path: str):
+    global _ENGINE
+    _ENGINE = Raptor(Timetable.load(Path(tt_path)))
+
+def _one_to_all(task) -> np.ndarray:
+    origin, dep_time, max_rounds = task
+    best, _ = _ENGINE.run(origin, dep_time, max_rounds)
+    b = np.asarray(best, dtype=np.int64)
+    return np.where(b < INF, b - dep_time, -1).astype(np.int32)
+
+def isochrones(tt_path: Path, origins: Sequence[int], dep_time: int, max_rounds: int = 8, workers: int = 1) -> np.ndarray:
+    """Travel seconds from each origin to every station (-1 = unreachable), shape (len(origins), n_stations)."""
+    tasks = [(int(o), dep_time, max_rounds) for o in origins]
+    if workers <= 1:
+        _init_worker(str(tt_path))
+        rows = [_one_to_all(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(str(tt_path),)) as pool:
+            rows = list(pool.map(_one_to_all, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+    return np.vstack(rows) if rows else np.empty((0, 0), np.int32)
+
+def benchmark(engine: Raptor, n_pairs: int, dep_time: int, seed: int = 0, max_rounds: int = 8) -> dict:
+    """Random served-station pairs; per-query wall time."""
+    served = np.flatnonzero(np.diff(engine.tt.stop_pat_ptr) > 0)
+    rng = np.random.default_rng(seed)
+    pairs = rng.choice(served, size=(n_pairs, 2)) if len(served) else np.empty((0, 2), int)
+    ms, reached = [], 0
+    for o, d in pairs:
+        t0 = time.perf_counter()
+        a, _ = engine.earliest_arrival(int(o), int(d), dep_time, max_rounds)
+        ms.append((time.perf_counter() - t0) * 1e3)
+        reached += a < INF
+    ms = np.asarray(ms) if ms else np.zeros(1)
+    return {"pairs": n_pairs, "reached": int(reached), "mean_ms": float(ms.mean()),
+            "p50_ms": float(np.percentile(ms, 50)), "p95_ms": float(np.percentile(ms, 95)), "max_ms": float(ms.max())}
+
+def parse_time(s: str) -> int:
+    h, m, *sec = (int(x) for x in s.split(":"))
+    return h * 3600 + m * 60 + (sec[0] if sec else 0)
+
+def main():
+    ap = argparse.ArgumentParser(description="RAPTOR earliest-arrival queries, isochrones and benchmarks over NYC GTFS.")
+    ap.add_argument("--data", type=Path, default=Path("../data"), help="Unpacked GTFS directory (default: ../data)")
+    ap.add_argument("--day", default="monday", help="calendar.txt weekday column (default: monday)")
+    ap.add_argument("--date", help="Service date YYYYMMDD (uses date ranges and calendar_dates.txt; overrides --day)")
+    ap.add_argument("--timetable", type=Path, help="Load this .npz instead of building from GTFS")
+    ap.add_argument("--save", type=Path, help="Write the built timetable to this .npz")
+    ap.add_argument("--time", default="08:00:00", help="Departure time HH:MM[:SS] (default: 08:00:00)")
+    ap.add_argument("--rounds", type=int, default=8, help="Max trips per journey (default: 8)")
+    ap.add_argument("--from", dest="origin", help="Origin stop_id (station or platform)")
+    ap.add_argument("--to", dest="target", help="Destination stop_id")
+    ap.add_argument("--isochrone-out", type=Path, help="CSV of travel seconds from --from (or every station) to every station")
+    ap.add_argument("--workers", type=int, default=1, help="Processes for --isochrone-out (default: 1)")
+    ap.add_argument("--bench", type=int, default=0, help="Benchmark N random origin/destination pairs")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    tt = Timetable.load(args.timetable) if args.timetable else Timetable.build(args.data, args.day, args.date)
+    print(f"⏱️  timetable ready in {time.perf_counter()-t0:.2f}s")
+    if args.save:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        tt.save(args.save); print(f"💾 {args.save}")
+    engine = Raptor(tt)
+    dep_time = parse_time(args.time)
+
+    if args.origin and args.target:
+        o, d = tt.station_code(args.origin), tt.station_code(args.target)
+        t0 = time.perf_counter(); a, legs = engine.earliest_arrival(o, d, dep_time, args.rounds)
+        ms = (time.perf_counter() - t0) * 1e3
+        if a >= INF:
+            print(f"🚫 {tt.names[d]} not reachable from {tt.names[o]} within {args.rounds} trips ({ms:.2f} ms)")
+        else:
+            print(f"🧭 {tt.names[o]} → {tt.names[d]}: arrive {format_gtfs_time(a)} ({(a - dep_time) / 60:.0f} min, {ms:.2f} ms)")
+            for leg in legs:
+                if leg.get("walk"):
+                    print(f"   🚶 {tt.names[tt.station_code(leg['from'])]} → {tt.names[tt.station_code(leg['to'])]} ({leg['seconds']} s)")
+                else:
+                    print(f"   🚇 {leg['route']:>3} {leg['depart']} {tt.names[tt.station_code(leg['from'])]} → "
+                          f"{leg['arrive']} {tt.names[tt.station_code(leg['to'])]}")
+
+    if args.isochrone_out:
+        tt_path = args.timetable or args.save
+        if tt_path is None:
+            tt_path = args.isochrone_out.with_suffix(".timetable.npz"); tt.save(tt_path)
+        origins = [tt.station_code(args.origin)] if args.origin else list(range(tt.n_stations))
+        t0 = time.perf_counter()
+        m = isochrones(tt_path, origins, dep_time, args.rounds, args.workers)
+        print(f"🗺️  {len(origins):,} one-to-all searches in {time.perf_counter()-t0:.2f}s")
+        pd.DataFrame(m, index=pd.Index(tt.stations[origins], name="origin"), columns=tt.stations).to_csv(args.isochrone_out)
+        print(f"💾 {args.isochrone_out}")
+
+    if args.bench:
+        r = benchmark(engine, args.bench, dep_time, args.seed, args.rounds)
+        print(f"🏎️  {r['pairs']:,} queries ({r['reached']:,} reachable): mean {r['mean_ms']:.2f} ms, "
+              f"p50 {r['p50_ms']:.2f} ms, p95 {r['p95_ms']:.2f} ms, max {r['max_ms']:.2f} ms")
+
+if __name__ == "__main__":
+    main()
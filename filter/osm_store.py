@@ -0,0 +1,257 @@
+# save as osm_store.py
+"""
+Persistent element store for Overpass dumps: one SQLite file per dump, built
+once, so re-filtering (other tag rules, --union-tags, --include-tram, a bbox)
+does not re-parse the JSON.
+
+Tables:
+    nodes       id, lon, lat                       every node with coordinates
+    ways        id, nodes, geometry                node ids as an int64 array blob;
+                                                   inline `geometry` as float64 lon/lat pairs
+    members     relation_id, seq, type, ref, role  relation members in order
+    tags        type, id, k, v                     one row per tag of any element
+    way_rtree   R-tree of way bounding boxes
+    node_rtree  R-tree of tagged nodes (stations, platforms, ...)
+    meta        the dump's size/mtime it was built from and its header (osm3s, ...)
+
+OsmStore.ensure(dump, path) rebuilds the file when the dump changed. Queries
+take an optional (south, west, north, east) bbox and only read the matching
+rows through the R-trees; node coordinates can be fetched for just the ids a
+set of ways uses.
+"""
+import json, sqlite3, time
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from overpass_json import iter_overpass_elements
+
+SCHEMA_VERSION = "1"
+BATCH = 50_000
+
+BBox = Tuple[float, float, float, float]   # south, west, north, east
+NODE_DTYPE = np.dtype([("id", np.int64), ("lon", np.float64), ("lat", np.float64)])
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE nodes (id INTEGER PRIMARY KEY, lon REAL NOT NULL, lat REAL NOT NULL);
+CREATE TABLE ways (id INTEGER PRIMARY KEY, nodes BLOB, geometry BLOB);
+CREATE TABLE relations (id INTEGER PRIMARY KEY);
+CREATE TABLE members (relation_id INTEGER NOT NULL, seq INTEGER NOT NULL, type TEXT, ref INTEGER, role TEXT,
+                      PRIMARY KEY (relation_id, seq)) WITHOUT ROWID;
+CREATE TABLE tags (type TEXT NOT NULL, id INTEGER NOT NULL, k TEXT NOT NULL, v TEXT);
+CREATE VIRTUAL TABLE way_rtree USING rtree(id, min_lon, max_lon, min_lat, max_lat);
+CREATE VIRTUAL TABLE node_rtree USING rtree(id, min_lon, max_lon, min_lat, max_lat);
+"""
+INDEXES = """
+CREATE INDEX tags_element ON tags (type, id);
+CREATE INDEX tags_kv ON tags (k, v);
+CREATE INDEX members_ref ON members (type, ref);
+"""
+
+def _dump_stamp(dump: Path) -> Dict[str, str]:
+    st = Path(dump).stat()
+    return {"schema": SCHEMA_VERSION, "dump_size": str(st.st_size), "dump_mtime_ns": str(st.st_mtime_ns)}
+
+def build_store(dump: Path, path: Path) -> Dict[str, int]:
+    """Stream `dump` into a fresh SQLite store at `path` (written beside it, then renamed). Returns row counts."""
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.unlink(missing_ok=True)
+    con = sqlite3.connect(tmp)
+    con.executescript("PRAGMA journal_mode=OFF; PRAGMA synchronous=OFF;" + SCHEMA)
+    nodes: List[tuple] = []; ways: List[tuple] = []; members: List[tuple] = []; tags: List[tuple] = []
+    tagged_nodes: List[tuple] = []
+    counts = {"node": 0, "way": 0, "relation": 0, "tag": 0}
+
+    def flush():
+        con.executemany("INSERT OR REPLACE INTO nodes VALUES (?,?,?)", nodes)
+        con.executemany("INSERT OR REPLACE INTO ways VALUES (?,?,?)", ways)
+        con.executemany("INSERT OR REPLACE INTO members VALUES (?,?,?,?,?)", members)
+        con.executemany("INSERT INTO tags VALUES (?,?,?,?)", tags)
+        con.executemany("INSERT OR REPLACE INTO node_rtree VALUES (?,?,?,?,?)", tagged_nodes)
+        for rows in (nodes, ways, members, tags, tagged_nodes):
+            rows.clear()
+
+    t0 = time.time()
+    meta: dict = {}
+    for el in iter_overpass_elements(dump, meta):
+        kind, eid = el.get("type"), el.get("id")
+        if not isinstance(eid, int):
+            continue
+        if kind == "node":
+            if "lat" not in el or "lon" not in el:
+                continue
+            lon, lat = float(el["lon"]), float(el["lat"])
+            nodes.append((eid, lon, lat))
+            if el.get("tags"):
+                tagged_nodes.append((eid, lon, lon, lat, lat))
+        elif kind == "way":
+            geom = el.get("geometry")
+            geom_blob = None
+            if isinstance(geom, list) and len(geom) >= 2 and "lon" in geom[0]:
+                geom_blob = array("d", [c for pt in geom if "lon" in pt and "lat" in pt
+                                        for c in (float(pt["lon"]), float(pt["lat"]))]).tobytes()
+            ways.append((eid, array("q", [n for n in el.get("nodes") or () if isinstance(n, int)]).tobytes(), geom_blob))
+        elif kind == "relation":
+            con.execute("INSERT OR IGNORE INTO relations VALUES (?)", (eid,))
+            members += [(eid, i, m.get("type"), m.get("ref"), m.get("role", "")) for i, m in enumerate(el.get("members") or ())]
+        else:
+            continue
+        counts[kind] += 1
+        for k, v in (el.get("tags") or {}).items():
+            tags.append((kind, eid, k, v))
+        counts["tag"] += len(el.get("tags") or ())
+        if len(nodes) + len(ways) + len(members) + len(tags) >= BATCH:
+            flush()
+    flush()
+    con.executescript(INDEXES)
+    _index_way_bboxes(con)
+    stamp = {**_dump_stamp(dump), "dump": str(Path(dump).resolve()), "header": json.dumps(meta, ensure_ascii=False)}
+    con.executemany("INSERT OR REPLACE INTO meta VALUES (?,?)", stamp.items())
+    con.commit()
+    con.close()
+    tmp.replace(path)
+    print(f"🗄️  store built in {time.time()-t0:.2f}s: {counts['node']:,} nodes, {counts['way']:,} ways, "
+          f"{counts['relation']:,} relations, {counts['tag']:,} tags → {path}")
+    return counts
+
+def _index_way_bboxes(con: sqlite3.Connection):
+    """Way bounding boxes from their node coordinates (inline geometry when there is one), in one vectorized pass."""
+    rows = np.fromiter(con.execute("SELECT id, lon, lat FROM nodes ORDER BY id"), dtype=NODE_DTYPE)
+    ids, xy = rows["id"], np.column_stack([rows["lon"], rows["lat"]])
+    rows = []
+    for wid, nodes_blob, geom_blob in con.execute("SELECT id, nodes, geometry FROM ways"):
+        if geom_blob:
+            pts = np.frombuffer(geom_blob, dtype=np.float64).reshape(-1, 2)
+        else:
+            refs = np.frombuffer(nodes_blob, dtype=np.int64)
+            pos = np.searchsorted(ids, refs)
+            pos[pos == len(ids)] = 0
+            pts = xy[pos[ids[pos] == refs]] if len(ids) else xy[:0]
+        if len(pts):
+            (x0, y0), (x1, y1) = pts.min(axis=0), pts.max(axis=0)
+            rows.append((wid, float(x0), float(x1), float(y0), float(y1)))
+    con.executemany("INSERT INTO way_rtree VALUES (?,?,?,?,?)", rows)
+
+class OsmStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.con = sqlite3.connect(self.path)
+        self.meta = dict(self.con.execute("SELECT key, value FROM meta"))
+
+    @classmethod
+    def ensure(cls, dump: Path, path: Optional[Path] = None, rebuild: bool = False) -> "OsmStore":
+        """Open the store for `dump` (default: <dump>.sqlite), building it first if missing, stale or forced."""
+        path = Path(path) if path else Path(dump).with_name(Path(dump).name + ".sqlite")
+        if not rebuild and path.exists():
+            store = cls(path)
+            if all(store.meta.get(k) == v for k, v in _dump_stamp(dump).items()):
+                return store
+            store.close()
+            print(f"♻️  {path.name} is stale for {Path(dump).name}; rebuilding")
+        build_store(dump, path)
+        return cls(path)
+
+    def close(self):
+        self.con.close()
+
+    @property
+    def header(self) -> dict:
+        return json.loads(self.meta.get("header") or "{}")
+
+    # ---------- queries ----------
+
+    def _select(self, ids: Iterable[int]):
+        """Load ids into the temp table _ids, which the queries below join against (one join, not a query per id)."""
+        self.con.execute("CREATE TEMP TABLE IF NOT EXISTS _ids (id INTEGER PRIMARY KEY)")
+        self.con.execute("DELETE FROM _ids")
+        self.con.executemany("INSERT OR IGNORE INTO _ids VALUES (?)", ((int(i),) for i in ids))
+
+    def _tags(self, kind: str, keys: Optional[Sequence[str]] = None) -> Dict[int, dict]:
+        """Tags of the selected ids of one element type, optionally only these keys."""
+        sql = "SELECT t.id, t.k, t.v FROM tags t JOIN _ids USING (id) WHERE t.type = ?"
+        args: list = [kind]
+        if keys is not None:
+            sql += f" AND t.k IN ({','.join('?' * len(keys))})"
+            args += list(keys)
+        out: Dict[int, dict] = {}
+        for eid, k, v in self.con.execute(sql, args):
+            out.setdefault(eid, {})[k] = v
+        return out
+
+    @staticmethod
+    def _bbox_args(bbox: BBox) -> Tuple[float, float, float, float]:
+        s, w, n, e = bbox
+        return w, e, s, n   # rtree filter: max_lon >= w, min_lon <= e, max_lat >= s, min_lat <= n
+
+    def way_ids(self, bbox: Optional[BBox] = None) -> List[int]:
+        if bbox is None:
+            return [r[0] for r in self.con.execute("SELECT id FROM ways")]
+        return [r[0] for r in self.con.execute(
+            "SELECT id FROM way_rtree WHERE max_lon >= ? AND min_lon <= ? AND max_lat >= ? AND min_lat <= ?",
+            self._bbox_args(bbox))]
+
+    def ways(self, ids: Optional[Iterable[int]] = None, bbox: Optional[BBox] = None,
+             tag_keys: Optional[Sequence[str]] = None) -> List[dict]:
+        """Way dicts shaped like Overpass JSON (id, nodes, geometry when inline, tags), by ids and/or bbox."""
+        wanted = list(ids) if ids is not None else self.way_ids(bbox)
+        if ids is not None and bbox is not None:
+            inside = set(self.way_ids(bbox))
+            wanted = [i for i in wanted if i in inside]
+        self._select(wanted)
+        tags = self._tags("way", tag_keys)
+        out = []
+        for wid, nodes_blob, geom_blob in self.con.execute(
+                "SELECT w.id, w.nodes, w.geometry FROM ways w JOIN _ids USING (id)"):
+            w = {"id": wid, "nodes": np.frombuffer(nodes_blob, dtype=np.int64).tolist()}
+            if geom_blob:
+                w["geometry"] = [{"lat": lat, "lon": lon} for lon, lat in np.frombuffer(geom_blob, dtype=np.float64).reshape(-1, 2).tolist()]
+            if wid in tags:
+                w["tags"] = tags[wid]
+            out.append(w)
+        return out
+
+    def node_coords(self, ids: Optional[Iterable[int]] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(ids, lons, lats) for the given node ids (default: every node)."""
+        if ids is None:
+            cur = self.con.execute("SELECT id, lon, lat FROM nodes")
+        else:
+            self._select(ids)
+            cur = self.con.execute("SELECT n.id, n.lon, n.lat FROM nodes n JOIN _ids USING (id)")
+        rows = np.fromiter(cur, dtype=NODE_DTYPE)
+        return rows["id"], rows["lon"], rows["lat"]
+
+    def tagged_nodes(self, bbox: Optional[BBox] = None, tag_keys: Optional[Sequence[str]] = None) -> List[dict]:
+        """Tagged nodes (id, lon, lat, tags), optionally within bbox."""
+        sql = "SELECT r.id, n.lon, n.lat FROM node_rtree r JOIN nodes n USING (id)"
+        args: tuple = ()
+        if bbox is not None:
+            sql += " WHERE r.max_lon >= ? AND r.min_lon <= ? AND r.max_lat >= ? AND r.min_lat <= ?"
+            args = self._bbox_args(bbox)
+        rows = self.con.execute(sql + " ORDER BY r.id", args).fetchall()
+        self._select(r[0] for r in rows)
+        tags = self._tags("node", tag_keys)
+        return [{"id": nid, "lon": lon, "lat": lat, "tags": tags.get(nid, {})} for nid, lon, lat in rows]
+
+    def relations(self, bbox: Optional[BBox] = None, tag_keys: Optional[Sequence[str]] = None) -> List[dict]:
+        """Relations (id, members, tags); with bbox, those with a member way or tagged node inside it."""
+        if bbox is None:
+            ids = [r[0] for r in self.con.execute("SELECT id FROM relations")]
+        else:
+            args = self._bbox_args(bbox)
+            ids = sorted({r[0] for r in self.con.execute(
+                "SELECT m.relation_id FROM members m JOIN way_rtree r ON m.type = 'way' AND m.ref = r.id "
+                "WHERE r.max_lon >= ? AND r.min_lon <= ? AND r.max_lat >= ? AND r.min_lat <= ? "
+                "UNION SELECT m.relation_id FROM members m JOIN node_rtree r ON m.type = 'node' AND m.ref = r.id "
+                "WHERE r.max_lon >= ? AND r.min_lon <= ? AND r.max_lat >= ? AND r.min_lat <= ?", args + args)})
+        self._select(ids)
+        tags = self._tags("relation", tag_keys)
+        members: Dict[int, list] = {}
+        for rid, typ, ref, role in self.con.execute(
+                "SELECT m.relation_id, m.type, m.ref, m.role FROM members m JOIN _ids i ON m.relation_id = i.id "
+                "ORDER BY m.relation_id, m.seq"):
+            members.setdefault(rid, []).append({"type": typ, "ref": ref, "role": role})
+        return [{"type": "relation", "id": rid, "members": members.get(rid, []), "tags": tags.get(rid, {})} for rid in ids]
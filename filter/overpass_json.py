@@ -0,0 +1,109 @@
+# save as overpass_json.py
+"""
+Incremental reader for saved Overpass JSON dumps (.json or .json.gz).
+
+Walks the top-level object and yields the members of ``elements`` one at a
+time, so callers never hold the raw bytes, the decoded text and the full
+element list in memory at once.
+"""
+import gzip, io, json
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+_WS = " \t\n\r"
+
+def open_overpass_text(path: Path) -> io.TextIOBase:
+    with open(path, "rb") as f:
+        magic = f.read(2)
+    if magic == b"\x1f\x8b":
+        return io.TextIOWrapper(gzip.open(path, "rb"), encoding="utf-8", errors="replace")
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+class _Reader:
+    """Sliding text buffer over a file with just enough JSON tokenizing for the top level."""
+
+    def __init__(self, fh: io.TextIOBase, chunk_chars: int):
+        self.fh, self.chunk = fh, chunk_chars
+        self.buf, self.pos, self.eof = "", 0, False
+        self.dec = json.JSONDecoder()
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        more = self.fh.read(self.chunk)
+        if not more:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + more
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WS:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, ch: str):
+        got = self.peek()
+        if got != ch:
+            raise ValueError(f"Overpass JSON: expected {ch!r}, got {got[:1]!r} near offset {self.pos}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                obj, end = self.dec.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # Incomplete value at the end of the buffer: read more and retry.
+                if not self.fill():
+                    raise
+                continue
+            # A bare number could have been cut short at the buffer edge.
+            if end == len(self.buf) and not isinstance(obj, (dict, list, str)) and self.fill():
+                continue
+            self.pos = end
+            return obj
+
+def iter_overpass_elements(path: Path,
+                           meta: Optional[Dict[str, Any]] = None,
+                           chunk_chars: int = 1 << 20) -> Iterator[dict]:
+    """
+    Yield each entry of the top-level ``elements`` array in file order.
+    Every other top-level key (version, osm3s, remark, ...) is stored into
+    ``meta`` when given; keys after ``elements`` arrive once iteration ends.
+    """
+    meta = {} if meta is None else meta
+    with open_overpass_text(path) as fh:
+        rd = _Reader(fh, chunk_chars)
+        rd.expect("{")
+        if rd.peek() == "}":
+            return
+        while True:
+            key = rd.value()
+            rd.expect(":")
+            if key == "elements":
+                rd.expect("[")
+                if rd.peek() == "]":
+                    rd.pos += 1
+                else:
+                    while True:
+                        yield rd.value()
+                        nxt = rd.peek()
+                        rd.pos += 1
+                        if nxt == "]":
+                            break
+                        if nxt != ",":
+                            raise ValueError(f"Overpass JSON: bad separator {nxt!r} in elements")
+            else:
+                meta[key] = rd.value()
+            nxt = rd.peek()
+            rd.pos += 1
+            if nxt == "}":
+                return
+            if nxt != ",":
+                raise ValueError(f"Overpass JSON: bad separator {nxt!r} at top level")
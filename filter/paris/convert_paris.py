@@ -0,0 +1,102 @@
+# save as convert_paris.py
+"""
+Île-de-France Mobilités data → WGS84 GeoJSON for the viewer.
+
+    transit   schema_gares-gf.geojson + schema_trace_fermetrotram-gf.geojson
+              (Lambert-93 coordinates, whatever CRS the file claims, often with Z)
+              → paris_stations.geojson + paris_routes.geojson
+    gares     stations.csv (';'-separated, x/y in Lambert-93)
+              → stations_from_csv.geojson
+
+Coordinates are dropped to 2D with shapely.force_2d and reprojected with one
+cached pyproj Transformer call over the flat coordinate array of the whole
+layer, so no per-geometry Python runs between reading and writing.
+convert_paris_transit_geojson.py and convert_paris_gares.py are thin wrappers
+that keep the old paths.
+"""
+import argparse, sys, time
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import shapely
+import geopandas as gpd
+from pyproj import Transformer
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from geojson_writer import write_geojson
+
+LAMBERT_93 = "EPSG:2154"
+WGS84 = "EPSG:4326"
+
+@lru_cache(maxsize=None)
+def transformer(src_crs: str, dst_crs: str = WGS84) -> Transformer:
+    return Transformer.from_crs(src_crs, dst_crs, always_xy=True)
+
+def reproject_xy(x: np.ndarray, y: np.ndarray, src_crs: str, dst_crs: str = WGS84):
+    return transformer(src_crs, dst_crs).transform(x, y)
+
+def reproject_2d(geoms: np.ndarray, src_crs: str, dst_crs: str = WGS84) -> np.ndarray:
+    """Drop Z and reproject every coordinate of every geometry in one call."""
+    tr = transformer(src_crs, dst_crs)
+    return shapely.transform(shapely.force_2d(geoms), lambda xy: np.column_stack(tr.transform(xy[:, 0], xy[:, 1])))
+
+def read_layer(path: Path, src_crs: str, columns: Optional[Sequence[str]] = None) -> gpd.GeoDataFrame:
+    """Read a layer and convert it to 2D WGS84, treating its coordinates as src_crs regardless of the file's CRS."""
+    gdf = gpd.read_file(path, columns=list(columns) if columns else None)
+    print(f"📥 {Path(path).name}: {len(gdf):,} features, file CRS {gdf.crs}, treated as {src_crs}")
+    return gpd.GeoDataFrame(gdf.drop(columns=gdf.geometry.name), geometry=reproject_2d(gdf.geometry.values, src_crs), crs=WGS84)
+
+def convert_transit(stations_path: Path, routes_path: Path, out_dir: Path, src_crs: str = LAMBERT_93,
+                    station_columns: Optional[Sequence[str]] = None, route_columns: Optional[Sequence[str]] = None,
+                    precision: Optional[int] = None):
+    out_dir = Path(out_dir); out_dir.mkdir(parents=True, exist_ok=True)
+    stations = read_layer(stations_path, src_crs, station_columns)
+    routes = read_layer(routes_path, src_crs, route_columns)
+    print("Bounds after reprojection:")
+    print("  stations:", stations.total_bounds)
+    print("  routes  :", routes.total_bounds)
+    write_geojson(stations, out_dir / "paris_stations.geojson", precision=precision)
+    write_geojson(routes, out_dir / "paris_routes.geojson", precision=precision)
+    print(f"✅ Exported cleaned GeoJSON files to {out_dir}/")
+    return stations, routes
+
+def convert_gares(csv_path: Path, out_path: Path, src_crs: str = LAMBERT_93, x_col: str = "x", y_col: str = "y",
+                  sep: str = ";", columns: Optional[Sequence[str]] = None, precision: Optional[int] = None) -> gpd.GeoDataFrame:
+    usecols = list(dict.fromkeys([*columns, x_col, y_col])) if columns else None
+    df = pd.read_csv(csv_path, sep=sep, usecols=usecols)
+    lon, lat = reproject_xy(df[x_col].to_numpy(dtype=np.float64), df[y_col].to_numpy(dtype=np.float64), src_crs)
+    gdf = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(lon, lat), crs=WGS84)
+    Path(out_path).parent.mkdir(parents=True, exist_ok=True)
+    write_geojson(gdf, out_path, precision=precision)
+    print(f"✅ Saved corrected GeoJSON to {out_path}")
+    return gdf
+
+def main():
+    ap = argparse.ArgumentParser(description="Convert IDFM Lambert-93 stations/routes to WGS84 GeoJSON.")
+    ap.add_argument("what", choices=["transit", "gares", "all"], nargs="?", default="all")
+    ap.add_argument("--stations", type=Path, default=Path("data/schema_gares-gf.geojson"))
+    ap.add_argument("--routes", type=Path, default=Path("data/schema_trace_fermetrotram-gf.geojson"))
+    ap.add_argument("--csv", type=Path, default=Path("stations.csv"), help="Gares CSV (default: stations.csv)")
+    ap.add_argument("--out", type=Path, default=Path("output"), help="Output directory (default: output)")
+    ap.add_argument("--src-crs", default=LAMBERT_93, help="CRS of the input coordinates (default: EPSG:2154)")
+    ap.add_argument("--station-columns", nargs="+", help="Attribute columns to keep from --stations (default: all)")
+    ap.add_argument("--route-columns", nargs="+", help="Attribute columns to keep from --routes (default: all)")
+    ap.add_argument("--csv-columns", nargs="+", help="Columns to keep from --csv besides x/y (default: all)")
+    ap.add_argument("--x-col", default="x"); ap.add_argument("--y-col", default="y")
+    ap.add_argument("--precision", type=int, help="Decimal places kept in GeoJSON coordinates (default: all)")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    if args.what in ("transit", "all"):
+        convert_transit(args.stations, args.routes, args.out, args.src_crs, args.station_columns, args.route_columns,
+                        args.precision)
+    if args.what in ("gares", "all"):
+        convert_gares(args.csv, args.out / "stations_from_csv.geojson", args.src_crs, args.x_col, args.y_col,
+                      columns=args.csv_columns, precision=args.precision)
+    print(f"⏱️  {time.perf_counter()-t0:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+# save as stations.py
+"""
+Consolidate station points into one feature per station complex, for any city.
+
+Two points join the same complex when they are within --radius metres of each
+other and their names agree after normalize_name() (a point without a name
+joins any neighbour). Pairs come from one STRtree dwithin query in a local UTM
+CRS, so the work is O(n log n) plus the number of close pairs, never all pairs;
+complexes are the connected components of those pairs.
+
+Each output feature has:
+    complex_id, name, n_sources, source_ids   ids of the merged input points, comma-joined
+    lines                                     lines serving the complex, comma-joined:
+                                              the --lines-col values of its members plus
+                                              the --route-label of every route within
+                                              --line-radius metres (when --routes is given)
+and sits at the centroid of its members.
+"""
+import argparse, re, unicodedata
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import numpy as np
+import shapely
+import geopandas as gpd
+
+from geojson_writer import write_geojson
+
+NAME_COLUMNS = ("name", "stop_name", "nom_gares", "nom_long", "nom", "name:en")
+ID_COLUMNS = ("id", "stop_id", "id_gares", "id_ref_zdl", "gares_id")
+ROUTE_LABEL_COLUMNS = ("ref", "route_short_name", "indice_lig", "res_com", "name", "shape_id")
+
+# Words that only say "this is a station" and differ between sources.
+GENERIC_WORDS = {"station", "stations", "gare", "subway", "metro", "underground", "tube", "stn"}
+_PUNCT = re.compile(r"[^\w]+")
+
+def normalize_name(name) -> str:
+    """Casefolded, accent-free, punctuation-free name without generic station words or a trailing 駅."""
+    if not isinstance(name, str) or not name.strip():
+        return ""
+    s = unicodedata.normalize("NFKD", name)
+    s = "".join(c for c in s if not unicodedata.combining(c)).casefold()
+    s = s.strip().removesuffix("駅")
+    words = [w for w in _PUNCT.sub(" ", s).split() if w not in GENERIC_WORDS]
+    return " ".join(words)
+
+def pick_column(gdf: gpd.GeoDataFrame, wanted: Optional[str], candidates: Sequence[str]) -> Optional[str]:
+    if wanted:
+        if wanted not in gdf.columns:
+            raise KeyError(f"column {wanted!r} not in {list(gdf.columns)}")
+        return wanted
+    return next((c for c in candidates if c in gdf.columns), None)
+
+def connected_components(n: int, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+    """Component label (0..k-1) per vertex for the undirected edges (i, j): hook to the smaller root, then pointer-jump."""
+    parent = np.arange(n)
+    while len(i):
+        pi, pj = parent[i], parent[j]
+        if np.array_equal(pi, pj):
+            break
+        lo = np.minimum(pi, pj)
+        np.minimum.at(parent, pi, lo)
+        np.minimum.at(parent, pj, lo)
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                break
+            parent = grand
+    return np.unique(parent, return_inverse=True)[1]
+
+def split_list(v) -> List[str]:
+    if v is None or (isinstance(v, float) and np.isnan(v)):
+        return []
+    if isinstance(v, (list, tuple, np.ndarray)):
+        return [str(x) for x in v]
+    return [x.strip() for x in str(v).split(",") if x.strip()]
+
+def route_labels(routes: gpd.GeoDataFrame, column: Optional[str] = None, regex: Optional[str] = None) -> Optional[np.ndarray]:
+    """Line label per route ("" when unknown), optionally cut down by regex (group 1, or the whole match)."""
+    column = pick_column(routes, column, ROUTE_LABEL_COLUMNS)
+    if not column:
+        return None
+    labels = routes[column].astype("string").fillna("").to_numpy(dtype=object)
+    if regex:
+        rx = re.compile(regex)
+        labels = np.array([(m.group(1) if m.groups() else m.group(0)) if m else s
+                           for s, m in ((s, rx.search(s)) for s in labels)], dtype=object)
+    return labels
+
+def consolidate_stations(stations: gpd.GeoDataFrame, radius_m: float = 150.0,
+                         name_col: Optional[str] = None, id_col: Optional[str] = None,
+                         lines_col: Optional[str] = None,
+                         routes: Optional[gpd.GeoDataFrame] = None, route_label: Optional[str] = None,
+                         route_label_regex: Optional[str] = None, line_radius_m: float = 60.0) -> gpd.GeoDataFrame:
+    """One Point feature per station complex (see module docstring)."""
+    stations = stations.set_crs(4326) if stations.crs is None else stations
+    stations = stations[~(stations.geometry.isna() | stations.geometry.is_empty)].reset_index(drop=True)
+    if stations.empty:
+        return gpd.GeoDataFrame(columns=["complex_id", "name", "n_sources", "source_ids", "lines", "geometry"],
+                                geometry="geometry", crs=4326)
+    name_col = pick_column(stations, name_col, NAME_COLUMNS)
+    id_col = pick_column(stations, id_col, ID_COLUMNS)
+
+    metric = stations.estimate_utm_crs()
+    pts = shapely.centroid(stations.geometry.to_crs(metric).values)
+    names = stations[name_col].to_numpy(dtype=object) if name_col else np.full(len(stations), None, dtype=object)
+    norm = np.array([normalize_name(n) for n in names], dtype=object)
+
+    i, j = shapely.STRtree(pts).query(pts, predicate="dwithin", distance=radius_m)
+    keep = (i < j) & ((norm[i] == norm[j]) | (norm[i] == "") | (norm[j] == ""))
+    labels = connected_components(len(pts), i[keep], j[keep])
+    n_complex = int(labels.max()) + 1
+
+    xy = shapely.get_coordinates(pts)
+    counts = np.bincount(labels, minlength=n_complex)
+    cx = np.bincount(labels, weights=xy[:, 0], minlength=n_complex) / counts
+    cy = np.bincount(labels, weights=xy[:, 1], minlength=n_complex) / counts
+    centroids = shapely.points(cx, cy)
+
+    order = np.argsort(labels, kind="stable")
+    bounds = np.concatenate([[0], np.cumsum(counts)])
+    ids = stations[id_col].astype(str).to_numpy(dtype=object) if id_col else np.arange(len(stations)).astype(str)
+    own_lines = stations[lines_col].to_numpy(dtype=object) if lines_col else None
+
+    served = [set() for _ in range(n_complex)]
+    if own_lines is not None:
+        for k, v in zip(labels, own_lines):
+            served[k].update(split_list(v))
+    if routes is not None and not routes.empty:
+        labels_r = route_labels(routes, route_label, route_label_regex)
+        if labels_r is not None:
+            r_geoms = (routes.set_crs(4326) if routes.crs is None else routes).geometry.to_crs(metric).values
+            c_idx, r_idx = shapely.STRtree(r_geoms).query(centroids, predicate="dwithin", distance=line_radius_m)
+            for c, r in zip(c_idx, r_idx):
+                if labels_r[r]:
+                    served[c].add(labels_r[r])
+
+    rows = []
+    for k in range(n_complex):
+        members = order[bounds[k]:bounds[k + 1]]
+        member_names = [n for n in names[members] if isinstance(n, str) and n.strip()]
+        rows.append({
+            "complex_id": k,
+            "name": Counter(member_names).most_common(1)[0][0] if member_names else None,
+            "n_sources": len(members),
+            "source_ids": ",".join(ids[members]),
+            "lines": ",".join(sorted(served[k])) or None,
+        })
+    out = gpd.GeoDataFrame(rows, geometry=gpd.GeoSeries(centroids, crs=metric).to_crs(4326).values, crs=4326)
+    print(f"🚉 {len(stations):,} station points → {n_complex:,} complexes "
+          f"(radius {radius_m:g} m, {int((counts > 1).sum()):,} merged)")
+    return out
+
+def main():
+    ap = argparse.ArgumentParser(description="Merge duplicate station points into one feature per station complex.")
+    ap.add_argument("input", type=Path, help="Stations GeoJSON (points)")
+    ap.add_argument("--out", type=Path, help="Output GeoJSON (default: <input stem>.complexes.geojson next to the input)")
+    ap.add_argument("--radius", type=float, default=150.0, help="Max distance in metres between points of one complex (default: 150)")
+    ap.add_argument("--name-col", help=f"Station name column (default: first of {', '.join(NAME_COLUMNS)})")
+    ap.add_argument("--id-col", help=f"Station id column (default: first of {', '.join(ID_COLUMNS)})")
+    ap.add_argument("--lines-col", help="Column already listing the lines at each point (comma-separated)")
+    ap.add_argument("--routes", type=Path, help="Routes GeoJSON; lines within --line-radius are added to each complex")
+    ap.add_argument("--route-label", help=f"Route column naming the line (default: first of {', '.join(ROUTE_LABEL_COLUMNS)})")
+    ap.add_argument("--route-label-regex", help="Regex applied to the route label; group 1 (or the match) is kept, e.g. '^([^.]+)' for GTFS shape ids")
+    ap.add_argument("--line-radius", type=float, default=60.0, help="Route-to-complex distance in metres (default: 60)")
+    args = ap.parse_args()
+
+    stations = gpd.read_file(args.input)
+    routes = gpd.read_file(args.routes) if args.routes else None
+    out = consolidate_stations(stations, args.radius, args.name_col, args.id_col, args.lines_col,
+                               routes, args.route_label, args.route_label_regex, args.line_radius)
+    out_path = args.out or args.input.with_name(f"{args.input.name.split('.')[0]}.complexes.geojson")
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    write_geojson(out, out_path)
+    print(f"💾 {out_path}")
+
+if __name__ == "__main__":
+    main()
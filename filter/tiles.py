@@ -0,0 +1,203 @@
+# save as tiles.py
+"""
+Cut the pipeline's GeoJSON layers into a z/x/y tile pyramid for the viewer.
+
+    tiles/<z>/<x>/<y>.geojson   features of every layer touching that tile,
+                                simplified for the zoom and clipped to the tile
+                                (plus a small buffer so strokes don't seam);
+                                each feature carries "_city" and "_layer"
+    tiles/index.json            zooms, non-empty tiles per zoom, and per-city
+                                bounds/layers, so the viewer fetches only what
+                                intersects its viewport
+
+Zoom by zoom, the parent simplifies every layer once for that zoom, then a
+process pool cuts its tile columns (one task per column); the workers get only
+that zoom's geometries and build their spatial indexes from them once.
+"""
+import argparse, json, math, os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+import shapely
+import geopandas as gpd
+
+from lod import json_properties
+
+# Pipeline outputs as the viewer (src/nyc_paris_tokyo_london_main.js) loads them, relative to the repo root.
+DEFAULT_LAYERS = {
+    ("paris", "routes"):    "data/traces-du-reseau-ferre-idf.geojson",
+    ("paris", "stations"):  "data/emplacement-des-gares-idf-data-generalisee.geojson",
+    ("nyc", "routes"):      "data/nyc_subway_routes.geojson",
+    ("nyc", "stations"):    "data/nyc_subway_stations.geojson",
+    ("tokyo", "routes"):    "filter/data_tokyo/tokyo_subway_routes.geojson",
+    ("tokyo", "stations"):  "filter/data_tokyo/tokyo_subway_stations.geojson",
+    ("london", "routes"):   "data/london/london_tube_routes.geojson",
+    ("london", "stations"): "data/london/london_tube_stations.geojson",
+}
+
+TILE_PX = 256
+BUFFER = 1 / 64            # fraction of a tile added on each side before clipping
+EARTH_CIRC = 2 * math.pi * 6378137
+
+def lonlat_to_tile(lon: float, lat: float, z: int) -> Tuple[int, int]:
+    n = 2 ** z
+    lat = max(min(lat, 85.05112878), -85.05112878)
+    x = int((lon + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """(west, south, east, north) in degrees."""
+    n = 2 ** z
+    lon = lambda i: i / n * 360 - 180
+    lat = lambda j: math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * j / n))))
+    return lon(x), lat(y + 1), lon(x + 1), lat(y)
+
+def zoom_tolerance_m(z: int) -> float:
+    """Half a pixel at the equator, in Web Mercator metres."""
+    return EARTH_CIRC / (TILE_PX * 2 ** z) / 2
+
+def zoom_precision(z: int) -> int:
+    return max(0, math.ceil(-math.log10(360 / (TILE_PX * 2 ** z)))) + 1
+
+# ---------- worker side ----------
+
+_ZOOM: List[Tuple[np.ndarray, List[str], shapely.STRtree]] = []   # per layer, for the zoom being cut
+
+def _init_worker(layers: List[Tuple[np.ndarray, List[str]]]):
+    """layers: (simplified geometries, property JSON) per layer for one zoom."""
+    global _ZOOM
+    _ZOOM = [(simp, props, shapely.STRtree(simp)) for simp, props in layers]
+
+def _cut_column(task) -> List[Tuple[int, int, int, int]]:
+    z, x, y0, y1, out_dir = task
+    written = []
+    for y in range(y0, y1 + 1):
+        w, s, e, n = tile_bounds(z, x, y)
+        bw, bh = (e - w) * BUFFER, (n - s) * BUFFER
+        box = (w - bw, s - bh, e + bw, n + bh)
+        feats = []
+        for simp, props, tree in _ZOOM:
+            idx = tree.query(shapely.box(*box), predicate="intersects")
+            if not len(idx):
+                continue
+            idx.sort()
+            clipped = shapely.clip_by_rect(simp[idx], *box)
+            for i, g in zip(idx, clipped):
+                if g is None or g.is_empty:
+                    continue
+                feats.append(f'{{"type":"Feature","properties":{props[i]},"geometry":{shapely.to_geojson(g)}}}')
+        if feats:
+            path = Path(out_dir) / str(z) / str(x) / f"{y}.geojson"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text('{"type":"FeatureCollection","features":[\n' + ",\n".join(feats) + "\n]}", encoding="utf-8")
+            written.append((z, x, y, len(feats)))
+    return written
+
+# ---------- driver ----------
+
+def load_layers(layers: Dict[Tuple[str, str], Path]) -> List[Tuple[str, str, gpd.GeoDataFrame]]:
+    out = []
+    for (city, name), path in layers.items():
+        if not Path(path).exists():
+            print(f"⚠️  skipping {city}/{name}: {path} not found")
+            continue
+        gdf = gpd.read_file(path)
+        gdf = (gdf.set_crs(4326) if gdf.crs is None else gdf.to_crs(4326))
+        gdf = gdf[~(gdf.geometry.isna() | gdf.geometry.is_empty)].reset_index(drop=True)
+        out.append((city, name, gdf))
+    return out
+
+def layer_properties(loaded: List[Tuple[str, str, gpd.GeoDataFrame]]) -> List[List[str]]:
+    """Per layer, each feature's properties as JSON (plus _city/_layer); the same at every zoom."""
+    return [[json.dumps({**json_properties(p), "_city": city, "_layer": name}, ensure_ascii=False, default=str)
+             for p in gdf.drop(columns=gdf.geometry.name).to_dict("records")]
+            for city, name, gdf in loaded]
+
+def simplify_for_zoom(merc: List[np.ndarray], z: int) -> List[np.ndarray]:
+    """Web Mercator geometries per layer → simplified for zoom z, back in lon/lat, rounded to its precision."""
+    tol, prec = zoom_tolerance_m(z), zoom_precision(z)
+    out = []
+    for geoms in merc:
+        simp = gpd.GeoSeries(shapely.simplify(geoms, tol, preserve_topology=True), crs=3857).to_crs(4326).values
+        out.append(shapely.transform(np.asarray(simp), lambda xy: np.round(xy, prec)))
+    return out
+
+def cut_zoom(layers: List[Tuple[np.ndarray, List[str]]], tasks: list, workers: int) -> List[Tuple[int, int, int, int]]:
+    """Cut one zoom's tile columns, in-process or on a pool initialised with that zoom's layers."""
+    if workers <= 1:
+        _init_worker(layers)
+        return [w for t in tasks for w in _cut_column(t)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(layers,)) as pool:
+        return [w for ws in pool.map(_cut_column, tasks, chunksize=max(1, len(tasks) // (workers * 8))) for w in ws]
+
+def build_tiles(layers: Dict[Tuple[str, str], Path], out_dir: Path, zmin: int = 9, zmax: int = 14,
+                workers: int = os.cpu_count() or 1) -> dict:
+    loaded = load_layers(layers)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    cities: Dict[str, dict] = {}
+    for city, name, gdf in loaded:
+        c = cities.setdefault(city, {"bounds": [180.0, 90.0, -180.0, -90.0], "layers": []})
+        b = gdf.total_bounds
+        c["bounds"] = [min(c["bounds"][0], b[0]), min(c["bounds"][1], b[1]), max(c["bounds"][2], b[2]), max(c["bounds"][3], b[3])]
+        c["layers"].append(name)
+
+    tasks = []
+    for z in range(zmin, zmax + 1):
+        for c in cities.values():
+            w, s, e, n = c["bounds"]
+            x0, y0 = lonlat_to_tile(w, n, z)
+            x1, y1 = lonlat_to_tile(e, s, z)
+            tasks += [(z, x, y0, y1, str(out_dir)) for x in range(x0, x1 + 1)]
+    tasks = sorted(set(tasks))
+
+    props = layer_properties(loaded)
+    merc = [gdf.geometry.to_crs(3857).values for _, _, gdf in loaded]
+    tiles: Dict[str, List[List[int]]] = {str(z): [] for z in range(zmin, zmax + 1)}
+    n_feats = 0
+    for z in range(zmin, zmax + 1):
+        zoom_tasks = [t for t in tasks if t[0] == z]
+        if not zoom_tasks:
+            continue
+        for _, x, y, k in cut_zoom(list(zip(simplify_for_zoom(merc, z), props)), zoom_tasks, workers):
+            tiles[str(z)].append([x, y]); n_feats += k
+
+    index = {
+        "format": "geojson",
+        "minzoom": zmin, "maxzoom": zmax, "tile_size": TILE_PX,
+        "url": "{z}/{x}/{y}.geojson",
+        "cities": cities,
+        "tiles": {z: sorted(v) for z, v in tiles.items()},
+    }
+    (out_dir / "index.json").write_text(json.dumps(index, separators=(",", ":")), encoding="utf-8")
+    n_tiles = sum(len(v) for v in tiles.values())
+    print(f"🧱 {n_tiles:,} tiles ({n_feats:,} clipped features) for z{zmin}–{zmax} → {out_dir}")
+    return index
+
+def parse_layer(spec: str) -> Tuple[Tuple[str, str], Path]:
+    """'city/layer=path' → ((city, layer), path)."""
+    key, _, path = spec.partition("=")
+    city, _, name = key.partition("/")
+    if not path or not name:
+        raise argparse.ArgumentTypeError(f"expected city/layer=path, got {spec!r}")
+    return (city, name), Path(path)
+
+def main():
+    ap = argparse.ArgumentParser(description="Cut pipeline GeoJSON layers into a z/x/y tile pyramid with an index.")
+    ap.add_argument("--layer", type=parse_layer, action="append",
+                    help="city/layer=path (repeatable; default: the eight layers the viewer loads)")
+    ap.add_argument("--root", type=Path, default=Path(".."), help="Repo root for the default layer paths (default: ..)")
+    ap.add_argument("--out", type=Path, default=Path("../data/tiles"), help="Output directory (default: ../data/tiles)")
+    ap.add_argument("--zmin", type=int, default=9)
+    ap.add_argument("--zmax", type=int, default=14)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = ap.parse_args()
+
+    layers = dict(args.layer) if args.layer else {k: args.root / v for k, v in DEFAULT_LAYERS.items()}
+    build_tiles(layers, args.out, args.zmin, args.zmax, args.workers)
+
+if __name__ == "__main__":
+    main()
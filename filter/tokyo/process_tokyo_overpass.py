@@ -1,10 +1,20 @@
 # save as process_tokyo_overpass.py
-import argparse, gzip, json, time
+import argparse, gzip, json, sys, time
+from array import array
+from itertools import chain
 from pathlib import Path
-from typing import Dict, Any, List, Set, Tuple, Optional
+from typing import Dict, Any, Iterable, List, Set, Tuple, Optional
 
+import numpy as np
+import pandas as pd
+import shapely
 import geopandas as gpd
-from shapely.geometry import Point, LineString
+from shapely.geometry import Point
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from overpass_json import iter_overpass_elements
+from geojson_writer import write_geojson
+from osm_store import OsmStore
 
 def load_overpass_json(path: Path) -> Dict[str, Any]:
     raw = path.read_bytes()
@@ -12,49 +22,124 @@ def load_overpass_json(path: Path) -> Dict[str, Any]:
         raw = gzip.decompress(raw)
     return json.loads(raw.decode("utf-8", errors="replace"))
 
-def write_geojson_safe(gdf: gpd.GeoDataFrame, path: Path):
-    if gdf.empty:
-        path.write_text('{"type":"FeatureCollection","features":[]}', encoding="utf-8")
-    else:
-        gdf.to_file(path, driver="GeoJSON")
+def write_geojson_safe(layers, path: Path, precision: Optional[int] = None):
+    """One frame or several (as one collection); empty frames give an empty FeatureCollection."""
+    write_geojson(layers, path, precision=precision)
+
+class NodeIndex:
+    """
+    Compact node coordinate index: sorted int64 ids next to a float64 (lon, lat)
+    array. About 24 bytes per node instead of a dict entry plus a tuple, and
+    whole batches of ids resolve with one searchsorted.
+    """
+
+    def __init__(self, ids: np.ndarray, lonlat: np.ndarray):
+        self.ids, self.lonlat = ids, lonlat
+
+    @classmethod
+    def from_arrays(cls, ids, lons, lats) -> "NodeIndex":
+        ids = np.asarray(ids, dtype=np.int64)
+        lonlat = np.column_stack([np.asarray(lons, dtype=np.float64), np.asarray(lats, dtype=np.float64)])
+        order = np.argsort(ids, kind="stable")
+        ids, lonlat = ids[order], lonlat[order]
+        # Duplicate ids: the last one seen wins, as with dict assignment.
+        last = np.ones(len(ids), dtype=bool)
+        last[:-1] = ids[:-1] != ids[1:]
+        return cls(ids[last], lonlat[last])
 
-def build_node_index(elements: List[dict]) -> Dict[int, Tuple[float, float]]:
-    idx: Dict[int, Tuple[float, float]] = {}
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def lookup(self, node_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (coords, found) for an int64 id array; coords of missing ids are NaN."""
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        pos = np.searchsorted(self.ids, node_ids)
+        pos[pos == len(self.ids)] = 0
+        found = (self.ids[pos] == node_ids) if len(self.ids) else np.zeros(len(node_ids), dtype=bool)
+        coords = np.full((len(node_ids), 2), np.nan)
+        coords[found] = self.lonlat[pos[found]]
+        return coords, found
+
+    def get(self, nid) -> Optional[Tuple[float, float]]:
+        if not isinstance(nid, int):
+            return None
+        coords, found = self.lookup(np.array([nid]))
+        return (float(coords[0, 0]), float(coords[0, 1])) if found[0] else None
+
+def build_node_index(elements: Iterable[dict]) -> NodeIndex:
+    ids, lons, lats = array("q"), array("d"), array("d")
     for el in elements:
         if el.get("type") == "node" and "lat" in el and "lon" in el:
             nid = el.get("id")
             if isinstance(nid, int):
-                idx[nid] = (float(el["lon"]), float(el["lat"]))
-    return idx
+                ids.append(nid); lons.append(float(el["lon"])); lats.append(float(el["lat"]))
+    return NodeIndex.from_arrays(ids, lons, lats)
+
+def add_relation_member_way_ids(el: dict, way_ids: Set[int]) -> bool:
+    """Add the member way ids of one subway/light_rail relation; False if el is not one."""
+    if el.get("type") != "relation":
+        return False
+    tags = el.get("tags") or {}
+    if tags.get("route") not in ("subway", "light_rail"):
+        return False
+    for m in el.get("members", []):
+        if m.get("type") == "way" and isinstance(m.get("ref"), int):
+            way_ids.add(m["ref"])
+    return True
 
 def collect_relation_member_way_ids(elements: List[dict]) -> Set[int]:
     way_ids: Set[int] = set()
-    rels = 0
-    for el in elements:
-        if el.get("type") != "relation":
-            continue
-        tags = el.get("tags") or {}
-        if tags.get("route") not in ("subway", "light_rail"):
-            continue
-        rels += 1
-        for m in el.get("members", []):
-            if m.get("type") == "way" and isinstance(m.get("ref"), int):
-                way_ids.add(m["ref"])
+    rels = sum(add_relation_member_way_ids(el, way_ids) for el in elements)
     print(f"🔗 route relations: {rels:,} | member way ids: {len(way_ids):,}")
     return way_ids
 
-def way_coords(way: dict, node_ix: Dict[int, Tuple[float, float]]) -> Optional[List[Tuple[float, float]]]:
+def way_coords(way: dict, node_ix: NodeIndex) -> Optional[List[Tuple[float, float]]]:
     geom = way.get("geometry")
     if isinstance(geom, list) and len(geom) >= 2 and "lon" in geom[0]:
         return [(float(pt["lon"]), float(pt["lat"])) for pt in geom if "lon" in pt and "lat" in pt]
     node_ids = way.get("nodes")
     if isinstance(node_ids, list) and len(node_ids) >= 2:
-        coords = [node_ix.get(nid) for nid in node_ids]
-        coords = [c for c in coords if c is not None]
-        if len(coords) >= 2:
-            return coords
+        xy, found = node_ix.lookup(np.asarray(node_ids, dtype=np.int64))
+        if found.sum() >= 2:
+            return [tuple(c) for c in xy[found].tolist()]
     return None
 
+def ways_to_linestrings(ways: List[dict], node_ix: NodeIndex) -> np.ndarray:
+    """
+    Resolve every way in one vectorized pass. Same rules as way_coords: inline
+    `geometry` wins, missing nodes are dropped, and a way needs >= 2 resolved
+    coordinates. Returns an object array aligned with `ways` (None where dropped).
+    """
+    out = np.full(len(ways), None, dtype=object)
+    node_ways, geom_ways = [], []
+    for i, w in enumerate(ways):
+        geom = w.get("geometry")
+        if isinstance(geom, list) and len(geom) >= 2 and "lon" in geom[0]:
+            geom_ways.append(i)
+        elif isinstance(w.get("nodes"), list) and len(w["nodes"]) >= 2:
+            node_ways.append(i)
+
+    counts = np.fromiter((len(ways[i]["nodes"]) for i in node_ways), dtype=np.int64, count=len(node_ways))
+    flat = np.fromiter(chain.from_iterable(ways[i]["nodes"] for i in node_ways), dtype=np.int64, count=int(counts.sum()))
+    xy, found = node_ix.lookup(flat)
+    owner = np.repeat(np.asarray(node_ways, dtype=np.int64), counts)[found]
+    xy = xy[found]
+
+    if geom_ways:
+        g_xy = [np.asarray([(float(pt["lon"]), float(pt["lat"])) for pt in ways[i]["geometry"] if "lon" in pt and "lat" in pt],
+                           dtype=np.float64).reshape(-1, 2) for i in geom_ways]
+        g_owner = np.repeat(np.asarray(geom_ways, dtype=np.int64), [len(c) for c in g_xy])
+        owner = np.concatenate([owner, g_owner])
+        xy = np.concatenate([xy, *g_xy])
+        order = np.argsort(owner, kind="stable")
+        owner, xy = owner[order], xy[order]
+
+    keep = np.bincount(owner, minlength=len(ways)) >= 2
+    sel = keep[owner]
+    if sel.any():
+        shapely.linestrings(xy[sel], indices=owner[sel], out=out)
+    return out
+
 def tag_line_is_route(tags: dict, include_tram: bool) -> bool:
     rwy = tags.get("railway")
     route = tags.get("route")
@@ -72,6 +157,155 @@ def node_is_station(tags: dict) -> bool:
     st = tags.get("station")
     return (st == "subway") or (tags.get("railway") == "station" and (st == "subway" or tags.get("subway") == "yes"))
 
+WAY_TAGS = ("railway", "subway", "route", "tunnel", "name")
+STATION_TAGS = ("name", "railway", "station", "subway")
+ROUTE_TAGS = ("name", "ref", "colour", "network", "route")
+
+# ---------- relation merging ----------
+
+def is_route_relation(el: dict) -> bool:
+    return el.get("type") == "relation" and (el.get("tags") or {}).get("route") in ("subway", "light_rail")
+
+def slim_route_relation(el: dict) -> dict:
+    """Relation id, ROUTE_TAGS and its track members (platform/stop members dropped), in member order."""
+    out = _slim(el, ("id",), ROUTE_TAGS)
+    out["members"] = [{"ref": m["ref"], "role": m.get("role", "")} for m in el.get("members", [])
+                      if m.get("type") == "way" and isinstance(m.get("ref"), int)
+                      and not (m.get("role") or "").startswith(("platform", "stop"))]
+    return out
+
+def chain_ways(parts: List[np.ndarray]) -> List[np.ndarray]:
+    """
+    Join way coordinate arrays in the given (member) order into as few connected
+    lines as possible. Each way is flipped if needed so it continues from the end
+    of the current line; the first way of a line may flip the line itself. A way
+    that touches neither end starts a new line (a gap in the relation).
+    """
+    lines: List[List[np.ndarray]] = []
+    for xy in parts:
+        if lines:
+            cur = lines[-1]
+            head, tail = cur[0][0], cur[-1][-1]
+            if np.array_equal(tail, xy[0]):
+                cur.append(xy[1:]); continue
+            if np.array_equal(tail, xy[-1]):
+                cur.append(xy[::-1][1:]); continue
+            if len(cur) == 1 and np.array_equal(head, xy[0]):
+                cur[0] = cur[0][::-1]; cur.append(xy[1:]); continue
+            if len(cur) == 1 and np.array_equal(head, xy[-1]):
+                cur[0] = cur[0][::-1]; cur.append(xy[::-1][1:]); continue
+        lines.append([xy])
+    return [np.concatenate(c) for c in lines]
+
+def merge_route_relations(relations: List[dict], way_geoms: Dict[int, Any]) -> gpd.GeoDataFrame:
+    """
+    One MultiLineString per route relation: member ways chained in member order,
+    carrying the relation's ROUTE_TAGS. `gaps` counts breaks between chained parts,
+    `missing_ways` counts members without resolved geometry.
+    """
+    rows, geoms = [], []
+    for rel in relations:
+        refs = [m["ref"] for m in rel.get("members", [])]
+        parts = [shapely.get_coordinates(way_geoms[r]) for r in refs if r in way_geoms]
+        lines = chain_ways(parts)
+        tags = rel.get("tags") or {}
+        rows.append({"id": rel.get("id"), **{k: tags.get(k) for k in ROUTE_TAGS},
+                     "n_ways": len(parts), "gaps": max(len(lines) - 1, 0), "missing_ways": len(refs) - len(parts)})
+        geoms.append(shapely.multilinestrings([shapely.linestrings(c) for c in lines]) if lines else None)
+    return gpd.GeoDataFrame(rows, geometry=geoms, crs="EPSG:4326")
+
+def report_relation_merge(routes: gpd.GeoDataFrame, n_member_ways: int, top: int = 10):
+    n = len(routes)
+    gappy = routes[(routes["gaps"] > 0) | (routes["missing_ways"] > 0)] if n else routes
+    print(f"🧵 merged {n_member_ways:,} member ways into {n:,} route features"
+          + (f" (×{n_member_ways / n:.0f} fewer)" if n else ""))
+    if len(gappy):
+        print(f"⚠️  {len(gappy):,} relations with gaps or missing ways:")
+        for _, r in gappy.sort_values(["gaps", "missing_ways"], ascending=False).head(top).iterrows():
+            label = r["name"] or r["ref"] or r["id"]
+            print(f"   {r['id']} {label}: {r['gaps']} gaps, {r['missing_ways']} missing of {r['n_ways'] + r['missing_ways']} ways")
+
+def _slim(el: dict, keys: Tuple[str, ...], tag_keys: Tuple[str, ...]) -> dict:
+    out = {k: el[k] for k in keys if k in el}
+    tags = el.get("tags")
+    if tags:
+        out["tags"] = {k: tags[k] for k in tag_keys if k in tags}
+    return out
+
+def ingest_overpass_stream(path: Path) -> Tuple[NodeIndex, List[dict], Set[int], List[dict], List[dict]]:
+    """
+    Single streaming pass over a saved dump. Nodes go straight into the coordinate
+    index, relations contribute member way ids, and ways / station nodes / route
+    relations are kept as slim dicts holding just the fields the filter stages read.
+    Returns (node_ix, ways, member_ids, station_nodes, route_relations).
+    """
+    ids, lons, lats = array("q"), array("d"), array("d")
+    ways: List[dict] = []
+    member_ids: Set[int] = set()
+    station_nodes: List[dict] = []
+    relations: List[dict] = []
+    n_nodes = rels = 0
+    for el in iter_overpass_elements(path):
+        kind = el.get("type")
+        if kind == "node":
+            n_nodes += 1
+            if "lat" in el and "lon" in el:
+                nid = el.get("id")
+                if isinstance(nid, int):
+                    ids.append(nid); lons.append(float(el["lon"])); lats.append(float(el["lat"]))
+                if node_is_station(el.get("tags") or {}):
+                    station_nodes.append(_slim(el, ("id", "lon", "lat"), STATION_TAGS))
+        elif kind == "way":
+            ways.append(_slim(el, ("id", "nodes", "geometry"), WAY_TAGS))
+        elif kind == "relation":
+            if add_relation_member_way_ids(el, member_ids):
+                rels += 1
+                relations.append(slim_route_relation(el))
+    print(f"🧮 elements — ways: {len(ways):,}, nodes: {n_nodes:,}")
+    print(f"🔗 route relations: {rels:,} | member way ids: {len(member_ids):,}")
+    return NodeIndex.from_arrays(ids, lons, lats), ways, member_ids, station_nodes, relations
+
+def ingest_store(store: OsmStore, bbox: Optional[Tuple[float, float, float, float]] = None
+                 ) -> Tuple[NodeIndex, List[dict], Set[int], List[dict], List[dict]]:
+    """
+    Same result as ingest_overpass_stream, read from a prebuilt OsmStore. With
+    bbox (south, west, north, east) only ways and stations inside it are read,
+    plus every member way of the route relations that reach into it (so merged
+    lines stay whole), and only the nodes those ways use.
+    """
+    member_ids: Set[int] = set()
+    relations = [slim_route_relation(el) for el in store.relations(bbox) if add_relation_member_way_ids(el, member_ids)]
+    if bbox is None:
+        ways = store.ways(tag_keys=WAY_TAGS)
+        node_ix = NodeIndex.from_arrays(*store.node_coords())
+    else:
+        way_ids = set(store.way_ids(bbox)) | member_ids
+        ways = store.ways(sorted(way_ids), tag_keys=WAY_TAGS)
+        node_ix = NodeIndex.from_arrays(*store.node_coords({n for w in ways for n in w["nodes"]}))
+    station_nodes = [_slim(n, ("id", "lon", "lat"), STATION_TAGS)
+                     for n in store.tagged_nodes(bbox, STATION_TAGS) if node_is_station(n["tags"])]
+    print(f"🧮 elements — ways: {len(ways):,}, nodes: {len(node_ix):,}" + (f" (bbox {bbox})" if bbox else ""))
+    print(f"🔗 route relations: {len(relations):,} | member way ids: {len(member_ids):,}")
+    return node_ix, ways, member_ids, station_nodes, relations
+
+# ---------- incremental rebuilds ----------
+
+def load_affected(path: Path) -> Dict[str, Set[int]]:
+    """The ids in a <dump>.affected.json sidecar written by the fetchers' --update (fetch/overpass_diff.py)."""
+    doc = json.loads(Path(path).read_text(encoding="utf-8"))
+    print(f"🩹 {doc.get('since')} → {doc.get('until')}: affected ways {len(doc['way']):,}, "
+          f"relations {len(doc['relation']):,}, nodes {len(doc['node']):,}")
+    return {t: set(doc[t]) for t in ("node", "way", "relation")}
+
+def patch_layer(path: Path, fresh: gpd.GeoDataFrame, stale) -> gpd.GeoDataFrame:
+    """The layer at `path` minus the rows where stale(layer) is True, with `fresh` appended."""
+    prev = gpd.read_file(path)
+    kept = prev[~stale(prev)] if len(prev) else prev
+    print(f"🩹 {path.name}: kept {len(kept):,} of {len(prev):,}, rebuilt {len(fresh):,}")
+    if not len(fresh):
+        return kept
+    return gpd.GeoDataFrame(pd.concat([kept, fresh], ignore_index=True), geometry="geometry", crs="EPSG:4326")
+
 def main():
     ap = argparse.ArgumentParser(description="Process saved Overpass JSON (Tokyo subway/light_rail) into GeoJSON layers.")
     ap.add_argument("input", type=Path, help="Path to saved Overpass JSON (.json or .json.gz)")
@@ -79,99 +313,143 @@ def main():
     ap.add_argument("--prefix", type=str, default="tokyo_subway", help="Output filename prefix (default: tokyo_subway)")
     ap.add_argument("--union-tags", action="store_true", help="Union relation members with tag-matched lines")
     ap.add_argument("--include-tram", action="store_true", help="Allow tram lines when tagged like subway/light_rail")
+    ap.add_argument("--stream", action="store_true", help="Stream elements from disk instead of loading the whole dump (bounded memory)")
+    ap.add_argument("--precision", type=int, help="Decimal places kept in GeoJSON coordinates (default: all)")
+    ap.add_argument("--merge-relations", action="store_true",
+                    help="One MultiLineString per route relation (member order, relation name/ref/colour/network) instead of one line per way")
+    ap.add_argument("--store", nargs="?", const="", metavar="PATH",
+                    help="Read through a SQLite element store (default path: <input>.sqlite), built on first use "
+                         "and again whenever the dump changes; re-filtering then skips JSON parsing")
+    ap.add_argument("--rebuild-store", action="store_true", help="With --store: rebuild it even if it looks current")
+    ap.add_argument("--bbox", type=float, nargs=4, metavar=("S", "W", "N", "E"),
+                    help="With --store: only ways, relations and stations inside this box")
+    ap.add_argument("--affected", type=Path,
+                    help="Sidecar from a fetcher's --update: rebuild only these ways/relations/stations, patch the existing layers in --out, then remove it")
     args = ap.parse_args()
+    if args.bbox and args.store is None:
+        ap.error("--bbox needs --store")
 
     out = args.out; out.mkdir(parents=True, exist_ok=True)
     routes_path   = out / f"{args.prefix}_routes.geojson"
     stations_path = out / f"{args.prefix}_stations.geojson"
     all_path      = out / f"{args.prefix}_all.geojson"
 
-    print(f"📥 Loading {args.input} …")
-    t0 = time.time(); data = load_overpass_json(args.input); print(f"✅ Loaded in {time.time()-t0:.2f}s")
+    if args.store is not None:
+        t0 = time.time()
+        store = OsmStore.ensure(args.input, Path(args.store) if args.store else None, rebuild=args.rebuild_store)
+        print(f"📥 Reading {store.path} …")
+        node_ix, ways, member_ids, station_nodes, relations = ingest_store(store, tuple(args.bbox) if args.bbox else None)
+        store.close()
+        print(f"✅ Read in {time.time()-t0:.2f}s")
+    elif args.stream:
+        print(f"📥 Streaming {args.input} …")
+        t0 = time.time(); node_ix, ways, member_ids, station_nodes, relations = ingest_overpass_stream(args.input)
+        print(f"✅ Streamed in {time.time()-t0:.2f}s")
+    else:
+        print(f"📥 Loading {args.input} …")
+        t0 = time.time(); data = load_overpass_json(args.input); print(f"✅ Loaded in {time.time()-t0:.2f}s")
 
-    els = data.get("elements", [])
-    ways  = [e for e in els if e.get("type") == "way"]
-    nodes = [e for e in els if e.get("type") == "node"]
-    print(f"🧮 elements — ways: {len(ways):,}, nodes: {len(nodes):,}")
+        els = data.get("elements", [])
+        ways  = [e for e in els if e.get("type") == "way"]
+        nodes = [e for e in els if e.get("type") == "node"]
+        print(f"🧮 elements — ways: {len(ways):,}, nodes: {len(nodes):,}")
 
-    node_ix = build_node_index(els)
-    member_ids = collect_relation_member_way_ids(els)
+        node_ix = build_node_index(els)
+        member_ids = collect_relation_member_way_ids(els)
+        station_nodes = [n for n in nodes if node_is_station(n.get("tags") or {})]
+        relations = [slim_route_relation(e) for e in els if is_route_relation(e)]
 
-    # Build route lines (relation members)
-    line_rows, line_geoms = [], []
-    found_members = 0
-
-    for w in ways:
-        wid = w.get("id")
-        if isinstance(wid, int) and wid in member_ids:
-            coords = way_coords(w, node_ix)
-            if coords and len(coords) >= 2:
-                line_geoms.append(LineString(coords))
-                tags = w.get("tags") or {}
-                line_rows.append({
-                    "id": wid,
-                    "railway": tags.get("railway"),
-                    "subway": tags.get("subway"),
-                    "route": tags.get("route"),
-                    "tunnel": tags.get("tunnel"),
-                    "name": tags.get("name"),
-                    "in_route": True,
-                })
-                found_members += 1
-
-    # Optional: union tag-matched lines not in relations
-    extra = 0
+    affected = load_affected(args.affected) if args.affected else None
+    if affected is not None:
+        # Only what the affected features need (merged relations need all their member ways);
+        # membership (member_ids) still comes from every relation.
+        relations = [r for r in relations if r.get("id") in affected["relation"]]
+        needed = set(affected["way"])
+        if args.merge_relations:
+            needed |= {m["ref"] for r in relations for m in r["members"]}
+        ways = [w for w in ways if w.get("id") in needed]
+        station_nodes = [n for n in station_nodes if n.get("id") in affected["node"]]
+
+    # Route lines: relation members first, then (optionally) tag-matched extras,
+    # resolved together in one vectorized pass.
+    member_ways = [w for w in ways if isinstance(w.get("id"), int) and w["id"] in member_ids]
+    extra_ways: List[dict] = []
     if args.union_tags:
-        member_ids_set = member_ids  # already a set
-        for w in ways:
-            wid = w.get("id")
-            if not isinstance(wid, int) or wid in member_ids_set:
-                continue
-            tags = w.get("tags") or {}
-            if tag_line_is_route(tags, include_tram=args.include_tram):
-                coords = way_coords(w, node_ix)
-                if coords and len(coords) >= 2:
-                    line_geoms.append(LineString(coords))
-                    line_rows.append({
-                        "id": wid,
-                        "railway": tags.get("railway"),
-                        "subway": tags.get("subway"),
-                        "route": tags.get("route"),
-                        "tunnel": tags.get("tunnel"),
-                        "name": tags.get("name"),
-                        "in_route": False,
-                    })
-                    extra += 1
-        if extra:
-            print(f"➕ added {extra:,} tag-matched lines (union-tags)")
+        extra_ways = [w for w in ways
+                      if isinstance(w.get("id"), int) and w["id"] not in member_ids
+                      and tag_line_is_route(w.get("tags") or {}, include_tram=args.include_tram)]
+    candidates = member_ways + extra_ways
+    geoms = ways_to_linestrings(candidates, node_ix)
+
+    line_rows, line_geoms = [], []
+    found_members = extra = 0
+    for i, (w, geom) in enumerate(zip(candidates, geoms)):
+        if geom is None:
+            continue
+        in_route = i < len(member_ways)
+        tags = w.get("tags") or {}
+        line_geoms.append(geom)
+        line_rows.append({
+            "id": w["id"],
+            "railway": tags.get("railway"),
+            "subway": tags.get("subway"),
+            "route": tags.get("route"),
+            "tunnel": tags.get("tunnel"),
+            "name": tags.get("name"),
+            "in_route": in_route,
+        })
+        if in_route:
+            found_members += 1
+        else:
+            extra += 1
+    if extra:
+        print(f"➕ added {extra:,} tag-matched lines (union-tags)")
 
     routes_gdf = gpd.GeoDataFrame(line_rows, geometry=line_geoms, crs="EPSG:4326")
+    if args.merge_relations:
+        way_geoms = {w["id"]: g for w, g in zip(member_ways, geoms) if g is not None}
+        merged = merge_route_relations(relations, way_geoms)
+        report_relation_merge(merged, len(way_geoms))
+        merged = merged[merged.geometry.notna()]
+        # Tag-matched extras belong to no relation; they stay as single-way features.
+        extras = routes_gdf[~routes_gdf["in_route"]] if len(routes_gdf) else routes_gdf
+        routes_gdf = gpd.GeoDataFrame(pd.concat([merged, extras], ignore_index=True), geometry="geometry", crs="EPSG:4326") \
+            if len(extras) else merged
 
     # Build station points
     st_rows, st_geoms = [], []
-    for n in nodes:
+    for n in station_nodes:
         tags = n.get("tags") or {}
-        if node_is_station(tags):
-            st_geoms.append(Point(float(n["lon"]), float(n["lat"])))
-            st_rows.append({
-                "id": n.get("id"),
-                "name": tags.get("name"),
-                "railway": tags.get("railway"),
-                "station": tags.get("station"),
-                "subway": tags.get("subway"),
-            })
+        st_geoms.append(Point(float(n["lon"]), float(n["lat"])))
+        st_rows.append({
+            "id": n.get("id"),
+            "name": tags.get("name"),
+            "railway": tags.get("railway"),
+            "station": tags.get("station"),
+            "subway": tags.get("subway"),
+        })
     stations_gdf = gpd.GeoDataFrame(st_rows, geometry=st_geoms, crs="EPSG:4326")
 
+    if affected is not None:
+        def stale_routes(prev):
+            ids = prev["id"]
+            if "n_ways" not in prev.columns:
+                return ids.isin(affected["way"])
+            merged_rows = prev["n_ways"].notna()
+            return (merged_rows & ids.isin(affected["relation"])) | (~merged_rows & ids.isin(affected["way"]))
+        routes_gdf = patch_layer(routes_path, routes_gdf, stale_routes)
+        stations_gdf = patch_layer(stations_path, stations_gdf, lambda prev: prev["id"].isin(affected["node"]))
+
     print(f"✅ routes kept: {len(routes_gdf):,} (members found with coords: {found_members:,}) | stations: {len(stations_gdf):,}")
 
     # Writes (same filenames)
     print(f"💿 Writing {routes_path.name} + {stations_path.name} + {all_path.name}")
-    write_geojson_safe(routes_gdf, routes_path)
-    write_geojson_safe(stations_gdf, stations_path)
-    # union for *_all
-    all_gdf = gpd.GeoDataFrame(pd.concat([routes_gdf, stations_gdf], ignore_index=True), geometry="geometry", crs="EPSG:4326") if len(routes_gdf) or len(stations_gdf) else gpd.GeoDataFrame(geometry=[], crs="EPSG:4326")
-    write_geojson_safe(all_gdf, all_path)
+    write_geojson_safe(routes_gdf, routes_path, args.precision)
+    write_geojson_safe(stations_gdf, stations_path, args.precision)
+    # union for *_all, streamed from both frames without concatenating them
+    write_geojson_safe([routes_gdf, stations_gdf], all_path, args.precision)
+    if affected is not None:
+        args.affected.unlink()   # consumed: the layers now include these changes
 
 if __name__ == "__main__":
-    import pandas as pd  # used only for concat
     main()
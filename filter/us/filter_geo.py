@@ -1,33 +1,97 @@
+import argparse, sys, time
+from pathlib import Path
+from typing import Optional, Sequence
+
 import geopandas as gpd
+import pyogrio
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from geojson_writer import write_geojson
+
+DEFAULT_STATES = ['New Hampshire', 'Vermont', 'Massachusetts']
+
+def _sql_list(values) -> str:
+    return ", ".join("'" + str(v).replace("'", "''") + "'" for v in values)
 
-# Define target states
-selected_states = ['New Hampshire', 'Vermont', 'Massachusetts']
+def arrow_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
 
-# Load full U.S. states GeoJSON (or shapefile)
-states = gpd.read_file('../data/gz_2010_us_040_00_20m.json')
+def read_states(states_path: Path, names: Sequence[str]) -> gpd.GeoDataFrame:
+    """Census state boundaries for the given NAMEs; the NAME filter runs inside the reader."""
+    return gpd.read_file(states_path, engine="pyogrio", where=f"NAME IN ({_sql_list(names)})",
+                         use_arrow=arrow_available())
 
-# Filter states by NAME
-states_filtered = states[states['NAME'].isin(selected_states)]
+def read_counties(counties_path: Path, statefps: Sequence[str], bbox: Optional[Sequence[float]] = None,
+                  bbox_crs=None, columns: Optional[Sequence[str]] = None) -> gpd.GeoDataFrame:
+    """
+    TIGER counties of the given STATEFP codes, filtered while reading: an attribute
+    `where` on STATEFP plus (optionally) the bbox of the selected states, so GDAL
+    skips features outside the region before decoding them (and uses the .qix
+    spatial index when the shapefile has one). `columns` limits the attributes
+    read; Arrow-based I/O is used when pyarrow is installed.
+    """
+    if bbox is not None and bbox_crs is not None:
+        file_crs = pyogrio.read_info(counties_path)["crs"]
+        if file_crs:
+            bbox = tuple(gpd.GeoSeries.from_xy([bbox[0], bbox[2]], [bbox[1], bbox[3]], crs=bbox_crs)
+                         .to_crs(file_crs).total_bounds)
+    if columns:
+        # The where clause can only see columns that are read.
+        columns = list(dict.fromkeys(["STATEFP", *columns]))
+    return gpd.read_file(counties_path, engine="pyogrio", where=f"STATEFP IN ({_sql_list(statefps)})",
+                         bbox=tuple(bbox) if bbox is not None else None,
+                         columns=columns or None, use_arrow=arrow_available())
 
-# Save filtered states as its own GeoJSON layer
-states_filtered.to_file('states_layer.geojson', driver='GeoJSON')
-print(f"Saved {len(states_filtered)} states to 'states_layer.geojson'")
+def filter_geo(states_path: Path, counties_path: Path, selected_states: Sequence[str] = DEFAULT_STATES,
+               states_out: Path = Path('states_layer.geojson'), counties_out: Path = Path('counties_layer.geojson'),
+               columns: Optional[Sequence[str]] = None):
+    if not selected_states:
+        raise ValueError("no states selected")
+    # Load the selected states from the full U.S. states GeoJSON (or shapefile)
+    states_filtered = read_states(states_path, selected_states)
+    # Every name must resolve: an unknown one would silently drop its counties,
+    # and none at all would build `STATEFP IN ()` over a NaN bbox.
+    missing = set(selected_states) - set(states_filtered['NAME'])
+    if missing:
+        raise ValueError(f"states not found in {states_path}: {', '.join(sorted(missing))}")
 
-# Loaded County data from Tiger: 
-# https://catalog.data.gov/dataset/tiger-line-shapefile-2021-nation-u-s-counties-and-equivalent-entities
+    # Save filtered states as its own GeoJSON layer
+    write_geojson(states_filtered, states_out)
+    print(f"Saved {len(states_filtered)} states to '{states_out}'")
 
-# Load counties shapefile — just give it the .shp file (GeoPandas reads the rest)
-# This is a "Shapefile" which is really a set of files.  They are assumed
-# to be in this directory.
-# Note: More recent?  Any data problem with state data?  precision?
-counties = gpd.read_file('tl_2021_us_county.shp')
+    # Loaded County data from Tiger:
+    # https://catalog.data.gov/dataset/tiger-line-shapefile-2021-nation-u-s-counties-and-equivalent-entities
+    # A "Shapefile" is really a set of files (.shp/.shx/.dbf/.prj) next to each other.
+    # Filter counties by STATEFP (FIPS codes) and the states' bbox while reading.
+    target_fips = states_filtered['STATE'].unique()
+    t0 = time.perf_counter()
+    counties_filtered = read_counties(counties_path, target_fips, states_filtered.total_bounds, states_filtered.crs,
+                                      columns)
+    print(f"📥 read {len(counties_filtered)} counties in {time.perf_counter() - t0:.2f}s")
+    print(counties_filtered.columns)
 
-print(counties.columns)
+    # Save filtered counties GeoJSON layer
+    write_geojson(counties_filtered, counties_out)
+    print(f"Saved {len(counties_filtered)} counties to '{counties_out}'")
+    return states_filtered, counties_filtered
 
-# Filter counties by STATEFP (FIPS codes)
-target_fips = states_filtered['STATE'].unique()
-counties_filtered = counties[counties['STATEFP'].isin(target_fips)]
+def main():
+    ap = argparse.ArgumentParser(description="Extract states and their TIGER counties as GeoJSON layers.")
+    ap.add_argument("--states", nargs="+", default=DEFAULT_STATES, help="State NAMEs (default: New Hampshire Vermont Massachusetts)")
+    ap.add_argument("--states-file", type=Path, default=Path('../data/gz_2010_us_040_00_20m.json'))
+    ap.add_argument("--counties-file", type=Path, default=Path('tl_2021_us_county.shp'))
+    ap.add_argument("--states-out", type=Path, default=Path('states_layer.geojson'))
+    ap.add_argument("--counties-out", type=Path, default=Path('counties_layer.geojson'))
+    ap.add_argument("--columns", nargs="+", help="County attribute columns to keep (default: all)")
+    args = ap.parse_args()
+    try:
+        filter_geo(args.states_file, args.counties_file, args.states, args.states_out, args.counties_out, args.columns)
+    except ValueError as e:
+        ap.error(str(e))
 
-# Save filtered counties GeoJSON layer
-counties_filtered.to_file('counties_layer.geojson', driver='GeoJSON')
-print(f"Saved {len(counties_filtered)} counties to 'counties_layer.geojson'")
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,100 @@
+import argparse, json, time
+from pathlib import Path
+from typing import Iterator, Optional, Sequence
+
 import pandas as pd
 #Year,StateAbbr,StateDesc,LocationName,DataSource,Category,Measure,Data_Value_Unit,Data_Value_Type,Data_Value,Data_Value_Footnote_Symbol,Data_Value_Footnote,Low_Confidence_Limit,High_Confidence_Limit,TotalPopulation,TotalPop18plus,Locat       ionID,CategoryID,MeasureId,DataValueTypeID,Short_Question_Text,Geolocation
 
-# === INPUT ===
-input_csv = 'PLACES_County_Data_2024.csv'  # replace with your downloaded file
-output_csv = 'obesity_by_county.csv'
+# Only these columns are parsed; everything else in the CSV is skipped by the reader.
+COLUMNS = {
+    'LocationID': 'string',
+    'Measure': 'category',
+    'MeasureId': 'category',
+    'DataValueTypeID': 'category',
+    'Data_Value': 'float64',
+}
+
+def read_places(input_csv: Path, chunksize: int = 500_000) -> Iterator[pd.DataFrame]:
+    """The PLACES CSV in typed, column-pruned chunks, with LocationID zero-padded into GEOID."""
+    for chunk in pd.read_csv(input_csv, usecols=list(COLUMNS), dtype=COLUMNS, chunksize=chunksize):
+        chunk['GEOID'] = chunk.pop('LocationID').str.strip().str.zfill(5)
+        yield chunk
+
+def filter_measure(input_csv: Path, output_csv: Path, target_measure: str, chunksize: int = 500_000) -> pd.DataFrame:
+    """One measure (by its Measure text) as GEOID,value rows."""
+    measures, parts = set(), []
+    for chunk in read_places(input_csv, chunksize):
+        measures.update(chunk['Measure'].cat.categories)
+        parts.append(chunk.loc[chunk['Measure'] == target_measure, ['GEOID', 'Data_Value']])
+    print("Available measures:")
+    print(sorted(measures))
+
+    filtered = pd.concat(parts, ignore_index=True).rename(columns={'Data_Value': 'value'})
+    filtered.to_csv(output_csv, index=False)
+    print(f"Saved {target_measure!r} data to {output_csv}")
+    print(f"Sample rows:\n{filtered.head()}")
+    return filtered
 
-# === Step 1: Load data ===
-df = pd.read_csv(input_csv)
+def pivot_measures(input_csv: Path, output_path: Path, measure_ids: Optional[Sequence[str]] = None,
+                   value_type: str = 'CrdPrv', chunksize: int = 500_000) -> pd.DataFrame:
+    """
+    Every measure (or just measure_ids) of one DataValueTypeID, in a single pass over
+    the CSV, as a wide GEOID × MeasureId table. Parquet when the output ends in
+    .parquet, CSV otherwise; MeasureId → Measure text goes to <output>.measures.json.
+    """
+    parts, names = [], {}
+    for chunk in read_places(input_csv, chunksize):
+        keep = chunk['DataValueTypeID'] == value_type
+        if measure_ids:
+            keep &= chunk['MeasureId'].isin(measure_ids)
+        chunk = chunk[keep]
+        names.update(chunk[['MeasureId', 'Measure']].drop_duplicates().astype(str).itertuples(index=False))
+        parts.append(chunk[['GEOID', 'MeasureId', 'Data_Value']])
 
-# Check available measures
-print("Available measures:")
-print(df['Measure'].unique())
+    long = pd.concat(parts, ignore_index=True)
+    long['MeasureId'] = long['MeasureId'].astype(str)
+    wide = long.pivot_table(index='GEOID', columns='MeasureId', values='Data_Value', aggfunc='first', sort=True)
+    wide.columns.name = None
+    wide = wide.reset_index()
+    missing = sorted(set(measure_ids or ()) - set(wide.columns))
+    if missing:
+        print(f"⚠️  measures not found for {value_type}: {', '.join(missing)}")
 
-# === Step 2: Filter for obesity measure ===
-target_measure = 'Obesity among adults'
-#target_measure = 'Binge drinking among adults'
-filtered = df[df['Measure'] == target_measure]
+    output_path = Path(output_path)
+    if output_path.suffix == '.parquet':
+        wide.to_parquet(output_path, index=False)
+    else:
+        wide.to_csv(output_path, index=False)
+    Path(f"{output_path}.measures.json").write_text(json.dumps(dict(sorted(names.items())), indent=1), encoding='utf-8')
+    print(f"Saved {len(wide):,} counties × {wide.shape[1] - 1} {value_type} measures to {output_path}")
+    return wide
 
-# === Step 3: Keep only needed columns ===
-# CountyFIPS → GEOID, Data_Value → value
-filtered = filtered[['LocationID', 'Data_Value']].rename(
-    columns={'LocationID': 'GEOID', 'Data_Value': 'value'}
-)
+def load_measure(wide_path: Path, measure_id: str) -> pd.DataFrame:
+    """GEOID,value for one measure from the wide table; Parquet reads just those two columns."""
+    wide_path = Path(wide_path)
+    if wide_path.suffix == '.parquet':
+        df = pd.read_parquet(wide_path, columns=['GEOID', measure_id])
+    else:
+        df = pd.read_csv(wide_path, usecols=['GEOID', measure_id], dtype={'GEOID': str})
+    return df.rename(columns={measure_id: 'value'})
 
-# Ensure GEOID is zero-padded (should be 5-digit strings)
-filtered['GEOID'] = filtered['GEOID'].apply(lambda x: f"{int(x):05d}")
+def main():
+    ap = argparse.ArgumentParser(description="CDC PLACES county data → one measure (GEOID,value) or a wide GEOID × measure table.")
+    ap.add_argument("--input", type=Path, default=Path('PLACES_County_Data_2024.csv'))
+    ap.add_argument("--output", type=Path, default=Path('obesity_by_county.csv'))
+    ap.add_argument("--measure", default='Obesity among adults', help="Measure text to keep (e.g. 'Binge drinking among adults')")
+    ap.add_argument("--wide", type=Path, help="Instead: write every measure as GEOID × MeasureId to this .parquet (or .csv)")
+    ap.add_argument("--measure-ids", nargs="+", help="With --wide: only these MeasureIds (e.g. OBESITY BINGE)")
+    ap.add_argument("--value-type", default='CrdPrv', help="With --wide: DataValueTypeID to keep (default: CrdPrv)")
+    ap.add_argument("--chunksize", type=int, default=500_000)
+    args = ap.parse_args()
 
-# === Step 4: Save to new CSV ===
-filtered.to_csv(output_csv, index=False)
+    t0 = time.perf_counter()
+    if args.wide:
+        pivot_measures(args.input, args.wide, args.measure_ids, args.value_type, args.chunksize)
+    else:
+        filter_measure(args.input, args.output, args.measure, args.chunksize)
+    print(f"⏱️  {time.perf_counter()-t0:.2f}s")
 
-print(f"Saved filtered obesity data to {output_csv}")
-print(f"Sample rows:\n{filtered.head()}")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+# save as topology.py
+"""
+Shared-topology states + counties: seamless at every simplification tolerance.
+
+The 20m Census states and the TIGER counties disagree along state lines, so
+counties zig-zag across them. This stage
+
+  1. conforms counties to their state: each county is clipped to its state
+     polygon and slivers of the state that no county covers go to the county
+     sharing the longest border with them (all overlay on a --grid metre grid);
+  2. snaps every polygon onto its neighbours' vertices so a shared border has
+     the same vertices on both sides;
+  3. cuts all rings into arcs at junctions (a vertex whose neighbours differ
+     between the rings passing through it) and stores each arc once, the way
+     TopoJSON does;
+  4. simplifies every arc once per tolerance (Douglas-Peucker, metres), so two
+     neighbours always share the very same simplified border. Arcs of a
+     polygon that would come out self-intersecting are re-simplified with half
+     the tolerance until it is valid.
+
+For each tolerance it writes <prefix>.tol<i>.topojson (objects "states" and
+"counties", quantized arcs via lod.ArcEncoder) plus <prefix>_states.tol<i>.geojson
+and <prefix>_counties.tol<i>.geojson rebuilt from the same arcs, and reports
+vertex counts and sizes against independent per-polygon simplification.
+Work happens in --crs (default EPSG:5070, CONUS Albers) so tolerances are metres.
+"""
+import argparse, json, sys
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import shapely
+import geopandas as gpd
+from pyproj import Transformer
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from geojson_writer import write_geojson
+from lod import ArcEncoder, human, json_properties
+
+DEFAULT_TOLERANCES = (0.0, 250.0, 1000.0, 4000.0)
+
+# ---------- 1. conform counties to states ----------
+
+def polygonal(geoms):
+    """Only the polygon parts (overlay on a grid can leave stray lines and points in a collection)."""
+    def keep(g):
+        parts = [p for p in shapely.get_parts(g) if shapely.get_type_id(p) == 3 and not p.is_empty]
+        return parts[0] if len(parts) == 1 else shapely.MultiPolygon(parts)
+    if isinstance(geoms, np.ndarray):
+        return np.array([g if shapely.get_type_id(g) in (3, 6) else keep(g) for g in geoms], dtype=object)
+    return geoms if shapely.get_type_id(geoms) in (3, 6) else keep(geoms)
+
+def conform_counties(states: gpd.GeoDataFrame, counties: gpd.GeoDataFrame, grid: float,
+                     state_key: str = "STATE", county_key: str = "STATEFP") -> gpd.GeoDataFrame:
+    """Counties clipped to their state, with the state's uncovered slivers absorbed by the best neighbour."""
+    counties = counties[counties[county_key].isin(states[state_key])].reset_index(drop=True)
+    geoms = np.asarray(counties.geometry.values, dtype=object).copy()
+    n_slivers = 0
+    for state_id, state_geom in zip(states[state_key], states.geometry.values):
+        idx = np.flatnonzero(counties[county_key].to_numpy() == state_id)
+        if not len(idx):
+            continue
+        clipped = polygonal(shapely.intersection(geoms[idx], state_geom, grid_size=grid))
+        rest = shapely.difference(state_geom, shapely.union_all(clipped, grid_size=grid), grid_size=grid)
+        absorb: Dict[int, list] = {}
+        for sliver in shapely.get_parts(rest):
+            if shapely.area(sliver) <= 0:
+                continue
+            shared = shapely.length(shapely.intersection(shapely.boundary(clipped), shapely.boundary(sliver), grid_size=grid))
+            k = int(np.argmax(shared))
+            if shared[k] > 0:
+                absorb.setdefault(k, []).append(sliver)
+        for k, slivers in absorb.items():
+            clipped[k] = polygonal(shapely.union_all([clipped[k], *slivers], grid_size=grid))
+            n_slivers += len(slivers)
+        geoms[idx] = clipped
+    out = counties.copy()
+    out["geometry"] = polygonal(shapely.make_valid(geoms))
+    print(f"✂️  {len(out):,} counties clipped to {len(states):,} states, {n_slivers:,} slivers absorbed")
+    return out
+
+# ---------- 2. align vertices between neighbours ----------
+
+def align_vertices(geoms: np.ndarray, grid: float) -> np.ndarray:
+    """Snap each polygon onto the vertices of the polygons it touches, so shared borders get identical vertices."""
+    geoms = shapely.set_precision(geoms, grid)
+    tree = shapely.STRtree(geoms)
+    a, b = tree.query(geoms, predicate="dwithin", distance=grid)
+    out = geoms.copy()
+    order = np.argsort(a, kind="stable")
+    a, b = a[order], b[order]
+    starts = np.searchsorted(a, np.arange(len(geoms) + 1))
+    for i in range(len(geoms)):
+        nb = b[starts[i]:starts[i + 1]]
+        nb = nb[nb != i]
+        if len(nb):
+            ref = shapely.multipoints(shapely.get_coordinates(geoms[nb]))
+            out[i] = shapely.snap(geoms[i], ref, grid)
+    return shapely.set_precision(out, grid)
+
+# ---------- 3. arcs ----------
+
+def polygon_rings(geom) -> List[List[np.ndarray]]:
+    """[[exterior, *holes] per polygon], exteriors clockwise and holes counter-clockwise (d3's convention)."""
+    out = []
+    for poly in shapely.get_parts(geom):
+        if shapely.get_type_id(poly) != 3 or poly.is_empty:
+            continue
+        rings = []
+        for k, ring in enumerate([poly.exterior, *poly.interiors]):
+            xy = np.asarray(ring.coords)[:, :2]
+            if shapely.is_ccw(ring) == (k == 0):
+                xy = xy[::-1]
+            rings.append(xy)
+        out.append(rings)
+    return out
+
+class Topology:
+    """
+    Rings cut at junctions into arcs, each distinct arc stored once. A ring is a
+    list of arc references: i for arc i, ~i for arc i reversed (TopoJSON style).
+    """
+
+    def __init__(self, grid: float):
+        self.grid = grid
+        self.arcs: List[np.ndarray] = []
+        self._index: Dict[bytes, int] = {}
+
+    def _keys(self, xy: np.ndarray) -> np.ndarray:
+        q = np.round(xy / self.grid).astype(np.int64)
+        return q[:, 0] * (1 << 32) + q[:, 1]
+
+    def junctions(self, rings: List[np.ndarray]) -> np.ndarray:
+        """Vertex keys where the rings passing through disagree about their neighbours."""
+        keys, lo, hi = [], [], []
+        for xy in rings:
+            k = self._keys(xy[:-1])
+            prev, nxt = np.roll(k, 1), np.roll(k, -1)
+            keys.append(k); lo.append(np.minimum(prev, nxt)); hi.append(np.maximum(prev, nxt))
+        if not keys:
+            return np.zeros(0, dtype=np.int64)
+        rows = np.unique(np.column_stack([np.concatenate(keys), np.concatenate(lo), np.concatenate(hi)]), axis=0)
+        vk, counts = np.unique(rows[:, 0], return_counts=True)
+        # A vertex visited by a single ring twice (touching itself) also counts.
+        return vk[counts > 1]
+
+    def add_ring(self, xy: np.ndarray, junctions: np.ndarray) -> List[int]:
+        keys = self._keys(xy[:-1])
+        cut = np.flatnonzero(np.isin(keys, junctions))
+        if not len(cut):
+            # No junction: a free-standing ring, rotated to a canonical start so both sides find it.
+            s = int(np.argmin(keys))
+            ring = np.vstack([xy[s:-1], xy[:s], xy[s:s + 1]])
+            return [self._arc(ring)]
+        ring = np.vstack([xy[cut[0]:-1], xy[:cut[0] + 1]])
+        cut = np.append(cut - cut[0], len(ring) - 1)
+        return [self._arc(ring[a:b + 1]) for a, b in zip(cut[:-1], cut[1:])]
+
+    def _arc(self, xy: np.ndarray) -> int:
+        keys = self._keys(xy)
+        fwd, rev = keys.tobytes(), keys[::-1].tobytes()
+        if fwd in self._index:
+            return self._index[fwd]
+        if rev in self._index:
+            return ~self._index[rev]
+        self.arcs.append(xy)
+        self._index[fwd] = len(self.arcs) - 1
+        return len(self.arcs) - 1
+
+def build_topology(layers: Dict[str, np.ndarray], grid: float) -> Tuple[Topology, Dict[str, list]]:
+    """Arc references per geometry of every layer: {layer: [[[ring arc refs] per ring] per polygon] per feature]}."""
+    rings = {name: [polygon_rings(g) for g in geoms] for name, geoms in layers.items()}
+    flat = [r for feats in rings.values() for polys in feats for poly in polys for r in poly]
+    topo = Topology(grid)
+    junctions = topo.junctions(flat)
+    refs = {name: [[[topo.add_ring(r, junctions) for r in poly] for poly in polys] for polys in feats]
+            for name, feats in rings.items()}
+    return topo, refs
+
+# ---------- 4. simplify + output ----------
+
+def simplify_arcs(arcs: List[np.ndarray], tolerance) -> List[np.ndarray]:
+    """Each arc simplified once (tolerance: scalar or one per arc); endpoints (junctions) stay put, closed arcs keep a triangle."""
+    tol = np.broadcast_to(np.asarray(tolerance, dtype=float), (len(arcs),))
+    if not len(arcs) or not (tol > 0).any():
+        return list(arcs)
+    simp = shapely.simplify(np.array([shapely.linestrings(a) for a in arcs], dtype=object), tol, preserve_topology=True)
+    out = []
+    for a, s, t in zip(arcs, simp, tol):
+        xy = shapely.get_coordinates(s)
+        closed = np.array_equal(a[0], a[-1])
+        out.append(a if t <= 0 or (closed and len(xy) < 4) or len(xy) < 2 else xy)
+    return out
+
+def simplify_topology(arcs: List[np.ndarray], refs: Dict[str, list], tolerance: float, grid: float,
+                      max_rounds: int = 8) -> Tuple[List[np.ndarray], int]:
+    """
+    simplify_arcs(), then relax the arcs of any polygon that came out invalid (an arc
+    cutting across a neighbouring arc of its own ring): their tolerance is halved and
+    they are simplified again, until every polygon is valid. Arcs still bad after
+    max_rounds halvings are left unsimplified. Arcs stay shared, so relaxing one keeps
+    both neighbours seamless. Returns (arcs, number of arcs relaxed).
+    """
+    tol = np.full(len(arcs), float(tolerance))
+    relaxed = set()
+    rounds = 0
+    while True:
+        out = simplify_arcs(arcs, tol)
+        bad = set()
+        for feats in refs.values():
+            for polys, geom in zip(feats, rebuild(feats, out)):
+                if geom is not None and not shapely.is_valid(geom):
+                    bad.update(r if r >= 0 else ~r for poly in polys for ring in poly for r in ring)
+        bad = np.array(sorted(i for i in bad if tol[i] > 0), dtype=np.int64)
+        if not len(bad):
+            break
+        relaxed.update(bad.tolist())
+        rounds += 1
+        if rounds >= max_rounds:
+            # Each pass zeroes at least one more arc: at worst those polygons get their input arcs back.
+            tol[bad] = 0.0
+        else:
+            tol[bad] /= 2
+            tol[bad[tol[bad] < grid]] = 0.0
+    return out, len(relaxed)
+
+def reproject_arcs(arcs: List[np.ndarray], crs: str) -> List[np.ndarray]:
+    """All arcs to lon/lat in one transform over their stacked coordinates."""
+    if not arcs:
+        return []
+    xy = np.vstack(arcs)
+    lon, lat = Transformer.from_crs(crs, "EPSG:4326", always_xy=True).transform(xy[:, 0], xy[:, 1])
+    return np.split(np.column_stack([lon, lat]), np.cumsum([len(a) for a in arcs])[:-1])
+
+def ring_coords(refs: List[int], arcs: List[np.ndarray]) -> np.ndarray:
+    parts = [arcs[r] if r >= 0 else arcs[~r][::-1] for r in refs]
+    return np.vstack([parts[0]] + [p[1:] for p in parts[1:]])
+
+def rebuild(refs: list, arcs: List[np.ndarray]) -> np.ndarray:
+    out = []
+    for polys in refs:
+        parts = [shapely.Polygon(ring_coords(poly[0], arcs), [ring_coords(h, arcs) for h in poly[1:]]) for poly in polys]
+        out.append(None if not parts else parts[0] if len(parts) == 1 else shapely.multipolygons(parts))
+    return np.array(out, dtype=object)
+
+def to_topojson(frames: Dict[str, gpd.GeoDataFrame], refs: Dict[str, list], arcs_ll: List[np.ndarray],
+                quantization: int) -> dict:
+    allxy = np.vstack(arcs_ll) if arcs_ll else np.zeros((1, 2))
+    enc = ArcEncoder((*allxy.min(axis=0), *allxy.max(axis=0)), quantization)
+    for a in arcs_ll:
+        enc.encode(a)
+    objects = {}
+    for name, gdf in frames.items():
+        props = gdf.drop(columns=gdf.geometry.name).to_dict("records")
+        geoms = []
+        for polys, p in zip(refs[name], props):
+            if not polys:
+                g = {"type": None}
+            elif len(polys) == 1:
+                g = {"type": "Polygon", "arcs": polys[0]}
+            else:
+                g = {"type": "MultiPolygon", "arcs": polys}
+            g["properties"] = json_properties(p)
+            geoms.append(g)
+        objects[name] = {"type": "GeometryCollection", "geometries": geoms}
+    return {"type": "Topology", "transform": enc.transform, "objects": objects, "arcs": enc.arcs}
+
+def write_topology(states_path: Path, counties_path: Path, out_dir: Path, prefix: str = "us",
+                   tolerances: Sequence[float] = DEFAULT_TOLERANCES, crs: str = "EPSG:5070", grid: float = 1.0,
+                   quantization: int = 100_000) -> List[dict]:
+    states = gpd.read_file(states_path).to_crs(crs)
+    counties = gpd.read_file(counties_path).to_crs(crs)
+    states["geometry"] = shapely.make_valid(shapely.set_precision(states.geometry.values, grid))
+    counties = conform_counties(states, counties, grid)
+
+    geoms = align_vertices(np.concatenate([states.geometry.values, counties.geometry.values]), grid)
+    states["geometry"], counties["geometry"] = geoms[:len(states)], geoms[len(states):]
+    frames = {"states": states, "counties": counties}
+    topo, refs = build_topology({k: v.geometry.values for k, v in frames.items()}, grid)
+    print(f"🧩 {len(topo.arcs):,} arcs, {sum(len(a) for a in topo.arcs):,} arc vertices "
+          f"(polygon rings: {int(shapely.get_num_coordinates(geoms).sum()):,})")
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    report = []
+    for i, tol in enumerate(tolerances):
+        arcs, n_relaxed = simplify_topology(topo.arcs, refs, tol, grid)
+        arcs_ll = reproject_arcs(arcs, crs)
+        tj = out_dir / f"{prefix}.tol{i}.topojson"
+        tj.write_text(json.dumps(to_topojson(frames, refs, arcs_ll, quantization), separators=(",", ":"), ensure_ascii=False),
+                      encoding="utf-8")
+        row = {"tolerance_m": tol, "arc_vertices": int(sum(len(a) for a in arcs)), "arcs_relaxed": n_relaxed, "topojson": str(tj),
+               "topojson_bytes": tj.stat().st_size}
+        for name, gdf in frames.items():
+            shared = gdf.copy(); shared["geometry"] = rebuild(refs[name], arcs)
+            gj = out_dir / f"{prefix}_{name}.tol{i}.geojson"
+            write_geojson(shared.to_crs(4326), gj)
+            # Independent simplification, for comparison (what lod.py would do per polygon).
+            alone = shapely.simplify(gdf.geometry.values, tol, preserve_topology=True) if tol > 0 else gdf.geometry.values
+            row[f"{name}_vertices"] = int(shapely.get_num_coordinates(shared.geometry.values).sum())
+            row[f"{name}_independent_vertices"] = int(shapely.get_num_coordinates(alone).sum())
+            row[f"{name}_geojson_bytes"] = gj.stat().st_size
+        report.append(row)
+    return report
+
+def main():
+    ap = argparse.ArgumentParser(description="Shared-arc topology for states + counties, simplified without seams.")
+    ap.add_argument("--states", type=Path, default=Path("states_layer.geojson"))
+    ap.add_argument("--counties", type=Path, default=Path("counties_layer.geojson"))
+    ap.add_argument("--out", type=Path, default=Path("topology"), help="Output directory (default: topology)")
+    ap.add_argument("--prefix", default="us")
+    ap.add_argument("--tolerances", type=float, nargs="+", default=list(DEFAULT_TOLERANCES),
+                    help="Simplification tolerances in metres (0 = none)")
+    ap.add_argument("--crs", default="EPSG:5070", help="Metric CRS for overlay and simplification (default: EPSG:5070)")
+    ap.add_argument("--grid", type=float, default=1.0, help="Precision grid in metres for overlay and vertex matching (default: 1)")
+    ap.add_argument("--quantization", type=int, default=100_000)
+    args = ap.parse_args()
+
+    rows = write_topology(args.states, args.counties, args.out, args.prefix, args.tolerances, args.crs, args.grid,
+                          args.quantization)
+    for i, r in enumerate(rows):
+        print(f"   tol{i} {r['tolerance_m']:>7g} m: arcs {r['arc_vertices']:>9,} vtx ({r['arcs_relaxed']:,} relaxed), topojson {human(r['topojson_bytes']):>10} | "
+              f"counties {r['counties_vertices']:,} vtx vs {r['counties_independent_vertices']:,} independent, "
+              f"geojson {human(r['counties_geojson_bytes'])}")
+
+if __name__ == "__main__":
+    main()
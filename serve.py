@@ -0,0 +1,237 @@
+# save as serve.py
+"""
+Local server for the viewer, in place of `python3 -m http.server 8000`.
+
+    python serve.py                      # http://127.0.0.1:8000/ over the repo root
+    python serve.py --port 8080 --bind 0.0.0.0
+    python serve.py --precompress data filter/data_tokyo   # write .gz (+ .br) siblings
+
+What it adds over http.server:
+  * one thread per request (ThreadingHTTPServer), so the viewer's parallel
+    d3.json() calls are not queued behind each other;
+  * content negotiation: for /x.geojson it sends x.geojson.br or x.geojson.gz
+    when the client accepts that encoding and the sibling is at least as new
+    as the file (Content-Encoding + Vary: Accept-Encoding);
+  * ETag / If-None-Match → 304, per encoded representation;
+  * single byte ranges (Range / If-Range → 206, 416 when unsatisfiable);
+  * Cache-Control: immutable for a year on content-hashed names
+    (name.<8+ hex>.ext), otherwise no-cache so the browser revalidates by ETag.
+
+--precompress writes deterministic gzip (level 9, no timestamp) and, when the
+brotli module is installed, brotli siblings for every .geojson/.topojson/.json
+under the given directories, skipping small files and siblings that are
+already up to date.
+"""
+import argparse, gzip, hashlib, os, re, sys
+from functools import partial
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+ROOT = Path(__file__).resolve().parent
+PRECOMPRESS_SUFFIXES = (".geojson", ".topojson", ".json")
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+HASHED_NAME = re.compile(r"\.[0-9a-f]{8,}\.[A-Za-z0-9]+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+def accepted_encodings(header: Optional[str]) -> set:
+    """Codings with q > 0 from an Accept-Encoding header."""
+    out = set()
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        for p in params.split(";"):
+            k, _, v = p.strip().partition("=")
+            if k == "q":
+                try:
+                    q = float(v)
+                except ValueError:
+                    q = 0.0
+        if coding and q > 0:
+            out.add(coding.lower())
+    return out
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """(first, last) for a single `bytes=` range, None if unsatisfiable; raises ValueError if it is not one."""
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        raise ValueError(header)
+    start, _, end = spec.strip().partition("-")
+    if not start:                                  # suffix range: last N bytes
+        n = int(end)
+        return (max(size - n, 0), size - 1) if n > 0 and size else None
+    first = int(start)
+    last = min(int(end), size - 1) if end else size - 1
+    return (first, last) if first <= last and first < size else None
+
+class MapRequestHandler(SimpleHTTPRequestHandler):
+    extensions_map = {**SimpleHTTPRequestHandler.extensions_map,
+                      ".geojson": "application/geo+json", ".topojson": "application/json",
+                      ".js": "text/javascript", ".json": "application/json", ".bin": "application/octet-stream"}
+
+    def select(self, path: str) -> Tuple[str, Optional[str]]:
+        """The file to send for `path` and its Content-Encoding (None for identity)."""
+        accepted = accepted_encodings(self.headers.get("Accept-Encoding"))
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return path, None
+        for coding, suffix in ENCODINGS:
+            if coding in accepted:
+                try:
+                    if os.stat(path + suffix).st_mtime_ns >= mtime:
+                        return path + suffix, coding
+                except OSError:
+                    pass
+        return path, None
+
+    def send_head(self):
+        self._remaining = None
+        path = self.translate_path(self.path)
+        if os.path.isdir(path) or not os.path.isfile(path):
+            # Directories (index.html, listings) and 404s behave as in http.server.
+            return super().send_head()
+        ctype = self.guess_type(path)
+        served, coding = self.select(path)
+        try:
+            f = open(served, "rb")
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+        try:
+            st = os.fstat(f.fileno())
+            etag = '"' + hashlib.blake2b(f"{st.st_size}-{st.st_mtime_ns}-{coding}".encode(), digest_size=8).hexdigest() + '"'
+
+            inm = self.headers.get("If-None-Match")
+            if inm and (inm.strip() == "*" or etag in [t.strip() for t in inm.split(",")]):
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self._common_headers(path, etag)
+                self.end_headers()
+                f.close()
+                return None
+
+            first, last = 0, st.st_size - 1
+            status = HTTPStatus.OK
+            rng = self.headers.get("Range")
+            if rng and self.headers.get("If-Range", etag) == etag:
+                try:
+                    r = parse_range(rng, st.st_size)
+                except ValueError:
+                    r = (0, st.st_size - 1)            # malformed or multi-range: ignore, send it all
+                if r is None:
+                    self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                    self.send_header("Content-Range", f"bytes */{st.st_size}")
+                    self.send_header("Content-Length", "0")
+                    self._common_headers(path, etag)
+                    self.end_headers()
+                    f.close()
+                    return None
+                if r != (0, st.st_size - 1):
+                    status, (first, last) = HTTPStatus.PARTIAL_CONTENT, r
+
+            self.send_response(status)
+            self.send_header("Content-Type", ctype)
+            if coding:
+                self.send_header("Content-Encoding", coding)
+            if status == HTTPStatus.PARTIAL_CONTENT:
+                self.send_header("Content-Range", f"bytes {first}-{last}/{st.st_size}")
+            self.send_header("Content-Length", str(max(last - first + 1, 0)))
+            self.send_header("Last-Modified", self.date_time_string(int(st.st_mtime)))
+            self._common_headers(path, etag)
+            self.end_headers()
+            f.seek(first)
+            self._remaining = last - first + 1
+            return f
+        except Exception:
+            f.close()
+            raise
+
+    def _common_headers(self, path: str, etag: str):
+        self.send_header("ETag", etag)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("Cache-Control", IMMUTABLE if HASHED_NAME.search(path) else "no-cache")
+
+    def copyfile(self, source, outputfile):
+        remaining = getattr(self, "_remaining", None)
+        if remaining is None:
+            return super().copyfile(source, outputfile)
+        while remaining > 0:
+            buf = source.read(min(1 << 16, remaining))
+            if not buf:
+                break
+            outputfile.write(buf)
+            remaining -= len(buf)
+        self._remaining = None
+
+# ---------- precompression ----------
+
+def _compress_gzip(data: bytes) -> bytes:
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+def _compress_brotli(data: bytes) -> bytes:
+    return brotli.compress(data, quality=11)
+
+def precompress(dirs: Sequence[Path], suffixes: Sequence[str] = PRECOMPRESS_SUFFIXES, min_size: int = 1024,
+                force: bool = False) -> List[Path]:
+    """Write .gz (and .br, with brotli) next to every matching file under dirs; returns the files written."""
+    coders = [(".gz", _compress_gzip)] + ([(".br", _compress_brotli)] if brotli is not None else [])
+    written = []
+    for d in dirs:
+        d = Path(d)
+        files = [d] if d.is_file() else sorted(p for p in d.rglob("*") if p.is_file() and p.suffix in suffixes)
+        for src in files:
+            st = src.stat()
+            if st.st_size < min_size:
+                continue
+            data = None
+            for suffix, compress in coders:
+                dst = src.with_name(src.name + suffix)
+                if not force and dst.exists() and dst.stat().st_mtime_ns >= st.st_mtime_ns:
+                    continue
+                data = data if data is not None else src.read_bytes()
+                packed = compress(data)
+                if len(packed) >= len(data):
+                    continue
+                tmp = dst.with_name(dst.name + ".tmp")
+                tmp.write_bytes(packed)
+                tmp.replace(dst)
+                written.append(dst)
+                print(f"🗜️  {src} {st.st_size / 2**20:.2f} MiB → {suffix} {len(packed) / 2**20:.2f} MiB "
+                      f"(×{st.st_size / len(packed):.1f})")
+    if brotli is None:
+        print("ℹ️  brotli not installed: wrote gzip only (pip install brotli for .br)")
+    return written
+
+def main():
+    ap = argparse.ArgumentParser(description="Threaded static server with precompressed variants, ETags and ranges.")
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--bind", default="127.0.0.1")
+    ap.add_argument("--dir", type=Path, default=ROOT, help="Directory to serve (default: the repo root)")
+    ap.add_argument("--precompress", type=Path, nargs="+", metavar="DIR",
+                    help="Write .gz/.br siblings for the .geojson/.topojson/.json files under these directories and exit")
+    ap.add_argument("--min-size", type=int, default=1024, help="With --precompress: skip smaller files (default: 1024 bytes)")
+    ap.add_argument("--force", action="store_true", help="With --precompress: rewrite up-to-date siblings too")
+    args = ap.parse_args()
+
+    if args.precompress:
+        written = precompress(args.precompress, min_size=args.min_size, force=args.force)
+        print(f"✅ {len(written)} compressed files written")
+        return
+
+    handler = partial(MapRequestHandler, directory=str(args.dir))
+    with ThreadingHTTPServer((args.bind, args.port), handler) as httpd:
+        print(f"🌐 serving {args.dir} at http://{args.bind}:{args.port}/ (gzip{'+br' if brotli else ''} siblings, ETag, Range)")
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            sys.exit(0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+// Loader for the binary layer bundles written by filter/binary_export.py.
+// The .bin maps straight into typed arrays (no JSON parse); coordinates are
+// Web Mercator metres relative to `origin`, so any d3.geoMercator() reduces
+// to one scale + translate per point.
+
+const SUBW_MAGIC = "SUBW";
+
+async function loadBundle(stemUrl) {
+  const [buf, props] = await Promise.all([
+    fetch(`${stemUrl}.bin`).then(r => r.arrayBuffer()),
+    fetch(`${stemUrl}.props.json`).then(r => r.json()),
+  ]);
+  const dv = new DataView(buf);
+  const magic = String.fromCharCode(...new Uint8Array(buf, 0, 4));
+  if (magic !== SUBW_MAGIC || dv.getUint16(4, true) !== 1) throw new Error(`${stemUrl}: not a SUBW v1 bundle`);
+
+  const raggedType = dv.getUint8(6);
+  const nOffsets = dv.getUint8(7);
+  const nFeatures = dv.getUint32(8, true);
+  const nCoords = dv.getUint32(12, true);
+  const origin = [dv.getFloat64(16, true), dv.getFloat64(24, true)];
+
+  let pos = 48;
+  const types = new Uint8Array(buf, pos, nFeatures);
+  pos += nFeatures + ((4 - (nFeatures % 4)) % 4);
+  const offsets = [];
+  for (let i = 0; i < nOffsets; i++) {
+    const n = dv.getUint32(32 + 4 * i, true);
+    offsets.push(new Uint32Array(buf, pos, n));
+    pos += 4 * n;
+  }
+  const coords = new Float32Array(buf, pos, 2 * nCoords);
+  return {raggedType, nFeatures, origin, types, offsets, coords, props};
+}
+
+// metres → pixels for a d3.geoMercator() projection (no rotation/clipping).
+function mercatorTransform(projection, origin) {
+  const k = projection.scale() / 6378137;
+  const [x0, y0] = projection([0, 0]);
+  return (x, y) => [x0 + k * (x + origin[0]), y0 - k * (y + origin[1])];
+}
+
+// SVG path "d" for each feature of a line bundle (LineString or MultiLineString).
+function bundleLinePaths(bundle, projection) {
+  const {offsets, coords, nFeatures, origin} = bundle;
+  const px = mercatorTransform(projection, origin);
+  const parts = offsets[0];
+  const geoms = offsets.length > 1 ? offsets[1] : null;   // Multi*: feature → parts
+  const out = new Array(nFeatures);
+  for (let f = 0; f < nFeatures; f++) {
+    const p0 = geoms ? geoms[f] : f, p1 = geoms ? geoms[f + 1] : f + 1;
+    let d = "";
+    for (let p = p0; p < p1; p++) {
+      for (let c = parts[p]; c < parts[p + 1]; c++) {
+        const [x, y] = px(coords[2 * c], coords[2 * c + 1]);
+        d += (c === parts[p] ? "M" : "L") + x.toFixed(1) + "," + y.toFixed(1);
+      }
+    }
+    out[f] = d;
+  }
+  return out;
+}
@@ -0,0 +1,57 @@
+"""build_network() on a toy network: two lines sharing track, one of them drawn in both directions."""
+import sys, unittest
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+from shapely.geometry import LineString, Point
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "filter"))
+from network import Network, build_network
+
+LAT = 35.68
+LONS = [139.70, 139.71, 139.72, 139.73]
+
+def toy():
+    stations = gpd.GeoDataFrame({"id": ["s0", "s1", "s2", "s3"], "name": ["Zero", "One", "Two", "Three"]},
+                                geometry=[Point(x, LAT) for x in LONS], crs="EPSG:4326")
+    track = lambda a, b, dlat=0.0: LineString([(x, LAT + dlat) for x in LONS[a:b + 1]])
+    routes = gpd.GeoDataFrame({"ref": ["A", "A", "B"]}, geometry=[
+        track(0, 3, 0.0001),                                     # A eastbound, ~11 m north of the stations
+        LineString(list(track(0, 3, -0.0001).coords)[::-1]),     # A westbound, ~11 m south
+        track(0, 2),                                             # B on the same corridor, s0-s2 only
+    ], crs="EPSG:4326")
+    return stations, routes
+
+class BuildNetworkTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.csr, cls.nodes, cls.edges = build_network(*toy(), snap_radius_m=50)
+        cls.net = Network(**cls.csr)
+
+    def test_one_edge_per_station_pair_and_line(self):
+        got = sorted(zip(self.edges["u"], self.edges["v"], self.edges["line"]))
+        self.assertEqual(got, [(0, 1, "A"), (0, 1, "B"), (1, 2, "A"), (1, 2, "B"), (2, 3, "A")])
+        # Both directions of A collapsed: each A edge is one stretch between neighbouring stations (~906 m).
+        a = self.edges[self.edges["line"] == "A"]["length_m"].to_numpy()
+        np.testing.assert_allclose(a, 906, rtol=0.01)
+
+    def test_csr_keeps_parallel_lines_apart(self):
+        self.assertEqual(list(self.csr["lines"]), ["A", "B"])
+        self.assertEqual(sorted((v, line) for v, _, line in self.net.neighbors(1)), [(0, "A"), (0, "B"), (2, "A"), (2, "B")])
+        self.assertEqual(np.diff(self.csr["indptr"]).tolist(), [2, 4, 3, 1])
+        self.assertEqual(len(self.csr["indices"]), 2 * len(self.edges))
+
+    def test_nodes_list_their_lines(self):
+        self.assertEqual(self.nodes["lines"].tolist(), ["A,B", "A,B", "A,B", "A"])
+        self.assertEqual(self.nodes["station_id"].tolist(), ["s0", "s1", "s2", "s3"])
+
+    def test_shortest_paths(self):
+        dist, pred = self.net.shortest_paths(0)
+        self.assertEqual(Network.path(pred, 3), [0, 1, 2, 3])
+        np.testing.assert_allclose(dist[3], 3 * 906, rtol=0.01)
+        self.assertEqual(self.net.reachable(0, 1000).tolist(), [0, 1])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""OverpassCache on a temporary directory with a fake clock: keys, TTL, LRU eviction and the manifest."""
+import gzip, os, sys, tempfile, unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "fetch"))
+from overpass_cache import OverpassCache, cache_key, normalize_query
+
+EP, EP2 = "https://a.example/api/interpreter", "https://b.example/api/interpreter"
+Q = '[out:json][timeout:60];\nnode["name"="Ginza  //  Line"](35.6,139.7,35.7,139.8);\nout body;'
+
+class Clock:
+    def __init__(self, t: float = 1_000_000.0):
+        self.t = t
+
+    def __call__(self) -> float:
+        return self.t
+
+class NormalizeQueryTest(unittest.TestCase):
+    def test_cosmetic_edits_keep_the_key(self):
+        edited = ('[out:json][timeout:60];   // Ginza stations\n\n  node["name"="Ginza  //  Line"](35.6,139.7,35.7,139.8);'
+                  ' /* bbox */\n\tout body;  \n')
+        self.assertEqual(cache_key(edited, EP), cache_key(Q, EP))
+
+    def test_string_literals_are_kept_verbatim(self):
+        self.assertIn('"Ginza  //  Line"', normalize_query(Q))
+        self.assertIn("'a  b'", normalize_query("node['name'='a  b'];"))
+        self.assertIn(r'"say \"hi\"  // x"', normalize_query(r'node["n"="say \"hi\"  // x"];'))
+        for other in (Q.replace("Ginza  //  Line", "Ginza // Line"), Q.replace("Ginza  //  Line", "Ginza  ")):
+            self.assertNotEqual(cache_key(other, EP), cache_key(Q, EP))
+
+    def test_endpoint_is_part_of_the_key(self):
+        self.assertNotEqual(cache_key(Q, EP), cache_key(Q, EP2))
+
+class OverpassCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name) / "cache"
+        self.clock = Clock()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def cache(self, **kw) -> OverpassCache:
+        return OverpassCache(self.root, clock=self.clock, **kw)
+
+    def test_round_trip(self):
+        c = self.cache()
+        self.assertIsNone(c.read_bytes(Q, [EP]))
+        c.put_bytes(Q, EP, b'{"elements":[]}')
+        self.assertEqual(c.read_bytes(Q, [EP]), b'{"elements":[]}')
+        src = Path(self.tmp.name) / "body.json"
+        src.write_bytes(b'{"elements":[1]}')
+        c.put_file("other", EP, src)
+        out = Path(self.tmp.name) / "copy.json"
+        self.assertEqual(c.copy_to("other", [EP2, EP], out)["endpoint"], EP)
+        self.assertEqual(out.read_bytes(), b'{"elements":[1]}')
+        self.assertEqual(gzip.decompress(c._path(cache_key("other", EP)).read_bytes()), b'{"elements":[1]}')
+
+    def test_freshest_endpoint_wins(self):
+        c = self.cache()
+        c.put_bytes(Q, EP, b"old")
+        self.clock.t += 10
+        c.put_bytes(Q, EP2, b"new")
+        self.assertEqual(c.read_bytes(Q, [EP, EP2]), b"new")
+
+    def test_ttl_expiry(self):
+        c = self.cache(ttl=60)
+        c.put_bytes(Q, EP, b"body")
+        self.clock.t += 60
+        self.assertEqual(c.read_bytes(Q, [EP]), b"body")
+        self.clock.t += 1
+        self.assertIsNone(c.read_bytes(Q, [EP]))
+        # The stale entry and its file go at the next write.
+        c.put_bytes("other", EP, b"x")
+        self.assertNotIn(cache_key(Q, EP), c.manifest)
+        self.assertFalse(c._path(cache_key(Q, EP)).exists())
+
+    def test_lru_eviction_to_the_size_cap(self):
+        blob = lambda: os.urandom(1000)   # incompressible, so each entry is a bit over 1000 bytes
+        c = self.cache(max_bytes=2500)
+        c.put_bytes("a", EP, blob()); self.clock.t += 1
+        c.put_bytes("b", EP, blob()); self.clock.t += 1
+        self.assertIsNotNone(c.read_bytes("a", [EP])); self.clock.t += 1   # "b" is now least recently used
+        c.put_bytes("c", EP, blob())
+        self.assertIsNotNone(c.read_bytes("a", [EP]))
+        self.assertIsNone(c.read_bytes("b", [EP]))
+        self.assertIsNotNone(c.read_bytes("c", [EP]))
+        self.assertFalse(c._path(cache_key("b", EP)).exists())
+        self.assertLessEqual(sum(e["size"] for e in c.manifest.values()), 2500)
+
+    def test_manifest_persists(self):
+        c = self.cache()
+        c.put_bytes(Q, EP, b"body")
+        self.clock.t += 5
+        c.read_bytes(Q, [EP])
+        again = self.cache()
+        entry = again.manifest[cache_key(Q, EP)]
+        self.assertEqual((entry["endpoint"], entry["fetched_at"], entry["last_access"]), (EP, 1_000_000.0, 1_000_005.0))
+        self.assertEqual(again.read_bytes(Q, [EP]), b"body")
+
+    def test_unreadable_manifest_starts_empty(self):
+        self.root.mkdir(parents=True)
+        (self.root / "manifest.json").write_text("{not json")
+        c = self.cache()
+        self.assertEqual(c.manifest, {})
+        c.put_bytes(Q, EP, b"body")
+        self.assertEqual(self.cache().read_bytes(Q, [EP]), b"body")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+"""OverpassClient against overpass_standin.py: retries, slot waits, mirror fallback and hedging."""
+import json, sys, tempfile, time, unittest
+from pathlib import Path
+
+import requests
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "fetch"))
+from overpass_client import OverpassClient, OverpassError, parse_retry_after, parse_slot_wait
+from overpass_standin import serve_standin
+
+BODY = json.dumps({"version": 0.6, "elements": [{"type": "node", "id": i, "lat": 35.0, "lon": 139.0} for i in range(40)]}).encode()
+
+class OverpassClientTest(unittest.TestCase):
+    def setUp(self):
+        self.server = serve_standin(BODY)
+        self.hits = self.server.RequestHandlerClass.hits
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def url(self, mode: str, ep: str = "interpreter") -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}/{mode}/api/{ep}"
+
+    def attempts(self, mode: str) -> int:
+        return self.hits[f"/{mode}/api/interpreter"]
+
+    def test_post_json_and_post_stream(self):
+        client = OverpassClient([self.url("ok")], check_status=False)
+        self.assertEqual(client.post_json("q"), json.loads(BODY))
+        out = Path(self.tmp.name) / "out.json"
+        self.assertEqual(client.post_stream("q", out), len(BODY))
+        self.assertEqual(out.read_bytes(), BODY)
+        self.assertEqual(self.attempts("ok"), 2)
+
+    def test_429_with_retry_after_is_retried(self):
+        client = OverpassClient([self.url("limited-2")], retries=4, max_backoff=0.05, check_status=False)
+        self.assertEqual(client.post_json("q"), json.loads(BODY))
+        self.assertEqual(self.attempts("limited-2"), 3)
+
+    def test_429_without_retry_after_waits_for_a_slot(self):
+        client = OverpassClient([self.url("busy-2")], retries=2, max_backoff=0.05)
+        self.assertEqual(client.slot_wait(self.url("busy-2")), 2.0)
+        self.assertEqual(client.post_json("q"), json.loads(BODY))
+        self.assertEqual(self.attempts("busy-2"), 2)
+        self.assertEqual(self.hits["/busy-2/api/status"], 2)   # the direct check above + the retry
+
+    def test_retries_exhausted_raises(self):
+        client = OverpassClient([self.url("limited-5")], retries=2, max_backoff=0.01, check_status=False)
+        with self.assertRaises(OverpassError):
+            client.post_json("q")
+        self.assertEqual(self.attempts("limited-5"), 3)
+
+    def test_falls_back_to_the_next_mirror(self):
+        client = OverpassClient([self.url("fail-504"), self.url("fail-500"), self.url("ok")], retries=1, backoff=0.01,
+                                check_status=False)
+        self.assertEqual(client.post_json("q"), json.loads(BODY))
+        self.assertEqual(self.attempts("fail-504"), 2)   # 504 is retried once before moving on
+        self.assertEqual(self.attempts("fail-500"), 1)   # 500 is not retried
+        self.assertEqual(self.attempts("ok"), 1)
+
+    def test_hedged_race_takes_the_fastest_and_cancels_the_rest(self):
+        # The trickling mirror starts first but needs ~2 s for the body; the slow one answers after 0.3 s.
+        client = OverpassClient([self.url("trickle-0.05"), self.url("slow-0.3")], hedge=True, check_status=False)
+        out = Path(self.tmp.name) / "raced.json"
+        t0 = time.time()
+        client.post_stream("q", out)
+        self.assertLess(time.time() - t0, 1.5)
+        self.assertEqual(out.read_bytes(), BODY)
+        self.assertEqual((self.attempts("trickle-0.05"), self.attempts("slow-0.3")), (1, 1))
+        deadline = time.time() + 3
+        while list(out.parent.glob("*.part")) and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(list(out.parent.glob("*.part")), [])   # the loser's partial download is removed
+
+    def test_hedge_delay_staggers_the_backup(self):
+        client = OverpassClient([self.url("ok"), self.url("slow-0.1")], hedge=True, hedge_delay=1.0, check_status=False)
+        self.assertEqual(client.post_json("q"), json.loads(BODY))
+        time.sleep(0.2)
+        self.assertEqual(self.attempts("slow-0.1"), 0)   # the first mirror won before the backup started
+
+    def test_shared_session_keeps_its_adapters(self):
+        session = requests.Session()
+        adapters = dict(session.adapters)
+        client = OverpassClient([self.url("ok")], session=session, check_status=False)
+        self.assertIs(client.session, session)
+        self.assertEqual(dict(session.adapters), adapters)
+
+class ParseTest(unittest.TestCase):
+    def test_retry_after(self):
+        self.assertEqual(parse_retry_after("3"), 3.0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("soon"))
+
+    def test_slot_wait(self):
+        self.assertEqual(parse_slot_wait("Rate limit: 2\n1 slots available now.\n"), 0.0)
+        self.assertEqual(parse_slot_wait("0 slots available now.\nSlot available after: x, in 7 seconds.\n"
+                                         "Slot available after: y, in 3 seconds.\n"), 3.0)
+        self.assertIsNone(parse_slot_wait("Rate limit: 2\n"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+"""update_dump() against overpass_standin.py replaying a canned augmented diff, and the processor's layer patching."""
+import json, sys, tempfile, unittest
+from pathlib import Path
+
+import geopandas as gpd
+from shapely.geometry import LineString, Point
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path[:0] = [str(ROOT / "fetch"), str(ROOT / "filter"), str(ROOT / "filter" / "tokyo")]
+from geojson_writer import write_geojson
+from overpass_client import OverpassClient
+from overpass_diff import ElementStore, affected_path, update_dump
+from overpass_standin import respond_with_diffs, serve_standin
+from process_tokyo_overpass import patch_layer
+
+SINCE, UNTIL = "2024-01-01T00:00:00Z", "2024-02-01T00:00:00Z"
+QUERY = '[out:json][timeout:180];\nrelation["route"="subway"];\nout body;\n>;\nout skel qt;'
+
+def node(i, lat, lon, **tags):
+    return {"type": "node", "id": i, "lat": lat, "lon": lon, **({"tags": tags} if tags else {})}
+
+def way(i, nodes):
+    return {"type": "way", "id": i, "nodes": nodes, "tags": {"railway": "subway"}}
+
+def relation(i, members, name):
+    return {"type": "relation", "id": i, "members": [{"type": t, "ref": r, "role": ""} for t, r in members],
+            "tags": {"type": "route", "route": "subway", "name": name}}
+
+DUMP = {
+    "version": 0.6,
+    "osm3s": {"timestamp_osm_base": SINCE},
+    "elements": [
+        *(node(i, 35.0 + i / 100, 139.0) for i in range(1, 8)),
+        node(100, 35.5, 139.5, railway="station", name="A"),
+        node(101, 35.6, 139.6, railway="station", name="B"),
+        way(10, [1, 2, 3]), way(11, [3, 4]), way(12, [5, 6]), way(13, [6, 7]),
+        relation(20, [("way", 10), ("way", 11), ("node", 100)], "Red"),
+        relation(21, [("way", 12), ("node", 101)], "Blue"),
+    ],
+}
+
+# Node 2 moves, station 200 is created, way 11 is deleted and relation 21 gains way 13.
+ADIFF = f"""<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6" generator="Overpass API">
+<meta osm_base="{UNTIL}"/>
+<action type="modify">
+<old><node id="2" lat="35.02" lon="139.0"/></old>
+<new><node id="2" lat="35.025" lon="139.001"/></new>
+</action>
+<action type="create">
+<node id="200" lat="35.7" lon="139.7"><tag k="railway" v="station"/><tag k="name" v="New"/></node>
+</action>
+<action type="delete">
+<old><way id="11"><nd ref="3"/><nd ref="4"/><tag k="railway" v="subway"/></way></old>
+<new><way id="11" visible="false"/></new>
+</action>
+<action type="modify">
+<old><relation id="21"><member type="way" ref="12" role=""/><member type="node" ref="101" role=""/><tag k="name" v="Blue"/></relation></old>
+<new><relation id="21"><member type="way" ref="12" role=""/><member type="way" ref="13" role=""/><member type="node" ref="101" role=""/><tag k="type" v="route"/><tag k="route" v="subway"/><tag k="name" v="Blue"/></relation></new>
+</action>
+</osm>
+""".encode()
+
+class UpdateDumpTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dump = Path(self.tmp.name) / "overpass_raw_test.json.gz"
+        ElementStore({(e["type"], e["id"]): e for e in DUMP["elements"]},
+                     {k: v for k, v in DUMP.items() if k != "elements"}).save(self.dump)
+        self.server = serve_standin(respond=respond_with_diffs(b"{}", {SINCE: ADIFF}))
+        url = f"http://127.0.0.1:{self.server.server_address[1]}/ok/api/interpreter"
+        self.client = OverpassClient([url], check_status=False, retries=0)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def test_update_rewrites_dump_and_reports_affected_ids(self):
+        report = update_dump(self.client, QUERY, self.dump)
+
+        store = ElementStore.load(self.dump)
+        self.assertEqual(store.timestamp, UNTIL)
+        self.assertEqual(store.elements[("node", 2)], {"type": "node", "id": 2, "lat": 35.025, "lon": 139.001})
+        self.assertEqual(store.elements[("node", 200)]["tags"], {"railway": "station", "name": "New"})
+        self.assertNotIn(("way", 11), store.elements)
+        self.assertEqual([(m["type"], m["ref"]) for m in store.elements[("relation", 21)]["members"]],
+                         [("way", 12), ("way", 13), ("node", 101)])
+        self.assertEqual(store.elements[("relation", 20)], DUMP["elements"][-2])
+        self.assertEqual(len(store.elements), len(DUMP["elements"]))
+
+        side = json.loads(affected_path(self.dump).read_text(encoding="utf-8"))
+        self.assertEqual(side, report)
+        self.assertEqual((side["since"], side["until"], side["dump"]), (SINCE, UNTIL, self.dump.name))
+        self.assertEqual(side["actions"], {"create": 1, "modify": 2, "delete": 1})
+        self.assertEqual(side["node"], [2, 200])
+        self.assertEqual(side["way"], [10, 11, 12, 13])
+        self.assertEqual(side["relation"], [20, 21])
+        self.assertFalse(self.dump.with_name(self.dump.name + ".adiff.xml").exists())
+
+    def test_unconsumed_sidecar_is_merged(self):
+        update_dump(self.client, QUERY, self.dump)
+        # Nothing changed since UNTIL: the stand-in answers with an empty diff.
+        report = update_dump(self.client, QUERY, self.dump)
+        self.assertEqual((report["since"], report["until"]), (SINCE, UNTIL))
+        self.assertEqual(report["actions"], {"create": 1, "modify": 2, "delete": 1})
+        self.assertEqual((report["node"], report["way"], report["relation"]), ([2, 200], [10, 11, 12, 13], [20, 21]))
+
+class PatchLayerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "stations.geojson"
+        prev = gpd.GeoDataFrame({"id": [100, 101, 102], "name": ["A", "B", "C"]},
+                                geometry=[Point(139.5, 35.5), Point(139.6, 35.6), Point(139.7, 35.7)], crs="EPSG:4326")
+        write_geojson(prev, self.path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_stale_rows_are_replaced_by_fresh_ones(self):
+        fresh = gpd.GeoDataFrame({"id": [101, 200], "name": ["B renamed", "New"]},
+                                 geometry=[Point(139.61, 35.6), Point(139.8, 35.8)], crs="EPSG:4326")
+        out = patch_layer(self.path, fresh, lambda prev: prev["id"].isin({101, 200}))
+        self.assertEqual(out["id"].tolist(), [100, 102, 101, 200])
+        self.assertEqual(out["name"].tolist(), ["A", "C", "B renamed", "New"])
+        self.assertEqual(out.geometry.iloc[2], Point(139.61, 35.6))
+        self.assertEqual(out.crs.to_epsg(), 4326)
+
+    def test_deleted_rows_go_without_fresh_ones(self):
+        empty = gpd.GeoDataFrame({"id": [], "name": []}, geometry=[], crs="EPSG:4326")
+        out = patch_layer(self.path, empty, lambda prev: prev["id"] == 102)
+        self.assertEqual(out["id"].tolist(), [100, 101])
+
+    def test_routes_with_different_columns(self):
+        routes = Path(self.tmp.name) / "routes.geojson"
+        write_geojson(gpd.GeoDataFrame({"id": [10, 11]}, geometry=[LineString([(0, 0), (1, 1)]), LineString([(1, 1), (2, 2)])],
+                                       crs="EPSG:4326"), routes)
+        fresh = gpd.GeoDataFrame({"id": [9000], "n_ways": [2]}, geometry=[LineString([(0, 0), (2, 2)])], crs="EPSG:4326")
+        out = patch_layer(routes, fresh, lambda prev: prev["id"] == 11)
+        self.assertEqual(out["id"].tolist(), [10, 9000])
+        self.assertTrue(out["n_ways"].isna().iloc[0])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+"""Raptor against a brute-force connection scan over a random 30-station GTFS feed."""
+import random, sys, tempfile, unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "filter" / "nyc"))
+from raptor import INF, Raptor, Timetable, parse_time
+
+N_STATIONS, N_ROUTES, TRIPS_PER_ROUTE = 30, 8, 12
+
+def write_feed(gtfs: Path, seed: int):
+    """Random routes, overtaking trips, in-station change times and one-way footpaths; returns what the reference needs."""
+    rng = random.Random(seed)
+    names = [f"S{i:02d}" for i in range(N_STATIONS)]
+    rows = ["stop_id,stop_name,parent_station"]
+    for s in names:
+        rows += [f"{s},Station {s},", f"{s}N,Station {s},{s}", f"{s}S,Station {s},{s}"]
+    (gtfs / "stops.txt").write_text("\n".join(rows) + "\n")
+    (gtfs / "calendar.txt").write_text("service_id,monday,start_date,end_date\nWKD,1,20240101,20241231\n")
+
+    trips, stop_times, connections = ["route_id,trip_id,service_id"], ["trip_id,stop_id,arrival_time,departure_time,stop_sequence"], []
+    hms = lambda t: f"{t // 3600:02d}:{t % 3600 // 60:02d}:{t % 60:02d}"
+    for r in range(N_ROUTES):
+        seq = rng.sample(range(N_STATIONS), rng.randint(4, 8))
+        for k in range(TRIPS_PER_ROUTE):
+            trip = f"R{r}_{k}"
+            trips.append(f"R{r},{trip},WKD")
+            t = parse_time("06:00") + rng.randint(0, 3600)
+            prev = None
+            for i, s in enumerate(seq):
+                arr = t
+                dep = arr + rng.choice((0, 0, 30))
+                stop_times.append(f"{trip},{names[s]}N,{hms(arr)},{hms(dep)},{i + 1}")
+                if prev is not None:
+                    connections.append((prev[1], trip, prev[0], s, arr))
+                prev, t = (s, dep), dep + rng.randint(60, 400)
+    (gtfs / "trips.txt").write_text("\n".join(trips) + "\n")
+    (gtfs / "stop_times.txt").write_text("\n".join(stop_times) + "\n")
+
+    change = [rng.choice((0, 60, 120, 180)) for _ in range(N_STATIONS)]
+    walks = {}
+    while len(walks) < 40:
+        a, b = rng.sample(range(N_STATIONS), 2)
+        walks[(a, b)] = rng.randint(60, 600)
+    rows = ["from_stop_id,to_stop_id,transfer_type,min_transfer_time"]
+    rows += [f"{names[s]},{names[s]},2,{change[s]}" for s in range(N_STATIONS)]
+    rows += [f"{names[a]},{names[b]},2,{t}" for (a, b), t in walks.items()]
+    (gtfs / "transfers.txt").write_text("\n".join(rows) + "\n")
+    return names, connections, change, walks
+
+def closed_walks(walks, n):
+    """Floyd-Warshall shortest walking times (chains of footpaths)."""
+    d = [[INF] * n for _ in range(n)]
+    for (a, b), t in walks.items():
+        d[a][b] = min(d[a][b], t)
+    for k in range(n):
+        for i in range(n):
+            for j in range(n):
+                if d[i][k] + d[k][j] < d[i][j]:
+                    d[i][j] = d[i][k] + d[k][j]
+    return [[(j, d[i][j]) for j in range(n) if j != i and d[i][j] < INF] for i in range(n)]
+
+def connection_scan(connections, change, walk, origin, dep_time):
+    """
+    Earliest arrival per station: boarding needs arrival + change time after a
+    trip, or just arrival after a walk (or at the origin); a walk follows the
+    origin or a trip.
+    """
+    n = len(change)
+    best, board, on = [INF] * n, [INF] * n, set()
+    def walk_from(p, t):
+        for q, w in walk[p]:
+            best[q] = min(best[q], t + w)
+            board[q] = min(board[q], t + w)
+    best[origin] = board[origin] = dep_time
+    walk_from(origin, dep_time)
+    for dep, trip, u, v, arr in sorted(connections):
+        if trip in on or board[u] <= dep:
+            on.add(trip)
+            best[v] = min(best[v], arr)
+            board[v] = min(board[v], arr + change[v])
+            walk_from(v, arr)
+    return best
+
+class RaptorTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        gtfs = Path(cls.tmp.name)
+        cls.names, cls.connections, change, walks = write_feed(gtfs, seed=7)
+        cls.tt = Timetable.build(gtfs, "monday")
+        cls.engine = Raptor(cls.tt)
+        # Timetable codes follow the sorted parent stop_ids, which are the names in order.
+        assert list(cls.tt.stations) == cls.names
+        cls.change, cls.walk = change, closed_walks(walks, N_STATIONS)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_matches_connection_scan(self):
+        for origin in range(N_STATIONS):
+            for dep_time in (parse_time("06:00"), parse_time("06:37"), parse_time("07:15")):
+                want = connection_scan(self.connections, self.change, self.walk, origin, dep_time)
+                got, _ = self.engine.run(origin, dep_time, max_rounds=N_STATIONS)
+                self.assertEqual(got, want, f"origin {self.names[origin]} at {dep_time}")
+
+    def test_journeys_are_feasible(self):
+        """Replaying the legs of earliest_arrival() reaches the target at the reported time."""
+        dep_time = parse_time("06:20")
+        checked = 0
+        for origin in range(N_STATIONS):
+            for target in range(N_STATIONS):
+                if origin == target:
+                    continue
+                arrival, legs = self.engine.earliest_arrival(origin, target, dep_time, max_rounds=N_STATIONS)
+                if arrival >= INF:
+                    continue
+                at, t, ready = origin, dep_time, dep_time
+                for leg in legs:
+                    self.assertEqual(self.tt.station_code(leg["from"]), at)
+                    if leg.get("walk"):
+                        t = ready = t + leg["seconds"]
+                    else:
+                        self.assertGreaterEqual(parse_time(leg["depart"]), ready)
+                        t = parse_time(leg["arrive"])
+                        ready = t + self.change[self.tt.station_code(leg["to"])]
+                    at = self.tt.station_code(leg["to"])
+                self.assertEqual((at, t), (target, arrival))
+                checked += 1
+        self.assertGreater(checked, 100)
+
+if __name__ == "__main__":
+    unittest.main()